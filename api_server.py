@@ -0,0 +1,429 @@
+### HTTP scoring service
+#### JSON API over the batch scoring pipeline for intake systems that cannot drive the Streamlit page
+#
+# Usage:
+#   GEMINI_API_KEY=... python api_server.py --port 8080 --workers 4
+#
+# Endpoints:
+#   POST /evaluate             JSON {"url": ..., "criteria_set": ..., "mode": "sync"|"async", "callback_url": ..., "force": false}
+#                              or a raw application/pdf or text/plain body with the same fields as query
+#                              parameters (plus "filename")
+#   GET  /evaluations/{id}     Status and result row of a submitted evaluation
+#   GET  /health               Pending requests and capacity
+#
+# Each Gemini API key (the server's, or one sent in the X-Gemini-Api-Key header) gets its own pool of
+# worker processes that configure the key once and keep their Gemini client, caches and stores for
+# their lifetime. At most MAX_KEYS pools run at once; the least recently used idle one is shut down to
+# make room for a new key. Requests beyond the pending limit are refused with 429 and Retry-After.
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import gemini_client
+from gemini_client import MODEL_NAME
+from batch_cli import evaluate_document
+from scoring import CRITERIA_SETS, ALL_REGULATORS
+from documents import MAX_SIZE, COPY_CHUNK, detect_mime, is_allowed_mime, is_valid_url, sanitize_filename
+from evaluation_cache import EvaluationCache
+from file_registry import FileHandleRegistry
+from evaluation_store import EvaluationStore
+from url_fetcher import UrlFetcher, shared_session
+from rate_limiter import backoff_delay
+
+# Requests accepted but not finished, across all keys; more are refused with 429
+MAX_PENDING = 64
+
+# Seconds a synchronous request waits before answering 202 with the evaluation ID to poll
+SYNC_TIMEOUT = 120
+
+# Finished evaluations kept for GET /evaluations/{id} (oldest are dropped first)
+MAX_RESULTS = 10000
+
+# Distinct API keys with their own worker pool
+MAX_KEYS = 8
+
+# Content types of raw document bodies
+DOCUMENT_CONTENT_TYPES = ("application/pdf", "text/plain")
+
+CALLBACK_ATTEMPTS = 3
+CALLBACK_TIMEOUT = 30
+
+EVALUATION_PATH = re.compile(r"^/evaluations/([0-9a-f]{32})$")
+
+class ServiceUnavailable(RuntimeError):
+    """The worker pool could not accept the evaluation (e.g. a crashed worker or shutdown)."""
+
+
+# Per-process pipeline state, created once by init_process
+_cache = None
+_file_registry = None
+_store = None
+_fetcher = None
+
+# Worker process initializer: configure the key and open the shared caches and stores
+def init_process(api_key):
+    global _cache, _file_registry, _store, _fetcher
+    if api_key:
+        gemini_client.configure(api_key)
+    _cache = EvaluationCache()
+    _file_registry = FileHandleRegistry()
+    _store = EvaluationStore()
+    _fetcher = UrlFetcher()
+    if gemini_client.CONTEXT_CACHE_ENABLED:
+        gemini_client.enable_context_cache(_file_registry)
+
+# Evaluate one document in a worker; uploaded bodies are removed afterwards
+def run_evaluation(document, criteria_set, force):
+    try:
+        return evaluate_document(document, criteria_set, _cache, force, MODEL_NAME, _file_registry, _store,
+                                 fetcher=_fetcher)
+    finally:
+        if "path" in document:
+            os.remove(document["path"])
+
+
+# One worker pool per API key; process pools isolate the keys, since the Gemini SDK configures one key per process.
+# With processes=False a single thread pool serves the server's own key (e.g. against a stubbed backend).
+class ClientPool:
+    def __init__(self, api_key, workers=4, processes=True, max_keys=MAX_KEYS):
+        self.api_key = api_key
+        self.workers = workers
+        self.processes = processes
+        self.max_keys = max_keys
+        self.executors = OrderedDict()  # Least recently used first
+        self.active = Counter()  # Evaluations in flight per key
+        self.lock = threading.Lock()
+        if not processes:
+            init_process(api_key)
+
+    # Executor for a key (None for the server's key), counted as in use until release(). At the key limit the
+    # least recently used idle pool of another key is shut down; raises LookupError when every pool is busy,
+    # and ValueError for a per-request key in thread mode.
+    def acquire(self, api_key=None):
+        api_key = api_key or self.api_key
+        if not self.processes and api_key != self.api_key:
+            raise ValueError("per-request API keys require process workers")
+        evicted = None
+        with self.lock:
+            executor = self.executors.get(api_key)
+            if executor is None:
+                if len(self.executors) >= self.max_keys:
+                    idle = next((key for key in self.executors if not self.active[key] and key != self.api_key), None)
+                    if idle is None:
+                        raise LookupError("too many distinct API keys in use")
+                    evicted = self.executors.pop(idle)
+                if self.processes:
+                    executor = ProcessPoolExecutor(self.workers, initializer=init_process, initargs=(api_key,))
+                else:
+                    executor = ThreadPoolExecutor(self.workers)
+                self.executors[api_key] = executor
+            self.executors.move_to_end(api_key)
+            self.active[api_key] += 1
+        if evicted is not None:
+            evicted.shutdown(wait=False)
+        return executor
+
+    def release(self, api_key=None):
+        with self.lock:
+            self.active[api_key or self.api_key] -= 1
+
+    # Drop a broken executor, so the next request for its key starts a fresh pool
+    def discard(self, executor):
+        with self.lock:
+            for api_key, known in list(self.executors.items()):
+                if known is executor:
+                    del self.executors[api_key]
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self.lock:
+            for executor in self.executors.values():
+                executor.shutdown(wait=False, cancel_futures=True)
+            self.executors.clear()
+
+
+# Submitted evaluations by ID with their status, result row or error; bounded to the most recent
+class EvaluationRegistry:
+    def __init__(self, max_results=MAX_RESULTS, max_pending=MAX_PENDING):
+        self.max_results = max_results
+        self.max_pending = max_pending
+        self.entries = OrderedDict()
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    # Reserve a slot for a new evaluation; returns its ID, or None when the pending limit is reached
+    def reserve(self, source, criteria_set):
+        with self.lock:
+            if self.pending >= self.max_pending:
+                return None
+            self.pending += 1
+            evaluation_id = uuid.uuid4().hex
+            self.entries[evaluation_id] = {"id": evaluation_id, "status": "queued", "source": source,
+                                           "criteria_set": criteria_set, "created": time.time()}
+            while len(self.entries) > self.max_results:
+                oldest = next(iter(self.entries))
+                if self.entries[oldest]["status"] in ("queued", "running"):
+                    break
+                del self.entries[oldest]
+            return evaluation_id
+
+    def update(self, evaluation_id, **fields):
+        with self.lock:
+            entry = self.entries.get(evaluation_id)
+            if entry is not None:
+                if fields.get("status") in ("done", "failed") and entry["status"] not in ("done", "failed"):
+                    self.pending -= 1
+                entry.update(fields)
+
+    def get(self, evaluation_id):
+        with self.lock:
+            entry = self.entries.get(evaluation_id)
+            return dict(entry) if entry is not None else None
+
+
+# POST the finished evaluation to the caller's callback URL, with jittered retries
+def send_callback(callback_url, entry):
+    for attempt in range(CALLBACK_ATTEMPTS):
+        try:
+            response = shared_session().post(callback_url, json=entry, timeout=CALLBACK_TIMEOUT)
+            if response.status_code < 500:
+                return
+        except Exception:
+            pass
+        time.sleep(backoff_delay(attempt))
+    print(f"Callback to {callback_url} failed for evaluation {entry['id']}", file=sys.stderr)
+
+
+class ScoringService:
+    def __init__(self, pool, registry=None):
+        self.pool = pool
+        self.registry = registry or EvaluationRegistry()
+
+    # Queue an evaluation; returns (evaluation_id, future), or (None, None) under backpressure.
+    # Raises ServiceUnavailable, with the slot released and the entry failed, when the pool rejects it.
+    def submit(self, document, criteria_set, force=False, api_key=None, callback_url=None):
+        executor = self.pool.acquire(api_key)
+        evaluation_id = self.registry.reserve(document.get("url") or document.get("name"), criteria_set)
+        if evaluation_id is None:
+            self.pool.release(api_key)
+            return None, None
+        self.registry.update(evaluation_id, status="running")
+        try:
+            future = executor.submit(run_evaluation, document, criteria_set, force)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            self.registry.update(evaluation_id, status="failed", error=error, finished=time.time())
+            self.pool.release(api_key)
+            self.pool.discard(executor)
+            raise ServiceUnavailable(f"evaluation {evaluation_id} could not be queued ({error})") from e
+
+        def finished(future):
+            self.pool.release(api_key)
+            try:
+                row = future.result()
+            except Exception as e:
+                row = {"error": f"{type(e).__name__}: {e}"}
+            if document.get("name"):
+                row["source"] = document["name"]  # Not the private upload path
+            if row.get("error"):
+                self.registry.update(evaluation_id, status="failed", error=row["error"], finished=time.time())
+            else:
+                self.registry.update(evaluation_id, status="done", result=row, finished=time.time())
+            if callback_url:
+                threading.Thread(target=send_callback, args=(callback_url, self.registry.get(evaluation_id)),
+                                 daemon=True).start()
+
+        future.add_done_callback(finished)
+        return evaluation_id, future
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    service = None  # Set by make_server
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Evaluations are logged by the instrumentation module
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/health":
+            registry = self.service.registry
+            self.send_json(200, {"pending": registry.pending, "capacity": registry.max_pending})
+            return
+        match = EVALUATION_PATH.match(path)
+        entry = self.service.registry.get(match.group(1)) if match else None
+        if entry is None:
+            self.send_json(404, {"error": "unknown evaluation"})
+        else:
+            self.send_json(200, entry)
+
+    def do_POST(self):
+        parts = urlsplit(self.path)
+        if parts.path != "/evaluate":
+            self.send_json(404, {"error": "not found"})
+            return
+        # Errors answered before the body is read close the connection, so it is not read as the next request
+        close = {"Connection": "close"}
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.send_json(400, {"error": "Content-Length must be a non-negative integer"}, close)
+            return
+        if length > MAX_SIZE:
+            self.send_json(413, {"error": "document exceeds the 100MB limit"}, close)
+            return
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if content_type != "application/json" and content_type not in DOCUMENT_CONTENT_TYPES:
+            self.send_json(415, {"error": "Content-Type must be application/json, or application/pdf or text/plain "
+                                          "for a raw document body"}, close)
+            return
+        try:
+            if content_type == "application/json":
+                params = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(params, dict):
+                    raise ValueError("the JSON body must be an object")
+                document = self.url_document(params)
+            else:
+                params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+                document = self.file_document(params, length)
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        except TypeError as e:
+            self.send_json(415, {"error": str(e)})
+            return
+
+        criteria_set = params.get("criteria_set", "Selected Set")
+        mode = params.get("mode", "sync")
+        if criteria_set not in CRITERIA_SETS + [ALL_REGULATORS] or mode not in ("sync", "async"):
+            self.discard(document)
+            self.send_json(400, {"error": f"criteria_set must be one of {CRITERIA_SETS + [ALL_REGULATORS]}, "
+                                          "mode one of sync, async"})
+            return
+        try:
+            evaluation_id, future = self.service.submit(
+                document, criteria_set, str(params.get("force", "")).lower() in ("1", "true"),
+                self.headers.get("X-Gemini-Api-Key"), params.get("callback_url"))
+        except ValueError as e:
+            self.discard(document)
+            self.send_json(400, {"error": str(e)})
+            return
+        except LookupError as e:
+            self.discard(document)
+            self.send_json(429, {"error": str(e)}, {"Retry-After": "60"})
+            return
+        except ServiceUnavailable as e:
+            self.discard(document)
+            self.send_json(503, {"error": str(e)}, {"Retry-After": "30"})
+            return
+        if evaluation_id is None:
+            self.discard(document)
+            self.send_json(429, {"error": "too many pending evaluations"}, {"Retry-After": "30"})
+            return
+
+        location = {"Location": f"/evaluations/{evaluation_id}"}
+        if mode == "sync":
+            try:
+                future.result(timeout=SYNC_TIMEOUT)
+            except Exception:
+                pass  # Timeouts are answered with 202; failures are in the registry entry
+            entry = self.service.registry.get(evaluation_id)
+            if entry["status"] in ("done", "failed"):
+                self.send_json(200, entry, location)
+                return
+        self.send_json(202, self.service.registry.get(evaluation_id), location)
+
+    # {"url": ...} document from a JSON request
+    def url_document(self, params):
+        url = str(params.get("url") or "").strip()
+        if not is_valid_url(url):
+            raise ValueError("a valid http(s) URL is required")
+        return {"url": url}
+
+    # Stream a raw PDF/TXT request body to a temp file; returns a {"path", "name"} document
+    def file_document(self, params, length):
+        if not length:
+            raise ValueError("send a JSON body with a URL or a PDF/TXT body")
+        filename = sanitize_filename(params.get("filename", "upload.pdf"))
+        fd, path = tempfile.mkstemp(prefix="api_", suffix=os.path.splitext(filename)[1] or ".pdf")
+        with open(fd, "wb") as f:
+            remaining = length
+            while remaining:
+                chunk = self.rfile.read(min(COPY_CHUNK, remaining))
+                if not chunk:
+                    break
+                f.write(chunk)
+                remaining -= len(chunk)
+        with open(path, "rb") as f:
+            mime_type = detect_mime(f.read(8192))
+        if not is_allowed_mime(mime_type):
+            os.remove(path)
+            raise TypeError(f"unsupported document type {mime_type}; only PDF or TXT files are allowed")
+        return {"path": path, "name": filename}
+
+    def discard(self, document):
+        if "path" in document:
+            os.remove(document["path"])
+
+
+def make_server(host, port, pool, registry=None):
+    handler = type("BoundRequestHandler", (RequestHandler,), {"service": ScoringService(pool, registry)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve fraud scoring over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent evaluations per API key")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING,
+                        help="Accepted but unfinished evaluations before requests are refused with 429")
+    parser.add_argument("--threads", action="store_true",
+                        help="Run evaluations in threads of this process (server key only)")
+    parser.add_argument("--api-key", default=os.environ.get("GEMINI_API_KEY"),
+                        help="Gemini API key (default: GEMINI_API_KEY environment variable)")
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("a Gemini API key is required (--api-key or GEMINI_API_KEY)")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    pool = ClientPool(args.api_key, args.workers, not args.threads)
+    server = make_server(args.host, args.port, pool, EvaluationRegistry(max_pending=args.max_pending))
+    print(f"Serving on http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping server", file=sys.stderr)
+    finally:
+        server.server_close()
+        pool.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,516 @@
+### Headless batch scoring of whitepapers
+#### Scores a folder of PDF/TXT files or a CSV/JSONL manifest concurrently and streams one row per document
+#
+# Usage:
+#   python batch_cli.py whitepapers/ --set FCA --concurrency 8 --output results.jsonl
+#   python batch_cli.py manifest.csv --format csv
+#
+# Manifests hold one document per row/line with a "url" or "path" field.
+
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import gemini_client
+from gemini_client import (MODEL_NAME, FAST_MODEL_NAME, ESCALATE_CRITERIA, ESCALATE_DOCUMENT, file_system_prompt,
+                           url_system_prompt, section_system_prompt)
+from scoring import (CRITERIA_SETS, ALL_REGULATORS, UNSURE_VERDICT, get_criteria_set, parse_response, score_document,
+                     score_all_sets, score_consensus, consensus_all_sets, merge_section_evaluations, probability_bounds,
+                     evidence_strength, ESCALATION_MARGIN)
+from preextract import split_sections, section_prompt
+from documents import default_path_name, default_url_name, is_allowed_mime
+from evaluation_cache import EvaluationCache, hash_file, hash_url, make_key
+from file_registry import FileHandleRegistry
+from evaluation_store import EvaluationStore
+from recordings import ResponseRecorder, RECORD_ENABLED
+from url_fetcher import UrlFetcher
+from instrumentation import EvaluationTrace, emit
+
+# File extensions picked up when scoring a directory
+DOCUMENT_EXTENSIONS = (".pdf", ".txt")
+
+# Columns written in CSV mode (scores, fraud criteria and per-set results are JSON-encoded)
+CSV_FIELDS = ["source", "whitepaper_name", "criteria_set", "probability", "verdict", "samples", "probability_std",
+              "fraud_criteria", "scores", "by_set", "skipped", "elapsed", "cached", "error"]
+
+# Collect documents from a directory or a CSV/JSONL manifest as {"path": ...} / {"url": ...} dicts
+def load_documents(source):
+    if os.path.isdir(source):
+        return [{"path": os.path.join(source, name)} for name in sorted(os.listdir(source))
+                if name.lower().endswith(DOCUMENT_EXTENSIONS)]
+    documents = []
+    with open(source, newline="", encoding="utf-8") as f:
+        if source.lower().endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            if row.get("url"):
+                documents.append({"url": row["url"].strip()})
+            elif row.get("path"):
+                documents.append({"path": row["path"].strip()})
+    return documents
+
+# Concurrent section requests per document in sectioned mode
+SECTION_WORKERS = 4
+
+# Map-reduce evaluation of a local file: sections in parallel, merged per criterion.
+# Raises if a section still fails after retries, so a partial merge is never reported.
+def evaluate_file_sections(path, criteria_list, model_name=MODEL_NAME, trace=None):
+    with trace.span("split_sections"):
+        title, sections = split_sections(path)
+    if not sections:
+        raise ValueError("no text could be extracted for sectioned evaluation")
+    section_texts = [section_prompt(title, section, i, len(sections)) for i, section in enumerate(sections)]
+    section_results = [None] * len(sections)
+    names = [None] * len(sections)
+    for index, name, evaluations, error in gemini_client.evaluate_sections(section_texts, criteria_list, SECTION_WORKERS,
+                                                                            model_name=model_name, trace=trace):
+        if error is not None:
+            raise RuntimeError(f"section {index + 1} of {len(sections)} failed: {error}") from error
+        section_results[index] = evaluations
+        names[index] = name
+    with trace.span("merge"):
+        merged = merge_section_evaluations(section_results)
+    return next((name for name in names if name), None) or title, merged
+
+# Criteria per batch in adaptive mode (evaluated concurrently, one request each)
+ADAPTIVE_BATCH = 4
+
+# Adaptive evaluation of a local file, in descending weight order until the verdict is settled.
+# Returns (whitepaper_name, evaluations, failed_ids, skipped_ids).
+def evaluate_file_adaptive(path, criteria_list, coefficient_sets, model_name=MODEL_NAME, file_registry=None, trace=None):
+    gemini_file = gemini_client.upload_document(path, file_registry, trace)
+    whitepaper_name = None
+    evaluations = []
+    failed_ids = []
+    skipped_ids = []
+    for name, batch_evaluations, batch_failed, open_ids in gemini_client.evaluate_adaptive(
+            gemini_file, criteria_list, coefficient_sets, ADAPTIVE_BATCH, ADAPTIVE_BATCH, model_name=model_name,
+            trace=trace):
+        whitepaper_name = whitepaper_name or name
+        evaluations.extend(batch_evaluations)
+        failed_ids.extend(batch_failed)
+        skipped_ids = open_ids
+    if not evaluations:
+        raise RuntimeError(f"every criterion evaluation failed ({', '.join(failed_ids)})")
+    return whitepaper_name, evaluations, failed_ids, skipped_ids
+
+# Fetched PDF/TXT document for a URL, or None when Gemini should read the URL itself (other content types
+# or a failed fetch, which is noted in the row)
+def fetch_document(fetcher, url, trace, row):
+    try:
+        with trace.span("fetch"):
+            fetched = fetcher.fetch(url)
+    except Exception as e:
+        row["fetch_error"] = f"{type(e).__name__}: {e}"
+        return None
+    row["content_changed"] = fetched.changed
+    return fetched if is_allowed_mime(fetched.mime_type) else None
+
+# Concurrent sample requests per document in consensus mode
+SAMPLE_WORKERS = 4
+
+# Parsed (whitepaper_name, evaluations, skipped) of `samples` responses to one request. Parseable recorded
+# responses are reused and only the missing ones are requested through request_sample, concurrently when more
+# than one is missing. Failed samples are dropped; raises when none is left.
+def collect_samples(request_sample, samples, recorded=()):
+    parsed = []
+    for response_text in recorded:
+        if len(parsed) == samples:
+            break
+        try:
+            parsed.append(parse_response(response_text))
+        except ValueError:
+            pass  # Kept in the recordings for replay; a fresh sample is requested in its place
+    missing = samples - len(parsed)
+    if not missing:
+        return parsed
+    if missing == 1 and not parsed:
+        return [request_sample()]
+    error = None
+    for _, result, sample_error in gemini_client.evaluate_samples(request_sample, missing, SAMPLE_WORKERS):
+        if sample_error is not None:
+            error = sample_error
+        else:
+            parsed.append(result)
+    if not parsed:
+        raise error
+    return parsed
+
+# Score one evaluation, or the consensus of several sampled ones, under the selected set's coefficients
+# (None for ALL_REGULATORS). Returns (scored, by_set); by_set is None unless every set is scored.
+def score_samples(sample_evaluations, coefficients):
+    if len(sample_evaluations) > 1:
+        if coefficients is None:
+            return consensus_all_sets(sample_evaluations)
+        return score_consensus(sample_evaluations, coefficients), None
+    if coefficients is None:
+        return score_all_sets(sample_evaluations[0])
+    return score_document(sample_evaluations[0], coefficients), None
+
+# Cleaned paragraphs and MinHash signature of a local file for the near-duplicate index,
+# or (None, None) when no text can be extracted. near_duplicates (and numpy) load only in --near-duplicates runs.
+def index_entry(path, trace):
+    from near_duplicates import document_paragraphs, document_signature
+    try:
+        with trace.span("near_duplicates"):
+            paragraphs = document_paragraphs(path)
+            return paragraphs, document_signature(paragraphs)
+    except Exception:
+        return None, None
+
+# Incremental evaluation of a revision or fork of an indexed document: the criteria whose evidence may have
+# changed are re-evaluated through run_stage and the others are carried over, quotes included, from the stored
+# results of the most similar match. Returns (whitepaper_name, evaluations, match info for the row), or None
+# when no near-duplicate has stored results for this model and prompt, or when the re-evaluation leaves out
+# one of the criteria (the document is then evaluated in full, so a partial result is never cached or stored).
+def evaluate_file_incremental(document_hash, paragraphs, signature, criteria_list, criteria_sets, index, store,
+                              run_stage, model_name, trace):
+    from near_duplicates import criteria_to_reevaluate
+    for match_hash, match_similarity in index.find(signature, exclude=document_hash):
+        previous, whitepaper_name = store.latest_criterion_results(match_hash, criteria_sets, model_name,
+                                                                   file_system_prompt)
+        previous = {id_: item for id_, item in previous.items() if evidence_strength(item) >= 0}
+        old_paragraphs = index.paragraphs(match_hash)
+        if not previous or old_paragraphs is None:
+            continue
+        with trace.span("near_duplicates"):
+            ids = criteria_to_reevaluate(previous, criteria_list, old_paragraphs, paragraphs)
+        reevaluated = {}
+        if ids:
+            name, evaluations = run_stage(model_name, [item for item in criteria_list if item["ID"] in ids])
+            whitepaper_name = name or whitepaper_name
+            reevaluated = {item["ID"]: item for item in evaluations if isinstance(item, dict) and "ID" in item}
+            if any(id_ not in reevaluated for id_ in ids):
+                return None
+        evaluations = [reevaluated[item["ID"]] if item["ID"] in ids else previous[item["ID"]]
+                       for item in criteria_list]
+        return whitepaper_name, evaluations, {"document_hash": match_hash, "similarity": round(match_similarity, 3),
+                                              "reevaluated": ids, "carried": len(criteria_list) - len(ids)}
+    return None
+
+def is_unsure(scored, by_set):
+    verdicts = [scored["verdict"]] if by_set is None else [result["verdict"] for result in by_set.values()]
+    return UNSURE_VERDICT in verdicts
+
+# Evaluate one document and return its result row; errors are reported in the row.
+# Fresh (non-cached) evaluations are recorded in the store when one is given, and raw responses in the
+# recorder. With samples > 1 the document is scored from the consensus of that many responses
+# (only when the first verdict is Unsure if unsure_only is set). In adaptive mode local files are evaluated
+# criterion by criterion in weight order and criteria that cannot change the verdict are skipped.
+# With a fetcher, URLs serving PDF/TXT are fetched and evaluated like local files. With cascade options
+# ({"fast_model", "margin", "escalate"}) the fast model goes first and model_name only sees borderline documents.
+# With a near-duplicate index (and a store), revisions of evaluated local files only re-evaluate the criteria
+# affected by the changes, and freshly evaluated local files are added to the index.
+def evaluate_document(document, selected_set, cache=None, force_refresh=False, model_name=MODEL_NAME,
+                      file_registry=None, store=None, sectioned=False, recorder=None, samples=1, unsure_only=False,
+                      adaptive=False, fetcher=None, cascade=None, near_duplicates=None):
+    criteria_list, coefficients = get_criteria_set(selected_set)
+    source = document.get("url") or document["path"]
+    path = document.get("path")  # Local file to evaluate; None when Gemini reads the URL itself
+    row = {"source": source, "criteria_set": selected_set, "cached": False, "error": None}
+    trace = EvaluationTrace(source, selected_set, model_name, "batch+sections" if sectioned else "batch")
+    coefficient_sets = [coefficients] if coefficients is not None else [get_criteria_set(name)[1] for name in CRITERIA_SETS]
+    open_ids = []  # Criteria skipped or failed in adaptive mode
+    paragraphs = signature = None  # Near-duplicate index entry of a freshly evaluated local file
+    used_model = model_name  # Model(s) behind the result, as recorded in the store
+    key_model = model_name if cascade is None else gemini_client.cascade_label(
+        cascade["fast_model"], model_name, cascade["margin"], cascade["escalate"])
+    start = time.perf_counter()
+    try:
+        if path is None and fetcher is not None:
+            fetched = fetch_document(fetcher, source, trace, row)
+            if fetched is not None:
+                path = fetched.path
+        sampled = samples > 1 and not (path is not None and (sectioned or adaptive))
+        with trace.span("hash"):
+            if path is None:
+                document_hash = hash_url(source)
+                system_prompt = url_system_prompt
+                default_name = default_url_name(source)
+            else:
+                document_hash = hash_file(path)
+                system_prompt = section_system_prompt if sectioned else file_system_prompt
+                default_name = default_path_name(path) if "path" in document else default_url_name(source)
+            cache_key = make_key(document_hash, selected_set, criteria_list, system_prompt, key_model)
+
+        # One fresh response, recorded before parsing so unparseable output can be replayed later
+        def request_sample():
+            if path is None:
+                response_text = gemini_client.evaluate_url(source, criteria_list, model_name, trace=trace)
+            else:
+                response_text = gemini_client.evaluate_file(path, criteria_list, model_name, file_registry, trace)
+            if recorder is not None:
+                recorder.record(cache_key, document_hash, document.get("name", source), selected_set, criteria_list,
+                                model_name, system_prompt, response_text)
+            with trace.span("parse"):
+                return parse_response(response_text)
+
+        # One cascade stage: a model over (a subset of) the criteria
+        def run_stage(stage_model, stage_criteria):
+            if path is None:
+                response_text = gemini_client.evaluate_url(source, stage_criteria, stage_model, trace=trace)
+            else:
+                response_text = gemini_client.evaluate_file(path, stage_criteria, stage_model, file_registry, trace)
+            with trace.span("parse"):
+                whitepaper_name, evaluations, _ = parse_response(response_text)
+            return whitepaper_name, evaluations
+
+        cascade_sets = [selected_set] if coefficients is not None else CRITERIA_SETS
+
+        # Consensus runs reuse the recorded samples of the request; a single sample is always requested fresh
+        # (replay.py re-scores recordings offline)
+        def sample_document(count):
+            reuse = recorder is not None and count > 1 and not force_refresh
+            recorded = recorder.responses(cache_key) if reuse else []
+            parsed = collect_samples(request_sample, count, recorded)
+            name = next((whitepaper_name for whitepaper_name, _, _ in parsed if whitepaper_name), None)
+            return name or default_name, [evaluations for _, evaluations, _ in parsed]
+
+        use_cache = cache is not None and not force_refresh and (not sampled or unsure_only)
+        cached = cache.get(cache_key) if use_cache else None
+        if cached is not None:
+            evaluations, whitepaper_name = cached
+            sample_evaluations = [evaluations]
+            row["cached"] = True
+            trace.mode = "cached"
+        else:
+            incremental = None
+            if near_duplicates is not None and path is not None:
+                paragraphs, signature = index_entry(path, trace)
+                if paragraphs and store is not None and not (sectioned or adaptive or sampled or cascade is not None):
+                    incremental = evaluate_file_incremental(document_hash, paragraphs, signature, criteria_list,
+                                                            cascade_sets, near_duplicates, store, run_stage,
+                                                            model_name, trace)
+            if incremental is not None:
+                trace.mode = "batch+incremental"
+                whitepaper_name, evaluations, row["near_duplicate"] = incremental
+                sample_evaluations = [evaluations]
+                whitepaper_name = whitepaper_name or default_name
+            elif path is not None and sectioned:
+                whitepaper_name, evaluations = evaluate_file_sections(path, criteria_list, model_name, trace)
+                sample_evaluations = [evaluations]
+                whitepaper_name = whitepaper_name or default_name
+            elif path is not None and adaptive:
+                trace.mode = "batch+adaptive"
+                whitepaper_name, evaluations, failed_ids, skipped_ids = evaluate_file_adaptive(
+                    path, criteria_list, coefficient_sets, model_name, file_registry, trace)
+                sample_evaluations = [evaluations]
+                whitepaper_name = whitepaper_name or default_name
+                open_ids = skipped_ids + failed_ids
+                row.update(skipped=skipped_ids, failed=failed_ids)
+            elif cascade is not None:
+                trace.mode = "batch+cascade"
+                whitepaper_name, evaluations, stages = gemini_client.evaluate_cascade(
+                    run_stage, criteria_list, {name: get_criteria_set(name)[1] for name in cascade_sets},
+                    cascade["fast_model"], model_name, cascade["margin"], cascade["escalate"], trace)
+                sample_evaluations = [evaluations]
+                whitepaper_name = whitepaper_name or default_name
+                used_model = trace.model = ">".join(stage["model"] for stage in stages)
+                row["cascade"] = stages
+            else:
+                whitepaper_name, sample_evaluations = sample_document(1 if unsure_only else samples)
+                evaluations = sample_evaluations[0]
+            # Partial adaptive results are not cached; a later full evaluation would reuse them
+            if cache is not None and evaluations and len(sample_evaluations) == 1 and not open_ids:
+                cache.put(cache_key, evaluations, whitepaper_name)
+
+        with trace.span("scoring"):
+            scored, by_set = score_samples(sample_evaluations, coefficients)
+        if sampled and unsure_only and len(sample_evaluations) == 1 and is_unsure(scored, by_set):
+            # Borderline: spend the extra samples only here
+            whitepaper_name, sample_evaluations = sample_document(samples)
+            row["cached"] = False
+            with trace.span("scoring"):
+                scored, by_set = score_samples(sample_evaluations, coefficients)
+        if len(sample_evaluations) > 1:
+            trace.mode = "batch+consensus"
+            evaluations = scored["evaluations"]
+            row.update({"samples": scored["samples"],
+                        "variance": {id_: round(v, 4) for id_, v in scored["variance"].items() if v}})
+            if by_set is None:
+                row.update({"probability_std": round(scored["probability_std"], 4),
+                            "sample_verdicts": scored["sample_verdicts"]})
+        if open_ids and by_set is None:
+            row["probability_bounds"] = [round(p, 4) for p in probability_bounds(scored["scores"], open_ids, coefficients)]
+        if by_set is not None:
+            # ALL_REGULATORS: one probability and verdict per set from the shared evaluation
+            scored.update(probability=None, verdict=None)
+        row.update({
+            "whitepaper_name": whitepaper_name,
+            "probability": None if scored["probability"] is None else round(scored["probability"], 4),
+            "verdict": scored["verdict"],
+            "fraud_criteria": scored["fraud_criteria"],
+            "scores": scored["scores"],
+            "evaluations": evaluations,
+        })
+        if by_set is not None:
+            row["by_set"] = {name: {"probability": round(result["probability"], 4), "verdict": result["verdict"],
+                                    "fraud_criteria": result["fraud_criteria"]}
+                             for name, result in by_set.items()}
+            if len(sample_evaluations) > 1:
+                for name, result in by_set.items():
+                    row["by_set"][name].update(probability_std=round(result["probability_std"], 4),
+                                               sample_verdicts=result["sample_verdicts"])
+            if open_ids:
+                for name, result in by_set.items():
+                    row["by_set"][name]["probability_bounds"] = [
+                        round(p, 4) for p in probability_bounds(result["scores"], open_ids, get_criteria_set(name)[1])]
+        if store is not None and not row["cached"]:
+            name = document.get("name", source)
+            if by_set is None:
+                store.record(document_hash, name, whitepaper_name, selected_set, used_model, system_prompt,
+                             evaluations, scored, trace)
+            else:
+                store.record_sets(document_hash, name, whitepaper_name, used_model, system_prompt, evaluations,
+                                  by_set, trace)
+        if paragraphs and not open_ids:
+            near_duplicates.add(document_hash, paragraphs, signature)
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["elapsed"] = round(time.perf_counter() - start, 3)
+    diagnostics = trace.to_dict()
+    row["stages"] = diagnostics["stages"]
+    row["tokens"] = diagnostics["tokens"]
+    if not row["error"]:
+        emit(trace)
+    return row
+
+# Write result rows as they arrive; JSONL rows keep the full evaluations
+class ResultWriter:
+    def __init__(self, out, fmt):
+        self.out = out
+        self.fmt = fmt
+        self.lock = threading.Lock()
+        if fmt == "csv":
+            self.csv_writer = csv.DictWriter(out, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            self.csv_writer.writeheader()
+
+    def write(self, row):
+        with self.lock:
+            if self.fmt == "csv":
+                flat = dict(row)
+                flat["fraud_criteria"] = json.dumps(row.get("fraud_criteria", []))
+                flat["scores"] = json.dumps(row.get("scores", {}))
+                if "by_set" in row:
+                    flat["by_set"] = json.dumps(row["by_set"])
+                if "skipped" in row:
+                    flat["skipped"] = json.dumps(row["skipped"])
+                self.csv_writer.writerow(flat)
+            else:
+                self.out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            self.out.flush()
+
+# Score all documents through a bounded thread pool, writing each row as it finishes
+def run_batch(documents, selected_set, writer, concurrency=4, cache=None, force_refresh=False, model_name=MODEL_NAME,
+              file_registry=None, store=None, sectioned=False, recorder=None, samples=1, unsure_only=False,
+              adaptive=False, fetcher=None, cascade=None, near_duplicates=None):
+    failures = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(evaluate_document, document, selected_set, cache, force_refresh, model_name,
+                               file_registry, store, sectioned, recorder, samples, unsure_only, adaptive, fetcher,
+                               cascade, near_duplicates)
+                   for document in documents]
+        for future in as_completed(futures):
+            row = future.result()
+            if row["error"]:
+                failures += 1
+            writer.write(row)
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score crypto whitepapers for fraud risk without the Streamlit UI.")
+    parser.add_argument("source", help="Directory of PDF/TXT files, or a CSV/JSONL manifest with 'url' or 'path' fields")
+    parser.add_argument("--set", dest="selected_set", default="Selected Set", choices=CRITERIA_SETS + [ALL_REGULATORS],
+                        help=f"Criteria set to evaluate against ('{ALL_REGULATORS}' scores every set from one evaluation)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum concurrent Gemini evaluations")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl", help="Output row format")
+    parser.add_argument("--output", help="Output file (default: stdout)")
+    parser.add_argument("--model", default=MODEL_NAME, help="Gemini model name")
+    parser.add_argument("--api-key", default=os.environ.get("GEMINI_API_KEY"),
+                        help="Gemini API key (default: GEMINI_API_KEY environment variable)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the evaluation cache")
+    parser.add_argument("--force", action="store_true", help="Re-evaluate even when a cached result exists")
+    parser.add_argument("--sections", action="store_true",
+                        help="Split local files into sections evaluated in parallel and merged (for very long whitepapers)")
+    parser.add_argument("--no-store", action="store_true", help="Do not record results in the evaluation store")
+    parser.add_argument("--context-cache", action="store_true", default=gemini_client.CONTEXT_CACHE_ENABLED,
+                        help="Cache the criteria prompt prefix with Gemini context caching (default: FRAUD_CONTEXT_CACHE=1)")
+    parser.add_argument("--record", action="store_true", default=RECORD_ENABLED,
+                        help="Record raw Gemini responses for offline replay with replay.py (default: FRAUD_RECORD=1)")
+    parser.add_argument("--samples", type=int, default=1,
+                        help="Score each document from the consensus of this many responses (recorded ones are reused)")
+    parser.add_argument("--unsure-only", action="store_true",
+                        help="With --samples, request the extra samples only for documents whose first verdict is Unsure")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Evaluate local files criterion by criterion in descending weight order and stop once the "
+                             "verdict is settled (remaining criteria are reported as skipped)")
+    parser.add_argument("--no-fetch", action="store_true",
+                        help="Let Gemini read URLs itself instead of fetching PDF/TXT links locally")
+    parser.add_argument("--cascade", action="store_true",
+                        help="Evaluate with --fast-model first and escalate only borderline documents to --model")
+    parser.add_argument("--fast-model", default=FAST_MODEL_NAME, help="First-pass model of the cascade")
+    parser.add_argument("--escalation-margin", type=float, default=ESCALATION_MARGIN,
+                        help="Escalate when a probability is within this distance of the Unsure band")
+    parser.add_argument("--escalate", choices=[ESCALATE_CRITERIA, ESCALATE_DOCUMENT], default=ESCALATE_CRITERIA,
+                        help="Re-evaluate only the uncertain criteria of a borderline document, or the whole document")
+    parser.add_argument("--near-duplicates", action="store_true",
+                        help="Match local files against previously evaluated near-duplicates and re-evaluate only the "
+                             "criteria affected by the changes (needs the evaluation store)")
+    parser.add_argument("--similarity", type=float,
+                        help="Minimum estimated similarity of a near-duplicate (default: 0.8)")
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("a Gemini API key is required (--api-key or GEMINI_API_KEY)")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.samples < 1:
+        parser.error("--samples must be at least 1")
+    if args.adaptive and args.sections:
+        parser.error("--adaptive and --sections cannot be combined")
+    if args.cascade and (args.adaptive or args.sections or args.samples > 1):
+        parser.error("--cascade cannot be combined with --adaptive, --sections or --samples")
+    if args.near_duplicates and (args.no_store or args.sections or args.adaptive or args.cascade or args.samples > 1):
+        parser.error("--near-duplicates cannot be combined with --no-store, --sections, --adaptive, --cascade or --samples")
+    gemini_client.configure(args.api_key)
+
+    documents = load_documents(args.source)
+    if not documents:
+        print(f"No documents found in {args.source}", file=sys.stderr)
+        return 1
+
+    cache = None if args.no_cache else EvaluationCache()
+    file_registry = FileHandleRegistry()
+    if args.context_cache:
+        gemini_client.enable_context_cache(file_registry)
+    near_duplicates = None
+    if args.near_duplicates:
+        from near_duplicates import NearDuplicateIndex, SIMILARITY_THRESHOLD
+        near_duplicates = NearDuplicateIndex(threshold=SIMILARITY_THRESHOLD if args.similarity is None else args.similarity)
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        failures = run_batch(documents, args.selected_set, ResultWriter(out, args.format),
+                             args.concurrency, cache, args.force, args.model, file_registry,
+                             None if args.no_store else EvaluationStore(), args.sections,
+                             ResponseRecorder() if args.record else None, args.samples, args.unsure_only,
+                             args.adaptive, None if args.no_fetch else UrlFetcher(),
+                             {"fast_model": args.fast_model, "margin": args.escalation_margin, "escalate": args.escalate}
+                             if args.cascade else None,
+                             near_duplicates)
+    finally:
+        if args.output:
+            out.close()
+    print(f"Scored {len(documents) - failures}/{len(documents)} documents", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
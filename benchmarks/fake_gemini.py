@@ -0,0 +1,127 @@
+### Recorded-response stand-in for google.generativeai
+#### Replays stored Gemini responses with configurable latency; install with gemini_client.set_backend()
+
+import datetime
+import itertools
+import os
+import random
+import threading
+import time
+import types
+
+RECORDED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recorded")
+
+# Read upload files in chunks of this size, like a real streaming upload would
+UPLOAD_CHUNK = 1024 * 1024
+
+
+# Recorded responses by file stem, e.g. {"selected_clean": "...", "selected_fenced": "..."}
+def load_recorded(directory=RECORDED_DIR):
+    responses = {}
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), encoding="utf-8") as f:
+            responses[os.path.splitext(name)[0]] = f.read()
+    return responses
+
+# Rough token estimate (4 characters per token) for usage metadata
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class FakeFile:
+    def __init__(self, name, size):
+        self.name = name
+        self.size_bytes = size
+        self.state = types.SimpleNamespace(name="ACTIVE")
+        self.expiration_time = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=48)
+
+
+class FakeResponse:
+    def __init__(self, text, prompt_tokens):
+        self.text = text
+        self.usage_metadata = types.SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=estimate_tokens(text),
+            total_token_count=prompt_tokens + estimate_tokens(text),
+        )
+
+
+class FakeGenerativeModel:
+    def __init__(self, backend, model_name=None, system_instruction=None):
+        self.backend = backend
+        self.model_name = model_name
+        self.system_instruction = system_instruction or ""
+
+    def _prompt_tokens(self, contents):
+        tokens = estimate_tokens(self.system_instruction)
+        for part in contents:
+            tokens += estimate_tokens(part) if isinstance(part, str) else 258 * 10  # ~10 document pages
+        return tokens
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        text = self.backend.next_response()
+        prompt_tokens = self._prompt_tokens(contents)
+        self.backend.record_call("generate_content", self.model_name)
+        delay = self.backend.sample_latency()
+        if not stream:
+            time.sleep(delay)
+            return FakeResponse(text, prompt_tokens)
+        return self._stream(text, prompt_tokens, delay)
+
+    def _stream(self, text, prompt_tokens, delay):
+        size = self.backend.stream_chunk_chars
+        chunks = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+        for chunk in chunks:
+            time.sleep(delay / len(chunks))
+            yield FakeResponse(chunk, prompt_tokens)
+
+    def count_tokens(self, contents):
+        return types.SimpleNamespace(total_tokens=self._prompt_tokens(contents if isinstance(contents, list) else [contents]))
+
+
+# Module-like backend: configure, upload_file, get_file, GenerativeModel
+class FakeGenAI:
+    def __init__(self, responses=None, latency=0.0, jitter=0.0, upload_latency=0.0, stream_chunk_chars=64, seed=0):
+        responses = responses if responses is not None else list(load_recorded().values())
+        self._responses = itertools.cycle(responses)
+        self.latency = latency
+        self.jitter = jitter
+        self.upload_latency = upload_latency
+        self.stream_chunk_chars = stream_chunk_chars
+        self.files = {}
+        self.calls = []
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    def next_response(self):
+        with self._lock:
+            return next(self._responses)
+
+    def sample_latency(self):
+        with self._lock:
+            return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def record_call(self, kind, detail=None):
+        with self._lock:
+            self.calls.append((kind, detail))
+
+    def configure(self, api_key=None, **kwargs):
+        pass
+
+    def upload_file(self, path, **kwargs):
+        size = 0
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(UPLOAD_CHUNK), b""):
+                size += len(chunk)
+        time.sleep(self.upload_latency)
+        self.record_call("upload_file", path)
+        with self._lock:
+            gemini_file = FakeFile(f"files/fake-{len(self.files)}", size)
+            self.files[gemini_file.name] = gemini_file
+        return gemini_file
+
+    def get_file(self, name):
+        return self.files[name]
+
+    def GenerativeModel(self, model_name=None, system_instruction=None, **kwargs):
+        return FakeGenerativeModel(self, model_name, system_instruction)
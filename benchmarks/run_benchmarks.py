@@ -0,0 +1,213 @@
+### Benchmark suite for the Crypto-Fraud detection pipeline
+#### Runs against the recorded-response Gemini stand-in; no API key or network needed
+#
+# Usage:
+#   python benchmarks/run_benchmarks.py --output bench_results.json
+#   python benchmarks/run_benchmarks.py --quick --compare bench_results.json
+#
+# Results are a flat {metric: value} JSON map plus run metadata, so runs from different
+# commits can be compared with --compare.
+
+import argparse
+import io
+import json
+import logging
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gemini_client
+import batch_cli
+import instrumentation
+from scoring import get_criteria_set, parse_response, score_document
+from stream_parser import IncrementalEvaluationParser
+from evaluation_cache import hash_stream
+from documents import save_upload
+from rate_limiter import Scheduler
+from fake_gemini import FakeGenAI, load_recorded
+
+# Metrics where a larger value is better (everything else: smaller is better)
+HIGHER_IS_BETTER = ("ops_per_sec", "docs_per_sec", "efficiency")
+
+
+# Run fn repeatedly for at least min_time seconds; returns calls per second
+def throughput(fn, min_time=0.5):
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return calls / elapsed
+
+# process_response + json.loads and incremental stream parsing, per recorded response
+def bench_parsing(responses, min_time):
+    metrics = {}
+    for name, text in responses.items():
+        def parse_full():
+            try:
+                parse_response(text)
+            except json.JSONDecodeError:
+                pass
+
+        def parse_stream():
+            parser = IncrementalEvaluationParser()
+            for i in range(0, len(text), 64):
+                parser.feed(text[i:i + 64])
+
+        metrics[f"parse.{name}.process_response.ops_per_sec"] = throughput(parse_full, min_time)
+        metrics[f"parse.{name}.stream_parser.ops_per_sec"] = throughput(parse_stream, min_time)
+    return metrics
+
+# Single-document scoring and, when NumPy is available, bulk re-scoring
+def bench_scoring(responses, min_time):
+    _, evaluations, _ = parse_response(responses["selected_clean"])
+    _, coefficients = get_criteria_set("Selected Set")
+    metrics = {"scoring.score_document.ops_per_sec": throughput(lambda: score_document(evaluations, coefficients), min_time)}
+    try:
+        import rescore
+    except ImportError:
+        return metrics
+    archive = [evaluations] * 10000
+    start = time.perf_counter()
+    rescore.rescore(archive)
+    metrics["scoring.rescore_10k.seconds"] = time.perf_counter() - start
+    return metrics
+
+# Evaluation of one local file through the batch path with the fake backend
+def bench_end_to_end(backend, latency, runs, workdir):
+    path = os.path.join(workdir, "whitepaper.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("ACME Yield Token Whitepaper\n" * 2000)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        row = batch_cli.evaluate_document({"path": path}, "Selected Set")
+        timings.append(time.perf_counter() - start)
+        if row["error"]:
+            raise RuntimeError(row["error"])
+    mean = sum(timings) / len(timings)
+    return {
+        "end_to_end.mean.seconds": mean,
+        "end_to_end.overhead.seconds": mean - latency - backend.upload_latency,
+    }
+
+# Peak Python memory of the file-tab upload path (hash, write temp file) for a large upload
+def bench_upload_memory(size_mb):
+    uploaded = io.BytesIO(b"%PDF-1.4\n" + os.urandom(size_mb * 1024 * 1024))
+    tracemalloc.start()
+    start = time.perf_counter()
+    hash_stream(uploaded)
+    temp_path = save_upload(uploaded, "upload.pdf")
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    os.remove(temp_path)
+    return {
+        f"upload_{size_mb}mb.peak_mb": peak / (1024 * 1024),
+        f"upload_{size_mb}mb.seconds": elapsed,
+    }
+
+# Batch wall time against the ideal ceil(N / concurrency) x latency
+def bench_batch_scaling(backend, latency, documents, levels, workdir):
+    paths = []
+    for i in range(documents):
+        path = os.path.join(workdir, f"doc_{i}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"Whitepaper {i}\n")
+        paths.append({"path": path})
+
+    class NullWriter:
+        def write(self, row):
+            pass
+
+    metrics = {}
+    for concurrency in levels:
+        start = time.perf_counter()
+        batch_cli.run_batch(paths, "Selected Set", NullWriter(), concurrency)
+        wall = time.perf_counter() - start
+        ideal = math.ceil(documents / concurrency) * (latency + backend.upload_latency)
+        metrics[f"batch.c{concurrency}.seconds"] = wall
+        metrics[f"batch.c{concurrency}.docs_per_sec"] = documents / wall
+        metrics[f"batch.c{concurrency}.efficiency"] = ideal / wall if wall else 0.0
+    return metrics
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Print per-metric change against a previous results file
+def compare(current, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["metrics"]
+    print(f"{'metric':64} {'baseline':>12} {'current':>12} {'change':>8}")
+    for metric, value in sorted(current.items()):
+        old = baseline.get(metric)
+        if not old:
+            continue
+        change = (value - old) / old * 100
+        better = change > 0 if metric.endswith(HIGHER_IS_BETTER) else change < 0
+        flag = "" if abs(change) < 5 else (" +" if better else " REGRESSION")
+        print(f"{metric:64} {old:12.4f} {value:12.4f} {change:7.1f}%{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the evaluation pipeline against recorded Gemini responses.")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results")
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated generate_content latency in seconds")
+    parser.add_argument("--upload-latency", type=float, default=0.05, help="Simulated upload_file latency in seconds")
+    parser.add_argument("--upload-mb", type=int, default=100, help="Size of the simulated large upload")
+    parser.add_argument("--documents", type=int, default=16, help="Documents in the batch scaling run")
+    parser.add_argument("--quick", action="store_true", help="Shorter timings and a 10 MB upload")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    args = parser.parse_args(argv)
+
+    min_time = 0.1 if args.quick else 0.5
+    upload_mb = 10 if args.quick else args.upload_mb
+    responses = load_recorded()
+    backend = FakeGenAI(list(responses.values())[:1], latency=args.latency, upload_latency=args.upload_latency)
+    gemini_client.set_backend(backend)
+    gemini_client.set_scheduler(Scheduler())  # Retries and concurrency control, but no RPM/TPM budgets
+    instrumentation.LOGGER.setLevel(logging.WARNING)  # Keep per-evaluation JSON lines out of the report
+
+    metrics = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        metrics.update(bench_parsing(responses, min_time))
+        metrics.update(bench_scoring(responses, min_time))
+        metrics.update(bench_end_to_end(backend, args.latency, 3 if args.quick else 5, workdir))
+        metrics.update(bench_upload_memory(upload_mb))
+        metrics.update(bench_batch_scaling(backend, args.latency, args.documents, [1, 2, 4, 8], workdir))
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": {"latency": args.latency, "upload_latency": args.upload_latency, "upload_mb": upload_mb,
+                   "documents": args.documents, "quick": args.quick},
+        "metrics": metrics,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    for metric, value in sorted(metrics.items()):
+        print(f"{metric:64} {value:12.4f}")
+    print(f"Results written to {args.output}", file=sys.stderr)
+    if args.compare:
+        compare(metrics, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+### Document intake helpers of the Crypto-Fraud detection App
+#### Filename sanitizing, size/MIME validation and URL checks shared by the UI and batch tools
+
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+# Maximum file size (100MB in bytes)
+MAX_SIZE = 100 * 1024 * 1024  # 100MB
+
+# MIME types accepted for evaluation
+ALLOWED_MIME_TYPES = ["application/pdf", "text/plain"]
+
+# Header bytes passed to libmagic; enough to tell PDF from plain text
+MIME_SNIFF_BYTES = 8192
+
+# Chunk size for streaming uploads to disk
+COPY_CHUNK = 1024 * 1024
+
+# Accepted URL format
+URL_PATTERN = re.compile(r'https?://[^\s<>"]+|www\.[^\s<>"]+')
+
+# Sanitize filename function
+def sanitize_filename(filename):
+    safe_name = re.sub(r'[^\w\-_. ]', '', filename)  # Alphanumeric, underscore, hyphen, dot, space
+    safe_name = safe_name.replace('..', '')
+    return safe_name.strip() or "default"
+
+_magic = None
+_magic_lock = threading.Lock()
+
+# Process-wide libmagic detector (python-magic is imported and its database loaded on first use)
+def mime_detector():
+    global _magic
+    with _magic_lock:
+        if _magic is None:
+            import magic
+            _magic = magic.Magic(mime=True)
+    return _magic
+
+# MIME type of a byte buffer, sniffed from its header bytes
+def detect_mime(data):
+    return mime_detector().from_buffer(bytes(data[:MIME_SNIFF_BYTES]))
+
+# MIME type of a binary stream from its header bytes; the position is restored
+def sniff_mime(fileobj):
+    position = fileobj.tell()
+    fileobj.seek(0)
+    header = fileobj.read(MIME_SNIFF_BYTES)
+    fileobj.seek(position)
+    return detect_mime(header)
+
+def is_allowed_mime(mime_type):
+    return mime_type in ALLOWED_MIME_TYPES
+
+def is_valid_url(url):
+    return URL_PATTERN.match(url) is not None
+
+# Fallback project names when Gemini does not return a whitepaper_name
+def default_file_name(filename):
+    return filename.replace('.pdf', '').replace('.txt', '')
+
+def default_url_name(url):
+    return url.split('/')[-1] or "unknown_project"
+
+# Fallback name for a local path (batch mode)
+def default_path_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+# Stream an upload (binary file object) to a new, uniquely named temp file in chunks; returns its path
+def save_upload(fileobj, filename):
+    fd, path = tempfile.mkstemp(prefix="whitepaper_", suffix=os.path.splitext(filename)[1])
+    copy_upload(fileobj, fd)
+    return path
+
+# Copy a binary stream from its start to a file path or descriptor in COPY_CHUNK pieces
+def copy_upload(fileobj, destination):
+    position = fileobj.tell()
+    fileobj.seek(0)
+    with open(destination, "wb") as f:
+        shutil.copyfileobj(fileobj, f, COPY_CHUNK)
+    fileobj.seek(position)
@@ -0,0 +1,127 @@
+### Persistent cache of parsed Gemini evaluations
+#### Entries are keyed by document content, criteria set, system prompt and model name
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+# Cache location and eviction defaults (override with environment variables)
+CACHE_PATH = os.environ.get("FRAUD_CACHE_PATH", ".eval_cache.sqlite3")
+DEFAULT_TTL = int(os.environ.get("FRAUD_CACHE_TTL", 7 * 24 * 3600))  # 7 days
+DEFAULT_MAX_ENTRIES = int(os.environ.get("FRAUD_CACHE_MAX_ENTRIES", 1000))
+
+# Chunk size for hashing files and upload streams
+HASH_CHUNK = 1024 * 1024
+
+# SHA-256 of raw file bytes
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+# SHA-256 of a binary stream from its start, read through one reused buffer; the position is restored
+def hash_stream(fileobj, chunk_size=HASH_CHUNK):
+    position = fileobj.tell()
+    fileobj.seek(0)
+    digest = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    while True:
+        size = fileobj.readinto(buffer)
+        if not size:
+            break
+        digest.update(view[:size])
+    fileobj.seek(position)
+    return digest.hexdigest()
+
+def hash_file(path):
+    with open(path, "rb") as f:
+        return hash_stream(f)
+
+# Normalize a URL so trivially different spellings share one cache entry
+def normalize_url(url):
+    url = url.strip()
+    if url.lower().startswith("www."):
+        url = "https://" + url
+    parts = urlsplit(url)
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+# Hash of a normalized URL, used in place of file bytes for the URL tab
+def hash_url(url):
+    return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+
+# Build the cache key from everything that influences the model output
+def make_key(document_hash, criteria_set, criteria_list, system_prompt, model_name):
+    material = json.dumps(
+        [document_hash, criteria_set, criteria_list, system_prompt, model_name],
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class EvaluationCache:
+    def __init__(self, path=CACHE_PATH, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS evaluations ("
+                " key TEXT PRIMARY KEY,"
+                " whitepaper_name TEXT,"
+                " evaluations TEXT NOT NULL,"
+                " created REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_evaluations_last_access ON evaluations (last_access)")
+
+    def _connect(self):
+        # A fresh connection per operation keeps the cache safe across Streamlit sessions
+        return sqlite3.connect(self.path, timeout=30)
+
+    # Return (evaluations, whitepaper_name) for a live entry, or None
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT evaluations, whitepaper_name, created FROM evaluations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            evaluations, whitepaper_name, created = row
+            if self.ttl and now - created > self.ttl:
+                conn.execute("DELETE FROM evaluations WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE evaluations SET last_access = ? WHERE key = ?", (now, key))
+        return json.loads(evaluations), whitepaper_name
+
+    # Store an evaluation and evict expired / least recently used entries
+    def put(self, key, evaluations, whitepaper_name):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO evaluations (key, whitepaper_name, evaluations, created, last_access)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, whitepaper_name, json.dumps(evaluations, ensure_ascii=False), now, now)
+            )
+            self._evict(conn, now)
+
+    def invalidate(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM evaluations WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM evaluations")
+
+    def _evict(self, conn, now):
+        if self.ttl:
+            conn.execute("DELETE FROM evaluations WHERE created < ?", (now - self.ttl,))
+        if self.max_entries:
+            conn.execute(
+                "DELETE FROM evaluations WHERE key NOT IN ("
+                " SELECT key FROM evaluations ORDER BY last_access DESC LIMIT ?)",
+                (self.max_entries,)
+            )
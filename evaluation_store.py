@@ -0,0 +1,224 @@
+### Persistent store of completed evaluations
+#### Every scored document with its per-criterion results, for history, lookup and analytics
+#
+# Unlike the evaluation cache, nothing here expires: the store answers "have we already
+# scored this?" by document hash or project name long after cache entries are evicted.
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+STORE_PATH = os.environ.get("FRAUD_STORE_PATH", ".evaluations.sqlite3")
+
+# Rows per history page
+PAGE_SIZE = 25
+
+# Short fingerprint of a system prompt, stored as the prompt version
+def prompt_version(system_prompt):
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:12]
+
+
+class EvaluationStore:
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS evaluations ("
+                " id INTEGER PRIMARY KEY,"
+                " document_hash TEXT NOT NULL,"
+                " source TEXT,"
+                " whitepaper_name TEXT COLLATE NOCASE,"
+                " criteria_set TEXT NOT NULL,"
+                " model TEXT,"
+                " prompt_version TEXT,"
+                " mode TEXT,"
+                " probability REAL NOT NULL,"
+                " verdict TEXT NOT NULL,"
+                " fraud_criteria TEXT,"  # JSON list of IDs with result "yes"
+                " wall_seconds REAL,"
+                " stages TEXT,"  # JSON {stage: seconds}
+                " tokens TEXT,"  # JSON {field: count}
+                " created REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS criterion_results ("
+                " evaluation_id INTEGER NOT NULL REFERENCES evaluations (id) ON DELETE CASCADE,"
+                " criterion_id TEXT NOT NULL,"
+                " evidence TEXT,"
+                " result TEXT,"
+                " quote TEXT,"
+                " evaluation TEXT,"
+                " score REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_store_document_hash ON evaluations (document_hash, created)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_store_whitepaper_name ON evaluations (whitepaper_name)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_store_created ON evaluations (created)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_criterion_results_evaluation ON criterion_results (evaluation_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_criterion_results_criterion ON criterion_results (criterion_id, result)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    # Store a scored evaluation (scored as returned by scoring.score_document); returns its ID
+    def record(self, document_hash, source, whitepaper_name, criteria_set, model, system_prompt, evaluations, scored,
+               trace=None):
+        diagnostics = trace.to_dict() if trace is not None else {}
+        with self._connect() as conn:
+            evaluation_id = conn.execute(
+                "INSERT INTO evaluations (document_hash, source, whitepaper_name, criteria_set, model, prompt_version,"
+                " mode, probability, verdict, fraud_criteria, wall_seconds, stages, tokens, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (document_hash, source, whitepaper_name, criteria_set, model, prompt_version(system_prompt),
+                 diagnostics.get("mode"), scored["probability"], scored["verdict"],
+                 json.dumps(scored["fraud_criteria"]), diagnostics.get("wall_seconds"),
+                 json.dumps(diagnostics.get("stages", {})), json.dumps(diagnostics.get("tokens", {})), time.time())
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO criterion_results (evaluation_id, criterion_id, evidence, result, quote, evaluation, score)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(evaluation_id, item.get("ID"), item.get("Evidence"), item.get("result"), item.get("quote"),
+                  item.get("evaluation"), scored["scores"].get(item.get("ID")))
+                 for item in evaluations]
+            )
+        return evaluation_id
+
+    # Record an "All regulators" evaluation as one entry per criteria set (by_set from scoring.score_all_sets)
+    def record_sets(self, document_hash, source, whitepaper_name, model, system_prompt, evaluations, by_set, trace=None):
+        for criteria_set, scored in by_set.items():
+            ids = set(scored["scores"]) | set(scored["invalid"])
+            self.record(document_hash, source, whitepaper_name, criteria_set, model, system_prompt,
+                        [item for item in evaluations if item.get("ID") in ids], scored, trace)
+
+    # Most recent evaluation of a document (optionally for one criteria set), or None
+    def latest_for_hash(self, document_hash, criteria_set=None):
+        query = "SELECT * FROM evaluations WHERE document_hash = ?"
+        params = [document_hash]
+        if criteria_set:
+            query += " AND criteria_set = ?"
+            params.append(criteria_set)
+        with self._connect() as conn:
+            row = conn.execute(query + " ORDER BY created DESC LIMIT 1", params).fetchone()
+        return _summary(row) if row else None
+
+    # Per-criterion results of the latest evaluation of a document under each of the given criteria sets by
+    # this model and prompt, as evaluation items: ({criterion ID: item}, whitepaper_name). Later sets do not
+    # override a criterion already taken from an earlier one.
+    def latest_criterion_results(self, document_hash, criteria_sets, model, system_prompt):
+        results = {}
+        whitepaper_name = None
+        with self._connect() as conn:
+            for criteria_set in criteria_sets:
+                row = conn.execute(
+                    "SELECT id, whitepaper_name FROM evaluations WHERE document_hash = ? AND criteria_set = ?"
+                    " AND model = ? AND prompt_version = ? ORDER BY created DESC LIMIT 1",
+                    (document_hash, criteria_set, model, prompt_version(system_prompt))
+                ).fetchone()
+                if row is None:
+                    continue
+                whitepaper_name = whitepaper_name or row["whitepaper_name"]
+                for criterion in conn.execute(
+                        "SELECT criterion_id, evidence, result, quote, evaluation FROM criterion_results"
+                        " WHERE evaluation_id = ? ORDER BY rowid", (row["id"],)):
+                    results.setdefault(criterion["criterion_id"], {
+                        "ID": criterion["criterion_id"], "Evidence": criterion["evidence"],
+                        "result": criterion["result"], "quote": criterion["quote"],
+                        "evaluation": criterion["evaluation"]})
+        return results, whitepaper_name
+
+    # Labels of the latest evaluation of each document under each criteria set (optionally by one model):
+    # {document_hash: {"scores": {criterion ID: score}, "sets": {criteria set: (probability, verdict)}}}.
+    # Invalid criterion results have no score and are left out.
+    def labels(self, model=None):
+        clause = " WHERE model = ?" if model else ""
+        params = [model] if model else []
+        labels = {}
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT e.id, e.document_hash, e.criteria_set, e.probability, e.verdict, c.criterion_id, c.score"
+                " FROM evaluations e JOIN criterion_results c ON c.evaluation_id = e.id"
+                " WHERE e.id IN (SELECT id FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY document_hash, criteria_set"
+                " ORDER BY created DESC) AS n FROM evaluations" + clause + ") WHERE n = 1)", params
+            )
+            for row in rows:
+                label = labels.setdefault(row["document_hash"], {"scores": {}, "sets": {}})
+                label["sets"][row["criteria_set"]] = (row["probability"], row["verdict"])
+                if row["score"] is not None:
+                    label["scores"].setdefault(row["criterion_id"], row["score"])
+        return labels
+
+    # One page of evaluations, newest first; name_prefix matches the start of the project name
+    # (case-insensitively, using the name index). Returns (rows, total).
+    def history(self, page=0, page_size=PAGE_SIZE, name_prefix=None, criteria_set=None, verdict=None):
+        where = []
+        params = []
+        if name_prefix:
+            where.append("whitepaper_name LIKE ? ESCAPE '\\'")
+            params.append(name_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        if criteria_set:
+            where.append("criteria_set = ?")
+            params.append(criteria_set)
+        if verdict:
+            where.append("verdict = ?")
+            params.append(verdict)
+        clause = (" WHERE " + " AND ".join(where)) if where else ""
+        with self._connect() as conn:
+            total = conn.execute("SELECT COUNT(*) FROM evaluations" + clause, params).fetchone()[0]
+            rows = conn.execute(
+                "SELECT * FROM evaluations" + clause + " ORDER BY created DESC LIMIT ? OFFSET ?",
+                params + [page_size, page * page_size]
+            ).fetchall()
+        return [_summary(row) for row in rows], total
+
+    # Full evaluation with its per-criterion results, or None
+    def get(self, evaluation_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM evaluations WHERE id = ?", (evaluation_id,)).fetchone()
+            if row is None:
+                return None
+            criteria = conn.execute(
+                "SELECT criterion_id, evidence, result, quote, evaluation, score FROM criterion_results"
+                " WHERE evaluation_id = ? ORDER BY rowid", (evaluation_id,)
+            ).fetchall()
+        evaluation = _summary(row)
+        evaluation["stages"] = json.loads(row["stages"] or "{}")
+        evaluation["tokens"] = json.loads(row["tokens"] or "{}")
+        evaluation["criteria"] = [dict(criterion) for criterion in criteria]
+        return evaluation
+
+    # Aggregates for the analytics view
+    def analytics(self, criteria_set=None):
+        clause = " WHERE criteria_set = ?" if criteria_set else ""
+        params = [criteria_set] if criteria_set else []
+        with self._connect() as conn:
+            by_verdict = conn.execute(
+                "SELECT criteria_set, verdict, COUNT(*) AS count, AVG(probability) AS mean_probability"
+                " FROM evaluations" + clause + " GROUP BY criteria_set, verdict ORDER BY criteria_set, verdict", params
+            ).fetchall()
+            by_month = conn.execute(
+                "SELECT strftime('%Y-%m', created, 'unixepoch') AS month, COUNT(*) AS count,"
+                " AVG(probability) AS mean_probability FROM evaluations" + clause + " GROUP BY month ORDER BY month", params
+            ).fetchall()
+            by_criterion = conn.execute(
+                "SELECT c.criterion_id, COUNT(*) AS evaluated, SUM(c.result = 'yes') AS flagged"
+                " FROM criterion_results c JOIN evaluations e ON e.id = c.evaluation_id"
+                + clause.replace("criteria_set", "e.criteria_set") +
+                " GROUP BY c.criterion_id ORDER BY flagged * 1.0 / evaluated DESC, c.criterion_id", params
+            ).fetchall()
+        return {
+            "by_verdict": [dict(row) for row in by_verdict],
+            "by_month": [dict(row) for row in by_month],
+            "by_criterion": [dict(row) for row in by_criterion],
+        }
+
+# Evaluation row as a dict with decoded fraud criteria and a readable date
+def _summary(row):
+    summary = {key: row[key] for key in ("id", "document_hash", "source", "whitepaper_name", "criteria_set", "model",
+                                         "prompt_version", "mode", "probability", "verdict", "wall_seconds", "created")}
+    summary["fraud_criteria"] = json.loads(row["fraud_criteria"] or "[]")
+    summary["date"] = time.strftime("%Y-%m-%d %H:%M", time.localtime(row["created"]))
+    return summary
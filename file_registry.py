@@ -0,0 +1,59 @@
+### Registry of Gemini File API handles keyed by content hash
+#### Identical bytes are uploaded once and the handle is reused until it expires
+
+import os
+import sqlite3
+import time
+
+# Registry location (override with an environment variable)
+REGISTRY_PATH = os.environ.get("FRAUD_FILE_REGISTRY_PATH", ".gemini_files.sqlite3")
+
+# Gemini keeps uploaded files for 48 hours
+DEFAULT_FILE_LIFETIME = 48 * 3600
+
+# Stop reusing a handle this long before it expires so an evaluation never races the expiry
+EXPIRY_MARGIN = 3600
+
+
+class FileHandleRegistry:
+    def __init__(self, path=REGISTRY_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS gemini_files ("
+                " content_hash TEXT NOT NULL,"
+                " api_key_id TEXT NOT NULL,"
+                " file_name TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " PRIMARY KEY (content_hash, api_key_id))"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    # Gemini file name for content uploaded under an API key, or None if unknown or about to expire
+    def get(self, content_hash, api_key_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT file_name, expires_at FROM gemini_files WHERE content_hash = ? AND api_key_id = ?",
+                (content_hash, api_key_id)
+            ).fetchone()
+        if row is None or row[1] - EXPIRY_MARGIN <= time.time():
+            return None
+        return row[0]
+
+    def put(self, content_hash, api_key_id, file_name, expires_at=None):
+        expires_at = expires_at or time.time() + DEFAULT_FILE_LIFETIME
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO gemini_files (content_hash, api_key_id, file_name, expires_at)"
+                " VALUES (?, ?, ?, ?)",
+                (content_hash, api_key_id, file_name, expires_at)
+            )
+            conn.execute("DELETE FROM gemini_files WHERE expires_at < ?", (time.time(),))
+
+    def forget(self, content_hash, api_key_id):
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM gemini_files WHERE content_hash = ? AND api_key_id = ?", (content_hash, api_key_id)
+            )
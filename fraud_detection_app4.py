@@ -1,422 +1,27 @@
 ###Crypto-Fraud detection App. Criteria are selected from the regulators  
 #### Authors: Samuel Chan, Sergey Slizovskiy, Aseem Pahuja, Grok and Gemini
+#### Streamlit front-end: scoring lives in scoring.py, Gemini calls in gemini_client.py
 
 import streamlit as st
-import google.generativeai as genai
 import os
 import json
-import math
-import re
-import magic
+import time
 import pandas as pd
-
-# Maximum file size (100MB in bytes)
-MAX_SIZE = 100 * 1024 * 1024  # 100MB
-
-# System prompt for file-based evaluation
-file_system_prompt = """
-System Prompt — White-paper Fraud-Risk Evaluation
-
-1. Purpose  
-Evaluate a project’s white-paper (PDF file) against each fraud criteria supplied in JSON. For every criterion you must:
-
-• Locate supporting or contradictory passages in the white-paper text **and any information conveyed by figures or graphs**.  
-• Assign one evidence rating:  
-  – abundant evidence  
-  – some evidence  
-  – no evidence                     (document is silent on the point)  
-  – insufficient evidence to make a decision  
-• Output the exact sentence(s) or concise figure caption(s) you relied on, each ≤ 20 words.  
-• Write an evaluation (≤ 60 words) explaining how the quoted material supports the rating.  
-• Choose the result:  
-  – yes                       → criterion met → fraud indicator  
-  – no                        → criterion not met  
-  – insufficient evidence to make decision → cannot judge  
-  Important:  
-    ▸ If Evidence = “no evidence”, you MUST still set result to either “yes” or “no”.  
-    ▸ Result may be “insufficient evidence to make decision” only when Evidence is the same phrase.
-
-You may incorporate any internet or external knowledge sources if necessary.
-
-2. Inputs  
-
-• whitepaper_pdf (file): The complete PDF of the white-paper. Extract all text, figure captions, and, where possible, summarize graph data (e.g., axes labels, key values) before analysis.  
-• fraud_criteria (JSON): Contains an array of criteria in the format: 
-Example A  
-{
-  [
-    {
-      "ID": "FCA-001",
-      "criteria": "Misleading Statements Inducing Investment",
-      "description": "...",
-      "scope": "..."
-    },
-    {
-      "ID": "MISC-001",
-      "criteria": "Anonymous Or Pseudonymous Team",
-      "summary": "..."
-    }
-    // …more criteria
-  ]
-}
-
-3. Required Output  
-
-Return a JSON object with:  
-• "whitepaper_name": the title of the white-paper (use first PDF heading or metadata).  
-• One key exactly matching the fraud_criteria ID ("FCA-001", "MISC-015", etc.). 
-Its value is an array containing one object per original criterion (same ID order).
-
-Schema for every object  
-{
-  "ID": "FCA-001",
-  "Evidence": "abundant evidence | some evidence | no evidence | insufficient evidence to make a decision",
-  "quote": "<sentence(s) or figure caption(s) from the white-paper, ≤ 20 words each, separated by ' | ' if multiple>",
-  "evaluation": "<≤ 60-word explanation referencing the quote>",
-  "result": "yes | no | insufficient evidence to make decision"
-}
-
-4. Evidence-Level Definitions  
-
-• abundant evidence: Multiple explicit passages, data tables, or graphs strongly match the criterion.  
-• some evidence: One clear but limited passage or graph; partial alignment.  
-• no evidence: The white-paper is silent on the point; this absence can justify “yes” or “no” for the fraud.  
-• insufficient evidence to make decision: Information is too sparse or conflicting for a reliable choice.
-
-5. Evaluation Steps (internal)  
-
-1. Extract all text, figure captions, and key graph details from whitepaper_pdf.  
-2. Iterate through the criteria array.  
-3. For each criterion:  
-   – Search extracted content for relevant material.  
-   – Select an evidence rating.  
-   – Populate the quote field with up to two supporting excerpts (sentences or captions). If none, leave quote = "".  
-   – Draft evaluation (≤ 60 words).  
-   – Choose result following the rules above.  
-
-6. Output Rules  
-
-• Return only valid JSON (no Markdown, comments, or trailing commas).  
-• Maintain field order inside each item: ID, Evidence, quote, evaluation, result.  
-• All Evidence and result values must be lowercase.  
-• Do not exceed 20 words per quoted excerpt or 60 words in any evaluation.
-
-7. Style & Safety  
-
-• Avoid legal conclusions; align facts with criteria.  
-• Do not expose internal reasoning steps.  
-• If context is inadequate, set Evidence and result to “insufficient evidence to make decision”.
-"""
-
-# System prompt for URL-based evaluation
-url_system_prompt = """
-System Prompt — White-paper Fraud-Risk Evaluation from URL
-
-1. Purpose  
-Evaluate a project’s white-paper or project description, fetched from the provided URL, against each fraud criteria supplied in JSON. For every criterion you must:
-
-• Locate supporting or contradictory passages in the text **and any information conveyed by figures or graphs** from the webpage content.  
-• Assign one evidence rating:  
-  – abundant evidence  
-  – some evidence  
-  – no evidence                     (document is silent on the point)  
-  – insufficient evidence to make a decision  
-• Output the exact sentence(s) or concise figure caption(s) you relied on, each ≤ 20 words.  
-• Write an evaluation (≤ 60 words) explaining how the quoted material supports the rating.  
-• Choose the result:  
-  – yes                       → criterion met → fraud indicator  
-  – no                        → criterion not met  
-  – insufficient evidence to make decision → cannot judge  
-  Important:  
-    ▸ If Evidence = “no evidence”, you MUST still set result to either “yes” or “no”.  
-    ▸ Result may be “insufficient evidence to make decision” only when Evidence is the same phrase.
-
-You may incorporate any internet or external knowledge sources if necessary.
-
-2. Inputs  
-
-• whitepaper_url (string): The URL pointing to the white-paper or project description. Fetch and extract all relevant text, figure captions, and, where possible, summarize graph data (e.g., axes labels, key values) before analysis.  
-• fraud_criteria (JSON): Contains an array of criteria in the format: 
-Example A  
-{
-  [
-    {
-      "ID": "FCA-001",
-      "criteria": "Misleading Statements Inducing Investment",
-      "description": "...",
-      "scope": "..."
-    },
-    {
-      "ID": "MISC-001",
-      "criteria": "Anonymous Or Pseudonymous Team",
-      "summary": "..."
-    }
-    // …more criteria
-  ]
-}
-
-3. Required Output  
-
-Return a JSON object with:  
-• "whitepaper_name": the title of the white-paper or project (use webpage title, first heading, or metadata).  
-• One key exactly matching the fraud_criteria ID ("FCA-001", "MISC-015", etc.). 
-Its value is an array containing one object per original criterion (same ID order).
-
-Schema for every object  
-{
-  "ID": "FCA-001",
-  "Evidence": "abundant evidence | some evidence | no evidence | insufficient evidence to make a decision",
-  "quote": "<sentence(s) or figure caption(s) from the white-paper, ≤ 20 words each, separated by ' | ' if multiple>",
-  "evaluation": "<≤ 60-word explanation referencing the quote>",
-  "result": "yes | no | insufficient evidence to make decision"
-}
-
-4. Evidence-Level Definitions  
-
-• abundant evidence: Multiple explicit passages, data tables, or graphs strongly match the criterion.  
-• some evidence: One clear but limited passage or graph; partial alignment.  
-• no evidence: The white-paper is silent on the point; this absence can justify “yes” or “no” for the fraud.  
-• insufficient evidence to make decision: Information is too sparse or conflicting for a reliable choice.
-
-5. Evaluation Steps (internal)  
-
-1. Fetch and extract all text, figure captions, and key graph details from the content at whitepaper_url.  
-2. Iterate through the criteria array.  
-3. For each criterion:  
-   – Search extracted content for relevant material.  
-   – Select an evidence rating.  
-   – Populate the quote field with up to two supporting excerpts (sentences or captions). If none, leave quote = "".  
-   – Draft evaluation (≤ 60 words).  
-   – Choose result following the rules above.  
-
-6. Output Rules  
-
-• Return only valid JSON (no Markdown, comments, or trailing commas).  
-• Maintain field order inside each item: ID, Evidence, quote, evaluation, result.  
-• All Evidence and result values must be lowercase.  
-• Do not exceed 20 words per quoted excerpt or 60 words in any evaluation.
-
-7. Style & Safety  
-
-• Avoid legal conclusions; align facts with criteria.  
-• Do not expose internal reasoning steps.  
-• If context is inadequate, set Evidence and result to “insufficient evidence to make decision”.
-"""
-
-# Hardcoded criteria from criteria.json for each regulator
-criteria_data = {
-  "FCA": [
-    {
-      "ID": "FCA-001",
-      "criteria": "Misleading Statements Inducing Investment",
-      "description": "Prohibits making statements, promises, or forecasts known to be false or misleading, dishonestly concealing material facts, or recklessly making misleading statements to induce investment in cryptoassets. This includes creating false impressions about the market or value of such investments.",
-      "scope": "Applies to any person making such statements or creating such impressions concerning relevant investments, which explicitly include cryptoassets, to induce others to transact."
-    },
-    {
-      "ID": "FCA-005",
-      "criteria": "Manipulating Transactions and Disseminating False Information (MAR)",
-      "description": "Prohibits engaging in behaviour that gives, or is likely to give, false or misleading signals as to the supply, demand, or price of qualifying cryptoassets, or secures their price at an artificial level. This includes disseminating false or misleading information when the person knew or should have known it was false/misleading.",
-      "scope": "Applies to cryptoassets qualifying as financial instruments under MAR, prohibiting transactions, orders, or dissemination of information that distorts the market or misleads participants."
-    },
-    {
-      "ID": "FCA-007",
-      "criteria": "Carrying on Regulated Activities Without Authorisation (General Prohibition)",
-      "description": "Prohibits any person from carrying on a regulated activity in the UK by way of business, or purporting to do so, unless they are authorised by the FCA or exempt. Certain cryptoasset activities are defined as regulated activities.",
-      "scope": "Applies to persons conducting activities with cryptoassets that fall within the definition of \"regulated activity\" (e.g., certain exchanges, custodianship, dealing, arranging) in the UK without FCA authorisation or exemption."
-    }
-  ],
-  "SEC": [
-    {
-      "ID": "SEC-003",
-      "criteria": "Obtaining Money or Property by Material Misstatements or Omissions in Offer/Sale",
-      "description": "Makes it unlawful in the offer or sale of securities, using interstate commerce or mails, to obtain money or property through any untrue statement of a material fact or any omission of a material fact necessary to make the statements made not misleading.",
-      "scope": "Prohibits acquiring money or property via material misstatements or omissions when offering or selling securities, including crypto-assets, using jurisdictional means."
-    },
-    {
-      "ID": "SEC-008",
-      "criteria": "False or Misleading Statements to Induce Securities Purchase or Sale",
-      "description": "Prohibits brokers, dealers, or others from making false or misleading statements about a security (including crypto-assets) to induce its purchase or sale, if they knew or had reasonable grounds to believe the statement was false or misleading.",
-      "scope": "Targets the dissemination of false or misleading information by market participants to influence investment decisions in securities, including crypto-assets."
-    },
-    {
-      "ID": "SEC-012",
-      "criteria": "Manipulation of Security Prices",
-      "description": "Prohibits a series of transactions in any security creating actual or apparent active trading in such security or raising or depressing the price of such security, for the purpose of inducing the purchase or sale of such security by others.",
-      "scope": "Applies to manipulative practices that affect the price or trading volume of securities, including crypto-assets deemed securities, to deceive or induce investors."
-    },
-    {
-      "ID": "SEC-014",
-      "criteria": "General Prohibition of Manipulative and Deceptive Devices in Securities Transactions",
-      "description": "Broadly prohibits the use or employment of any manipulative or deceptive device or contrivance in connection with the purchase or sale of any security, in contravention of SEC rules (most notably Rule 10b-5).",
-      "scope": "A catch-all anti-fraud provision applicable to a wide range of deceptive practices in securities transactions, including those involving crypto-assets deemed securities."
-    },
-    {
-      "ID": "SEC-030",
-      "criteria": "Prevention of Misuse of Material Nonpublic Information by Investment Advisers",
-      "description": "Requires investment advisers to establish, maintain, and enforce written policies and procedures reasonably designed to prevent the misuse of material, nonpublic information by the adviser or its associates, in violation of securities laws.",
-      "scope": "Mandates preventive measures against insider trading for investment advisers dealing with any securities, including crypto-assets, where they might possess material nonpublic information."
-    }
-  ],
-  "HKSFC": [
-    {
-      "ID": "HKSFC-001",
-      "criteria": "FMSM.1: Fraudulent or Reckless Inducement to Invest",
-      "description": "Making fraudulent or reckless misrepresentations (e.g., false statements, unfulfillable promises, unjustified forecasts, or material omissions) to persuade individuals to invest in securities, structured products, collective investment schemes, or virtual assets. This conduct is an offence.",
-      "scope": "Prohibits inducing investment in securities, structured products, collective investment schemes (under SFO), or virtual assets (under AMLO) through fraudulent or reckless misrepresentations."
-    },
-    {
-      "ID": "HKSFC-003",
-      "criteria": "FMSM.3: Advertising Unlicensed Virtual Asset Services",
-      "description": "Issuing or possessing for issue an advertisement that, to the issuer's knowledge, promotes a person or entity as prepared to provide a Virtual Asset (VA) service when that person or entity is not licensed as required under the AMLO. This is an offence.",
-      "scope": "Prohibits the advertisement of VA services offered by persons known to be unlicensed to provide such services."
-    },
-    {
-      "ID": "HKSFC-005",
-      "criteria": "MM.2: Price Rigging",
-      "description": "Engaging in wash sales of securities that affect their price, or using fictitious or artificial transactions or devices, with the intention or recklessness of maintaining, increasing, reducing, stabilizing, or causing fluctuations in the price of securities or futures contracts. This conduct constitutes market misconduct and a criminal offence.",
-      "scope": "Prohibits manipulating the price of securities or futures contracts through wash sales affecting price or other fictitious or artificial transactions or devices."
-    },
-    {
-      "ID": "HKSFC-006",
-      "criteria": "MM.3: Stock Market Manipulation",
-      "description": "Entering into two or more transactions in a corporation's securities that increase, reduce, maintain, or stabilize their price, with the intention of inducing others to buy, sell, or subscribe for those securities or related corporation's securities. This conduct constitutes market misconduct and a criminal offence.",
-      "scope": "Prohibits series of transactions in a corporation's securities intended to manipulate their price and thereby induce others to trade."
-    },
-    {
-      "ID": "HKSFC-009",
-      "criteria": "FSDP.1: Use of Fraudulent or Deceptive Devices or Schemes in Transactions",
-      "description": "Employing any device, scheme, or artifice with intent to defraud or deceive, or engaging in any act, practice, or course of business which is fraudulent or deceptive, in transactions involving securities, futures contracts, leveraged foreign exchange trading, or virtual assets. This is an offence.",
-      "scope": "Prohibits broadly any fraudulent or deceptive schemes, devices, acts, or business practices in transactions involving securities, futures contracts, leveraged foreign exchange trading (under SFO), or virtual assets (under AMLO)."
-    },
-    {
-      "ID": "HKSFC-011",
-      "criteria": "UOUA.1: Unauthorized Public Offering or Promotion of Investments",
-      "description": "Issuing, or possessing for issue, an advertisement, invitation, or document containing an invitation to the public to enter into agreements for securities, structured products, or to acquire an interest in a collective investment scheme, without authorization from the Securities and Futures Commission (SFC). This is an offence.",
-      "scope": "Prohibits the unauthorized public offering or promotion of specified investment products (securities, structured products, collective investment schemes) to the public."
-    }
-  ]
-}
-
-# Selected Set criteria (from previous)
-selected_criteria = [
-    {
-      "ID": "SEC-030",
-      "criteria": "Prevention of Misuse of Material Nonpublic Information by Investment Advisers",
-      "description": "Requires investment advisers to establish, maintain, and enforce written policies and procedures reasonably designed to prevent the misuse of material, nonpublic information by the adviser or its associates, in violation of securities laws.",
-      "scope": "Mandates preventive measures against insider trading for investment advisers dealing with any securities, including crypto-assets, where they might possess material nonpublic information."
-    },
-    {
-      "ID": "SEC-008",
-      "criteria": "False or Misleading Statements to Induce Securities Purchase or Sale",
-      "description": "Prohibits brokers, dealers, or others from making false or misleading statements about a security (including crypto-assets) to induce its purchase or sale, if they knew or had reasonable grounds to believe the statement was false or misleading.",
-      "scope": "Targets the dissemination of false or misleading information by market participants to influence investment decisions in securities, including crypto-assets."
-    },
-    {
-      "ID": "SEC-014",
-      "criteria": "General Prohibition of Manipulative and Deceptive Devices in Securities Transactions",
-      "description": "Broadly prohibits the use or employment of any manipulative or deceptive device or contrivance in connection with the purchase or sale of any security, in contravention of SEC rules (most notably Rule 10b-5).",
-      "scope": "A catch-all anti-fraud provision applicable to a wide range of deceptive practices in securities transactions, including those involving crypto-assets deemed securities."
-    },
-    {
-      "ID": "FCA-005",
-      "criteria": "Manipulating Transactions and Disseminating False Information (MAR)",
-      "description": "Prohibits engaging in behaviour that gives, or is likely to give, false or misleading signals as to the supply, demand, or price of qualifying cryptoassets, or secures their price at an artificial level. This includes disseminating false or misleading information when the person knew or should have known it was false/misleading.",
-      "scope": "Applies to cryptoassets qualifying as financial instruments under MAR, prohibiting transactions, orders, or dissemination of information that distorts the market or misleads participants."
-    },
-    {
-      "ID": "HKSFC-001",
-      "criteria": "FMSM.1: Fraudulent or Reckless Inducement to Invest",
-      "description": "Making fraudulent or reckless misrepresentations (e.g., false statements, unfulfillable promises, unjustified forecasts, or material omissions) to persuade individuals to invest in securities, structured products, collective investment schemes, or virtual assets. This conduct is an offence.",
-      "scope": "Prohibits inducing investment in securities, structured products, collective investment schemes (under SFO), or virtual assets (under AMLO) through fraudulent or reckless misrepresentations."
-    },
-    {
-      "ID": "MISC-015",
-      "criteria": "Undisclosed Or Misleading Centralization",
-      "summary": "The project is marketed as decentralized but retains significant centralized control over funds, governance, or operations, creating an illusion of community ownership."
-    }
-]
-
-# Coefficients for each set
-coefficients_data = {
-    "Selected Set": {
-        "const": -7.2956,
-        "SEC-014": 1.9420,
-        "SEC-030": 2.4312,
-        "HKSFC-001": 2.4255,
-        "SEC-008": 2.0294,
-        "MISC-015": 2.0220,
-        "FCA-005": 1.7266
-    },
-    "FCA": {
-        "const": -4.0132,
-        "FCA-001": 1.9203,
-        "FCA-005": 3.4054,
-        "FCA-007": 1.0274
-    },
-    "SEC": {
-        "const": -5.2809,
-        "SEC-003": 1.6597,
-        "SEC-008": 2.4216,
-        "SEC-014": 2.1707,
-        "SEC-030": 1.9726,
-        "SEC-012": 1.4019
-    },
-    "HKSFC": {
-        "const": -4.7737,
-        "HKSFC-001": 2.1551,
-        "HKSFC-009": 2.3465,
-        "HKSFC-006": 1.5324,
-        "HKSFC-003": 1.1324,
-        "HKSFC-005": 0.4604,
-        "HKSFC-011": 0.7876
-    }
-}
-
-# Sanitize filename function
-def sanitize_filename(filename):
-    safe_name = re.sub(r'[^\w\-_. ]', '', filename)  # Alphanumeric, underscore, hyphen, dot, space
-    safe_name = safe_name.replace('..', '')
-    return safe_name.strip() or "default"
-
-# Mapping function
-def map_to_result(evidence, result):
-    if evidence == "no evidence" and result == "no":
-        return 0
-    elif evidence == "no evidence" and result == "yes":
-        return 1
-    elif evidence == "some evidence" and result == "yes":
-        return 0.75
-    elif evidence == "some evidence" and result == "no":
-        return 0.25
-    elif evidence == "insufficient evidence to make decision" and result == "insufficient evidence to make decision":
-        return 0.5
-    elif evidence == "some evidence" and result == "insufficient evidence to make decision":
-        return 0.5
-    elif evidence == "abundant evidence" and result == "yes":
-        return 1
-    elif evidence == "abundant evidence" and result == "no":
-        return 0
-    else:
-        raise ValueError(f"Invalid combination: Evidence={evidence}, Result={result}")
-
-# Function to process Gemini response
-def process_response(response_text):
-    response_text = response_text.strip()
-    if response_text.startswith('```json'):
-        response_text = response_text[7:].strip()
-    if response_text.endswith('```'):
-        response_text = response_text[:-3].strip()
-    start_idx = response_text.find('{')
-    end_idx = response_text.rfind('}')
-    if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-        json_str = response_text[start_idx:end_idx + 1]
-    else:
-        json_str = response_text
-    def fix_trailing_commas(js):
-        return re.sub(r',\s*([}\]])', r'\1', js)
-    json_str = fix_trailing_commas(json_str)
-    return json_str
-
+import gemini_client
+from gemini_client import MODEL_NAME, file_system_prompt, url_system_prompt, excerpt_system_prompt, section_system_prompt
+from gemini_client import criteria_groups, FAST_MODEL_NAME, ESCALATE_CRITERIA
+from scoring import (CRITERIA_SETS, ALL_REGULATORS, UNSURE_VERDICT, get_criteria_set, parse_response, score_document,
+                     score_all_sets, result_table, merge_section_evaluations, probability_bounds, ESCALATION_MARGIN)
+from documents import (MAX_SIZE, sanitize_filename, sniff_mime, is_allowed_mime, is_valid_url,
+                       default_file_name, default_url_name, save_upload)
+from evaluation_cache import EvaluationCache, hash_stream, hash_url, make_key
+from file_registry import FileHandleRegistry
+from evaluation_store import EvaluationStore, PAGE_SIZE
+from stream_parser import IncrementalEvaluationParser
+from preextract import extract_excerpts, split_sections, section_prompt
+from instrumentation import EvaluationTrace, span, emit
+from job_queue import ACTIVE_STATUSES, JobQueue
+from url_fetcher import UrlFetcher
 
 # Streamlit app
 st.title("Crypto Project Fraud Detection App")
@@ -428,186 +33,564 @@ api_key = st.text_input("Gemini API Key", type="password")
 # Configure API key
 if api_key:
     try:
-        genai.configure(api_key=api_key)
+        gemini_client.configure(api_key)
     except Exception as e:
         st.error(f"Invalid user-provided API key: {e}")
         st.stop()
 else:
     try:
         # Try to use key from st.secrets
-        genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
+        gemini_client.configure(st.secrets["GEMINI_API_KEY"])
     except (KeyError, Exception):
         # Fall back to hardcoded key
-        st.error(f"Invalid API key. Please provide a valid API key.")
+        st.error("Invalid API key. Please provide a valid API key.")
         st.stop()
 
 # Select criteria set
-selected_set = st.selectbox("Select Criteria Set", ["Selected Set", "FCA", "SEC", "HKSFC"], index=0)
-
-# Set criteria list and coefficients based on selection
-if selected_set == "Selected Set":
-    criteria_list = selected_criteria
-    coefficients = coefficients_data["Selected Set"]
-elif selected_set == "FCA":
-    criteria_list = criteria_data["FCA"]
-    coefficients = coefficients_data["FCA"]
-elif selected_set == "SEC":
-    criteria_list = criteria_data["SEC"]
-    coefficients = coefficients_data["SEC"]
-else:
-    criteria_list = criteria_data["HKSFC"]
-    coefficients = coefficients_data["HKSFC"]
-
-# Create lookup for criterion names
-criteria_lookup = {item["ID"]: item["criteria"] for item in criteria_list}
-
-# Tabs for file upload and URL input
-tab1, tab2 = st.tabs(["Upload File", "Submit URL"])
+# "All regulators" evaluates the union of all criteria once and scores it with every set
+selected_set = st.selectbox("Select Criteria Set", CRITERIA_SETS + [ALL_REGULATORS], index=0)
+
+# Set criteria list and coefficients based on selection (no single coefficient set for ALL_REGULATORS)
+criteria_list, coefficients = get_criteria_set(selected_set)
+
+# Cached evaluations are reused across reruns unless a fresh evaluation is requested
+evaluation_cache = EvaluationCache()
+file_registry = FileHandleRegistry()  # Gemini file handles reused for identical uploads
+evaluation_store = EvaluationStore()  # Permanent record of every completed evaluation
+if gemini_client.CONTEXT_CACHE_ENABLED:
+    gemini_client.enable_context_cache(file_registry)  # Prompt prefixes are shared like file handles
+force_refresh = st.checkbox("Force re-evaluate (ignore cached results)", value=False)
+
+# Evaluation modes are exclusive, so one is picked; file-upload modes evaluate URLs with a single request
+EVALUATION_MODES = {
+    "single": "Single request",
+    "parallel": "Evaluate criteria in parallel and show results as they arrive (file upload)",
+    "adaptive": "Evaluate the highest-weight criteria first and stop once the verdict is settled (file upload)",
+    "sections": "Split long documents into sections and merge the results (file upload)",
+    "stream": "Stream results as Gemini generates them",
+    "cascade": "Fast first pass with Gemini Flash; escalate only borderline documents to Pro",
+}
+selected_mode = st.radio("Evaluation mode", list(EVALUATION_MODES), format_func=EVALUATION_MODES.get)
+
+# Per-criterion fan-out: criteria groups are evaluated concurrently against the uploaded file
+FANOUT_GROUP_SIZE = 1  # Criteria per request
+FANOUT_WORKERS = 6  # Concurrent requests
+parallel_mode = selected_mode == "parallel"
+
+# Adaptive: highest-weight criteria first, in concurrent batches, until the remaining ones cannot change the verdict
+ADAPTIVE_BATCH_SIZE = 4  # Criteria per batch (one request each)
+adaptive_mode = selected_mode == "adaptive"
+
+# Map-reduce: long documents are split into sections, evaluated concurrently and merged per criterion
+SECTION_WORKERS = 4  # Concurrent section requests
+section_mode = selected_mode == "sections"
+
+# Streaming: each criterion object is parsed and shown as soon as Gemini closes it
+stream_mode = selected_mode == "stream"
+
+# Model cascade: a fast Flash pass first; only borderline documents (and only their uncertain criteria) go to Pro
+CASCADE_LABEL = gemini_client.cascade_label(FAST_MODEL_NAME, MODEL_NAME, ESCALATION_MARGIN, ESCALATE_CRITERIA)
+cascade_mode = selected_mode == "cascade"
+
+# Local pre-extraction: only the top-k passages per criterion are sent instead of the whole file (not with sections)
+PRUNE_TOP_K = 6  # Passages per criterion
+prune_mode = st.checkbox("Pre-extract relevant passages locally instead of uploading the whole file", value=False)
+
+# Diagnostics: per-stage timings and token counts of the evaluation
+show_diagnostics = st.checkbox("Show diagnostics (per-stage timings and tokens)", value=False)
+
+# Background jobs: evaluations run in worker.py processes and are tracked by job ID in the page URL
+JOB_POLL_SECONDS = 2
+job_queue = JobQueue()
+queue_mode = st.checkbox("Run evaluations in the background job queue (requires running `python worker.py`)", value=False)
+
+# URL pre-fetch: PDF/TXT links are downloaded (re-validated with ETag/Last-Modified) and evaluated like uploads
+url_fetcher = UrlFetcher()
+fetch_mode = st.checkbox("Fetch PDF/TXT links locally and reuse evaluations of unchanged content", value=True)
+
+# Submit a job once per session and input; the job ID goes into the URL so a refresh keeps tracking it
+def submit_job(cache_key, submit):
+    submitted = st.session_state.setdefault("submitted_jobs", {})
+    if cache_key not in submitted:
+        submitted[cache_key] = submit()
+    st.query_params["job"] = submitted[cache_key]
+    return submitted[cache_key]
+
+# Scores of the evaluations; in "All regulators" mode also one probability and verdict per set
+def score_results(evaluations):
+    if coefficients is None:
+        return score_all_sets(evaluations)
+    return score_document(evaluations, coefficients), None
+
+# Show a running probability estimate and results table for partial evaluations
+def show_partial_results(partial_evaluations, estimate_placeholder, table_placeholder):
+    # Criteria still pending count as 0, like missing ones
+    partial, partial_by_set = score_results(partial_evaluations)
+    if partial_by_set is None:
+        estimate = f"{partial['probability']:.4f}"
+    else:
+        estimate = ", ".join(f"{name} {result['probability']:.4f}" for name, result in partial_by_set.items())
+    estimate_placeholder.write(f"**Running Fraud Probability estimate** ({len(partial['scores'])}/{len(criteria_list)} criteria): {estimate}")
+    table_placeholder.table(pd.DataFrame(result_table(partial_evaluations, partial["scores"], criteria_list)))
+
+# Model cascade over one document; evaluate(model_name, criteria) returns the raw response text.
+# Returns (whitepaper_name, evaluations, stages) and records the models used on the trace.
+def run_cascade(evaluate, trace):
+    def run_stage(stage_model, stage_criteria):
+        response_text = evaluate(stage_model, stage_criteria)
+        with trace.span("parse"):
+            stage_name, stage_evaluations, _ = parse_response(response_text)
+        return stage_name, stage_evaluations
+
+    sets = [selected_set] if coefficients is not None else CRITERIA_SETS
+    result = gemini_client.evaluate_cascade(run_stage, criteria_list, {name: get_criteria_set(name)[1] for name in sets},
+                                            trace=trace)
+    trace.model = ">".join(stage["model"] for stage in result[2])
+    return result
+
+# Consume streamed response chunks with live updates; returns (whitepaper_name, evaluations, complete)
+def stream_evaluation(chunks):
+    parser = IncrementalEvaluationParser()
+    streamed = []
+    estimate_placeholder = st.empty()
+    table_placeholder = st.empty()
+    for chunk in chunks:
+        completed = parser.feed(chunk)
+        if completed:
+            streamed.extend(completed)
+            show_partial_results(streamed, estimate_placeholder, table_placeholder)
+    estimate_placeholder.empty()
+    table_placeholder.empty()
+    if parser.errors:
+        st.warning(f"Skipped {len(parser.errors)} malformed criterion object(s) in the Gemini response.")
+    if parser.stack:
+        st.warning("Gemini response was truncated; showing the criteria that were complete.")
+    return parser.whitepaper_name, streamed, parser.complete
+
+# Tell the user when a document was already scored, even if its cache entry has expired
+def show_previous_evaluation(document_hash):
+    previous = evaluation_store.latest_for_hash(document_hash)
+    if previous is not None:
+        st.info(f"Already scored on {previous['date']} as \"{previous['whitepaper_name']}\" "
+                f"({previous['criteria_set']}: probability {previous['probability']:.4f}, verdict {previous['verdict']}).")
+
+# Tabs for file upload, URL input and past evaluations
+tab1, tab2, tab3 = st.tabs(["Upload File", "Submit URL", "History"])
 
 # Initialize variables
 evaluations = []
 whitepaper_name = None
 temp_path = None
+trace = None
+document_hash = None
+system_prompt = None
+store_result = False  # Record the result in the evaluation store (fresh and complete evaluations only)
+skipped_ids = []  # Criteria left out by adaptive evaluation once the verdict was settled
+cascade_stages = []  # Model, timing and verdict of each cascade stage
+evaluation_mode = selected_mode + ("+excerpts" if prune_mode and not section_mode else "")
 
 with tab1:
     uploaded_file = st.file_uploader("Upload a PDF or TXT whitepaper/description", type=["pdf", "txt"])
     if uploaded_file is not None:
         # Sanitize filename
         safe_filename = sanitize_filename(uploaded_file.name)
+        trace = EvaluationTrace(safe_filename, selected_set, MODEL_NAME, evaluation_mode)
         
         # Check file size
         if uploaded_file.size > MAX_SIZE:
             st.error(f"{safe_filename} exceeds 100MB limit!")
             st.stop()
 
-        # Validate file content
-        mime_checker = magic.Magic(mime=True)
-        file_content = uploaded_file.read()
-        file_type = mime_checker.from_buffer(file_content)
-        if file_type not in ["application/pdf", "text/plain"]:
+        # Validate file content from its header bytes; the upload is never copied whole into memory
+        with trace.span("mime_sniff"):
+            mime_type = sniff_mime(uploaded_file)
+        if not is_allowed_mime(mime_type):
             st.error(f"Invalid file type for {safe_filename}. Only PDF or TXT files are allowed.")
             st.stop()
 
-        # Save uploaded file temporarily
-        temp_path = f"temp_{safe_filename}"
-        with open(temp_path, "wb") as f:
-            f.write(file_content)
-
-        # Upload to Gemini and evaluate
-        try:
-            gemini_file = genai.upload_file(temp_path)
-            st.success(f"File {safe_filename} uploaded to Gemini for evaluation. \n  Please, wait for 40 seconds for the result to appear")
-            model = genai.GenerativeModel(model_name='gemini-2.5-pro', system_instruction=file_system_prompt)
-            criteria_str = json.dumps({"criteria": criteria_list}, indent=2)
-            user_prompt = f"Evaluate the attached whitepaper against the following criteria:\n{criteria_str}"
-            response = model.generate_content([gemini_file, user_prompt])
-            json_str = process_response(response.text)
-
-            # Parse response
+        # Reuse a cached evaluation of identical bytes, criteria, prompt and model
+        with trace.span("hash"):
+            content_hash = hash_stream(uploaded_file)
+        document_hash = content_hash
+        show_previous_evaluation(document_hash)
+        # Workers always send the whole file
+        if queue_mode:
+            system_prompt = file_system_prompt
+        else:
+            system_prompt = section_system_prompt if section_mode else excerpt_system_prompt if prune_mode else file_system_prompt
+        # Cascade results are cached apart from Pro-only ones; queued jobs always run Pro only
+        key_model = CASCADE_LABEL if evaluation_mode.startswith("cascade") and not queue_mode else MODEL_NAME
+        cache_key = make_key(content_hash, selected_set, criteria_list, system_prompt, key_model)
+        with trace.span("cache_lookup"):
+            cached = None if force_refresh else evaluation_cache.get(cache_key)
+        if cached is not None:
+            evaluations, whitepaper_name = cached
+            trace.mode = "cached"
+            st.info(f"Loaded cached evaluation for {safe_filename}.")
+        elif queue_mode:
+            # The worker stores its result in the shared cache under the same key
+            submit_job(cache_key, lambda: job_queue.submit_file(uploaded_file, safe_filename, selected_set,
+                                                               MODEL_NAME, cache_key, force_refresh))
+        else:
+            # Upload to Gemini (reusing a live handle for identical bytes) and evaluate
+            failed_ids = []
             try:
-                evaluation_json = json.loads(json_str)
-                whitepaper_name = evaluation_json.get("whitepaper_name", safe_filename.replace('.pdf', '').replace('.txt', ''))
-                evaluations = []
-                for key, value in evaluation_json.items():
-                    if key != "whitepaper_name":
-                        if isinstance(value, list):
-                            evaluations.extend(value)
-                        else:
+                if section_mode:
+                    # One text block per section takes the place of the uploaded file
+                    with trace.span("temp_write"):
+                        temp_path = save_upload(uploaded_file, safe_filename)
+                    with trace.span("split_sections"):
+                        title, sections = split_sections(temp_path, mime_type)
+                    if not sections:
+                        st.error(f"No text could be extracted from {safe_filename}. Disable sectioned evaluation to send the whole file.")
+                        os.remove(temp_path)
+                        st.stop()
+                    section_texts = [section_prompt(title, section, i, len(sections)) for i, section in enumerate(sections)]
+                elif prune_mode:
+                    # The excerpt text block takes the place of the uploaded file
+                    with trace.span("temp_write"):
+                        temp_path = save_upload(uploaded_file, safe_filename)
+                    with trace.span("pre_extract"):
+                        excerpts = extract_excerpts(temp_path, criteria_list, PRUNE_TOP_K, mime_type)
+                    if not excerpts.passage_count:
+                        st.error(f"No text could be extracted from {safe_filename}. Disable pre-extraction to send the whole file.")
+                        os.remove(temp_path)
+                        st.stop()
+                    st.info(f"Pre-extracted {len(excerpts.selected_indices)} relevant passages ({excerpts.selected_words} of {excerpts.total_words} words).")
+                    gemini_file = excerpts.to_prompt()
+                else:
+                    gemini_file = gemini_client.registered_file(content_hash, file_registry, trace)
+                    if gemini_file is None:
+                        # Save uploaded file to a per-session temp file straight from the upload buffer
+                        with trace.span("temp_write"):
+                            temp_path = save_upload(uploaded_file, safe_filename)
+                        gemini_file = gemini_client.upload_and_register(temp_path, content_hash, file_registry, trace)
+                if section_mode:
+                    st.success(f"File {safe_filename} split into {len(sections)} sections for evaluation. \n  Sections are evaluated in parallel and merged per criterion")
+                    progress_bar = st.progress(0.0)
+                    section_results = [None] * len(sections)
+                    section_names = [None] * len(sections)
+                    sections_done = 0
+                    for index, section_name, section_evaluations, error in gemini_client.evaluate_sections(
+                            section_texts, criteria_list, SECTION_WORKERS, trace=trace):
+                        sections_done += 1
+                        progress_bar.progress(sections_done / len(sections), text=f"{sections_done}/{len(sections)} sections evaluated")
+                        if error is not None:
+                            failed_ids = [item["ID"] for item in criteria_list]  # Do not cache a merge with missing sections
+                            first, last = sections[index]["pages"]
+                            st.warning(f"Evaluation of section {index + 1} (pages {first}-{last}) failed after retries: {error}")
+                            continue
+                        section_results[index] = section_evaluations
+                        section_names[index] = section_name
+                    progress_bar.empty()
+                    with trace.span("merge"):
+                        evaluations = merge_section_evaluations([result for result in section_results if result])
+                    whitepaper_name = next((name for name in section_names if name), None) or title or default_file_name(safe_filename)
+                    if not evaluations:
+                        st.error("No section could be evaluated. Unable to process evaluation.")
+                        os.remove(temp_path)
+                        st.stop()
+                elif adaptive_mode:
+                    st.success(f"File {safe_filename} uploaded to Gemini for evaluation. \n  The highest-weight criteria are evaluated first until the verdict is settled")
+                    estimate_placeholder = st.empty()
+                    table_placeholder = st.empty()
+                    coefficient_sets = [coefficients] if coefficients is not None else [get_criteria_set(name)[1] for name in CRITERIA_SETS]
+                    for batch_name, batch_evaluations, batch_failed, skipped_ids in gemini_client.evaluate_adaptive(
+                            gemini_file, criteria_list, coefficient_sets, ADAPTIVE_BATCH_SIZE, ADAPTIVE_BATCH_SIZE,
+                            system_prompt=system_prompt, trace=trace):
+                        if batch_failed:
+                            failed_ids.extend(batch_failed)
+                            st.warning(f"Evaluation of {', '.join(batch_failed)} failed after retries.")
+                        whitepaper_name = whitepaper_name or batch_name
+                        evaluations.extend(batch_evaluations)
+                        if evaluations:
+                            show_partial_results(evaluations, estimate_placeholder, table_placeholder)
+                    whitepaper_name = whitepaper_name or default_file_name(safe_filename)
+                    estimate_placeholder.empty()
+                    table_placeholder.empty()
+                elif parallel_mode:
+                    st.success(f"File {safe_filename} uploaded to Gemini for evaluation. \n  Criteria results appear below as they arrive")
+                    progress_bar = st.progress(0.0)
+                    estimate_placeholder = st.empty()
+                    table_placeholder = st.empty()
+                    groups_total = len(criteria_groups(criteria_list, FANOUT_GROUP_SIZE))
+                    groups_done = 0
+                    for group_ids, group_name, group_evaluations, error in gemini_client.evaluate_criteria_parallel(
+                            gemini_file, criteria_list, FANOUT_GROUP_SIZE, FANOUT_WORKERS, system_prompt=system_prompt, trace=trace):
+                        groups_done += 1
+                        progress_bar.progress(groups_done / groups_total, text=f"{groups_done}/{groups_total} criteria groups evaluated")
+                        if error is not None:
+                            failed_ids.extend(group_ids)
+                            st.warning(f"Evaluation of {', '.join(group_ids)} failed after retries: {error}")
+                            continue
+                        whitepaper_name = whitepaper_name or group_name
+                        evaluations.extend(group_evaluations)
+                        show_partial_results(evaluations, estimate_placeholder, table_placeholder)
+                    whitepaper_name = whitepaper_name or default_file_name(safe_filename)
+                    progress_bar.empty()
+                    estimate_placeholder.empty()
+                    table_placeholder.empty()
+                elif stream_mode:
+                    st.success(f"File {safe_filename} uploaded to Gemini for evaluation. \n  Criteria results appear below as they are generated")
+                    whitepaper_name, evaluations, complete = stream_evaluation(gemini_client.stream_uploaded_file(gemini_file, criteria_list, system_prompt=system_prompt, trace=trace))
+                    whitepaper_name = whitepaper_name or default_file_name(safe_filename)
+                    if not complete:
+                        failed_ids = [item["ID"] for item in criteria_list]  # Do not cache partial output
+                    if not evaluations:
+                        st.error("Gemini response contained no complete criterion evaluations. Unable to process evaluation.")
+                        if temp_path and os.path.exists(temp_path):
+                            os.remove(temp_path)
+                        st.stop()
+                elif cascade_mode:
+                    st.success(f"File {safe_filename} uploaded to Gemini for evaluation. \n  A fast first pass runs first; borderline results are re-checked with {MODEL_NAME}")
+                    whitepaper_name, evaluations, cascade_stages = run_cascade(
+                        lambda stage_model, stage_criteria: gemini_client.evaluate_uploaded_file(
+                            gemini_file, stage_criteria, stage_model, system_prompt, trace), trace)
+                    whitepaper_name = whitepaper_name or default_file_name(safe_filename)
+                else:
+                    st.success(f"File {safe_filename} uploaded to Gemini for evaluation. \n  Please, wait for 40 seconds for the result to appear")
+                    response_text = gemini_client.evaluate_uploaded_file(gemini_file, criteria_list, system_prompt=system_prompt, trace=trace)
+
+                    # Parse response
+                    try:
+                        with trace.span("parse"):
+                            whitepaper_name, evaluations, skipped = parse_response(response_text)
+                        whitepaper_name = whitepaper_name or default_file_name(safe_filename)
+                        for key, value in skipped.items():
                             st.warning(f"Expected a list for key {key}, got {type(value)}. Skipping: {value}")
-            except json.JSONDecodeError as e:
-                st.error(f"Invalid JSON response from Gemini: {e}. Unable to process evaluation.")
-                if os.path.exists(temp_path):
+                    except json.JSONDecodeError as e:
+                        st.error(f"Invalid JSON response from Gemini: {e}. Unable to process evaluation.")
+                        if temp_path and os.path.exists(temp_path):
+                            os.remove(temp_path)
+                        st.stop()
+
+            except Exception as e:
+                st.error(f"Error processing file {safe_filename}: {e}")
+                if temp_path and os.path.exists(temp_path):
+                    os.remove(temp_path)
+                st.stop()
+            except Exception as e:
+                st.error(f"Error processing file {safe_filename}: {e}")
+                if temp_path and os.path.exists(temp_path):
                     os.remove(temp_path)
                 st.stop()
 
-        except Exception as e:
-            st.error(f"Error processing file {safe_filename}: {e}")
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            st.stop()
-        except Exception as e:
-            st.error(f"Error processing file {safe_filename}: {e}")
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            st.stop()
+            if evaluations and not failed_ids:
+                if not skipped_ids:  # Adaptive results are stored but not cached, so full evaluations can replace them
+                    with trace.span("cache_store"):
+                        evaluation_cache.put(cache_key, evaluations, whitepaper_name)
+                store_result = True
 
 with tab2:
     url = st.text_input("Enter the URL to a crypto-project whitepaper or description")
     if st.button("Submit Link") and url:
         # Validate URL format
-        url_pattern = re.compile(r'https?://[^\s<>"]+|www\.[^\s<>"]+')
-        if not url_pattern.match(url):
+        if not is_valid_url(url):
             st.error("Invalid URL format. Please enter a valid URL starting with http:// or https://")
             st.stop()
+        trace = EvaluationTrace(url, selected_set, MODEL_NAME, "stream" if stream_mode else "cascade" if cascade_mode else "single")
 
-        st.success(f"URL {url} uploaded to Gemini for evaluation. \n  Please, wait for 40 seconds for the result to appear")  
-      # Evaluate URL content with Gemini
-        try:
-            model = genai.GenerativeModel(model_name='gemini-2.5-pro', system_instruction=url_system_prompt)
-            criteria_str = json.dumps({"criteria": criteria_list}, indent=2)
-            user_prompt = f"Evaluate the whitepaper or project description at the following URL against the provided criteria:\nURL: {url}\nCriteria:\n{criteria_str}"
-            response = model.generate_content([user_prompt])
-            json_str = process_response(response.text)
-
-            # Parse response
+        # Fetched PDF/TXT content is evaluated like an upload and keyed by its bytes, so an unchanged
+        # document reuses its evaluation; other content (e.g. HTML pages) is read by Gemini from the URL
+        fetched = None
+        if fetch_mode:
+            try:
+                with trace.span("fetch"):
+                    fetched = url_fetcher.fetch(url)
+            except Exception as e:
+                st.warning(f"Could not fetch {url} locally ({e}). Gemini will read it from the URL.")
+            if fetched is not None and not is_allowed_mime(fetched.mime_type):
+                fetched = None
+
+        # Reuse a cached evaluation of the same content (or normalized URL), criteria, prompt and model
+        if fetched is not None:
+            document_hash = fetched.content_hash
+            system_prompt = file_system_prompt
+            if not fetched.changed:
+                st.info(f"{url} is unchanged since it was last fetched.")
+        else:
+            document_hash = hash_url(url)
+            system_prompt = url_system_prompt
+        show_previous_evaluation(document_hash)
+        key_model = CASCADE_LABEL if trace.mode == "cascade" and not queue_mode else MODEL_NAME
+        cache_key = make_key(document_hash, selected_set, criteria_list, system_prompt, key_model)
+        with trace.span("cache_lookup"):
+            cached = None if force_refresh else evaluation_cache.get(cache_key)
+        if cached is not None:
+            evaluations, whitepaper_name = cached
+            trace.mode = "cached"
+            st.info(f"Loaded cached evaluation for {url}.")
+        elif queue_mode and fetched is not None:
+            def submit_fetched():
+                with open(fetched.path, "rb") as f:
+                    return job_queue.submit_file(f, fetched.filename(), selected_set, MODEL_NAME, cache_key, force_refresh)
+            submit_job(cache_key, submit_fetched)
+        elif queue_mode:
+            submit_job(cache_key, lambda: job_queue.submit_url(url, selected_set, MODEL_NAME, cache_key, force_refresh))
+        else:
+            st.success(f"URL {url} uploaded to Gemini for evaluation. \n  Please, wait for 40 seconds for the result to appear")  
+            # Evaluate URL content with Gemini
+            complete = True
             try:
-                evaluation_json = json.loads(json_str)
-                whitepaper_name = evaluation_json.get("whitepaper_name", url.split('/')[-1] or "unknown_project")
-                evaluations = []
-                for key, value in evaluation_json.items():
-                    if key != "whitepaper_name":
-                        if isinstance(value, list):
-                            evaluations.extend(value)
-                        else:
+                if fetched is not None:
+                    # Upload the fetched body (reusing a live handle for identical bytes)
+                    gemini_file = (gemini_client.registered_file(fetched.content_hash, file_registry, trace)
+                                   or gemini_client.upload_and_register(fetched.path, fetched.content_hash, file_registry, trace))
+                if stream_mode:
+                    if fetched is not None:
+                        chunks = gemini_client.stream_uploaded_file(gemini_file, criteria_list, trace=trace)
+                    else:
+                        chunks = gemini_client.stream_url(url, criteria_list, trace=trace)
+                    whitepaper_name, evaluations, complete = stream_evaluation(chunks)
+                    whitepaper_name = whitepaper_name or default_url_name(url)
+                    if not evaluations:
+                        st.error("Gemini response contained no complete criterion evaluations. Unable to process evaluation.")
+                        st.stop()
+                    st.success("URL content evaluated successfully.")
+                elif cascade_mode:
+                    if fetched is not None:
+                        evaluate = lambda stage_model, stage_criteria: gemini_client.evaluate_uploaded_file(
+                            gemini_file, stage_criteria, stage_model, trace=trace)
+                    else:
+                        evaluate = lambda stage_model, stage_criteria: gemini_client.evaluate_url(
+                            url, stage_criteria, stage_model, trace=trace)
+                    whitepaper_name, evaluations, cascade_stages = run_cascade(evaluate, trace)
+                    whitepaper_name = whitepaper_name or default_url_name(url)
+                    st.success("URL content evaluated successfully.")
+                elif fetched is not None:
+                    response_text = gemini_client.evaluate_uploaded_file(gemini_file, criteria_list, trace=trace)
+                else:
+                    response_text = gemini_client.evaluate_url(url, criteria_list, trace=trace)
+
+                if not (stream_mode or cascade_mode):
+                    # Parse response (fetched body or URL)
+                    try:
+                        with trace.span("parse"):
+                            whitepaper_name, evaluations, skipped = parse_response(response_text)
+                        whitepaper_name = whitepaper_name or default_url_name(url)
+                        for key, value in skipped.items():
                             st.warning(f"Expected a list for key {key}, got {type(value)}. Skipping: {value}")
-                st.success(f"URL content evaluated successfully.")
-            except json.JSONDecodeError as e:
-                st.error(f"Invalid JSON response from Gemini: {e}. Unable to process evaluation.")
+                        st.success("URL content evaluated successfully.")
+                    except json.JSONDecodeError as e:
+                        st.error(f"Invalid JSON response from Gemini: {e}. Unable to process evaluation.")
+                        st.stop()
+            except Exception as e:
+                st.error(f"Error processing URL {url}: {e}")
                 st.stop()
-        except Exception as e:
-            st.error(f"Error processing URL {url}: {e}")
-            st.stop()
+
+            if evaluations and complete:
+                with trace.span("cache_store"):
+                    evaluation_cache.put(cache_key, evaluations, whitepaper_name)
+                store_result = True
+
+with tab3:
+    # Paginated history of stored evaluations with filters
+    name_column, set_column, verdict_column = st.columns(3)
+    name_prefix = name_column.text_input("Project name starts with")
+    history_set = set_column.selectbox("Criteria set", ["All"] + CRITERIA_SETS)
+    history_verdict = verdict_column.selectbox("Verdict", ["All", "Yes", "No", UNSURE_VERDICT])
+    history_set = None if history_set == "All" else history_set
+    history_verdict = None if history_verdict == "All" else history_verdict
+    _, total = evaluation_store.history(0, 1, name_prefix, history_set, history_verdict)
+    pages = max(1, -(-total // PAGE_SIZE))
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1) - 1
+    history_rows, _ = evaluation_store.history(page, PAGE_SIZE, name_prefix, history_set, history_verdict)
+    if history_rows:
+        st.write(f"{total} stored evaluation(s)")
+        st.dataframe(pd.DataFrame([{
+            "ID": row["id"], "Date": row["date"], "Whitepaper Name": row["whitepaper_name"],
+            "Criteria Set": row["criteria_set"], "Probability": round(row["probability"], 4),
+            "Verdict": row["verdict"], "Fraud Criteria": ", ".join(row["fraud_criteria"]),
+            "Model": row["model"], "Source": row["source"],
+        } for row in history_rows]), hide_index=True)
+
+        # Per-criterion details of one stored evaluation
+        detail_id = st.selectbox("Show details of evaluation", [row["id"] for row in history_rows],
+                                 format_func=lambda id_: next(f"#{row['id']} {row['whitepaper_name']} ({row['date']})"
+                                                              for row in history_rows if row["id"] == id_))
+        detail = evaluation_store.get(detail_id)
+        st.table(pd.DataFrame([{
+            "Criteria ID": criterion["criterion_id"], "Evidence": criterion["evidence"],
+            "Result": criterion["result"], "Score": criterion["score"], "Quote": criterion["quote"],
+        } for criterion in detail["criteria"]]))
+    else:
+        st.write("No stored evaluations match.")
+
+    # Analytics over all stored evaluations (or the selected criteria set)
+    with st.expander("Analytics"):
+        analytics = evaluation_store.analytics(history_set)
+        if analytics["by_month"]:
+            st.write("**Evaluations per month**")
+            st.bar_chart(pd.DataFrame(analytics["by_month"]).set_index("month")["count"])
+            st.write("**Verdicts by criteria set**")
+            st.table(pd.DataFrame(analytics["by_verdict"]))
+            st.write("**How often each criterion is flagged**")
+            by_criterion = pd.DataFrame(analytics["by_criterion"])
+            by_criterion["flag_rate"] = (by_criterion["flagged"] / by_criterion["evaluated"]).round(3)
+            st.table(by_criterion)
+        else:
+            st.write("No stored evaluations yet.")
+
+# Pick up the background job tracked in the URL (?job=...), also after a rerun or browser refresh
+job_id = st.query_params.get("job")
+if job_id and not evaluations:
+    job = job_queue.get(job_id)
+    if job is None:
+        st.warning(f"Unknown evaluation job {job_id}.")
+        del st.query_params["job"]
+    elif job["status"] in ACTIVE_STATUSES:
+        if job["status"] == "queued":
+            st.info(f"Evaluation of {job['display_name']} is queued ({job_queue.position(job_id)} job(s) ahead). This page updates automatically.")
+        else:
+            st.info(f"Evaluation of {job['display_name']} is running. This page updates automatically.")
+        time.sleep(JOB_POLL_SECONDS)
+        st.rerun()
+    elif job["status"] == "failed":
+        st.error(f"Evaluation of {job['display_name']} failed: {job['error']}")
+        del st.query_params["job"]
+    else:
+        # Score with the job's criteria set, which may differ from the selectbox after a refresh
+        criteria_list, coefficients = get_criteria_set(job["criteria_set"])
+        evaluations = job["result"]["evaluations"]
+        whitepaper_name = job["result"]["whitepaper_name"]
+        st.info(f"Loaded results of evaluation job for {job['display_name']} ({job['criteria_set']}).")
 
 # Process evaluations if available
 if evaluations:
-    # Compute scores and collect quotes
-    scores = {}
-    fraud_criteria = []  # Criteria with result="yes"
-    table_data = []  # For the table display
-
-    for eval_item in evaluations:
-        id_ = eval_item["ID"]
-        evidence = eval_item["Evidence"].lower()
-        result = eval_item["result"].lower()
-        quote = eval_item["quote"]
-        try:
-            score = map_to_result(evidence, result)
-            scores[id_] = score
-            if result == "yes":
-                fraud_criteria.append(id_)
-            # Add to table data
-            criterion_name = criteria_lookup.get(id_, id_)  # Fallback to ID if not found
-            table_data.append({
-                "Criterion Name": criterion_name,
-                "Score": round(score, 2),
-                "Quote": quote
-            })
-        except ValueError:
-            st.warning(f"Invalid evidence/result for {id_}. Skipping.")
-
-    # Logistic regression
-    logit = coefficients["const"]
-    for id_, weight in coefficients.items():
-        if id_ != "const":
-            logit += weight * scores.get(id_, 0)  # Default to 0 if missing
-
-    prob = 1 / (1 + math.exp(-logit))
-    is_fraud = "Yes" if prob > 0.7 else "No" if prob<0.3 else "Unsure, human intervention is required"
+    # Compute scores, logistic regression and collect quotes
+    with span(trace, "scoring"):
+        scored, by_set = score_results(evaluations)
+    for id_ in scored["invalid"]:
+        st.warning(f"Invalid evidence/result for {id_}. Skipping.")
+    fraud_criteria = scored["fraud_criteria"]  # Criteria with result="yes"
+    table_data = result_table(evaluations, scored["scores"], criteria_list)  # For the table display
 
     # Display results
     st.subheader("Evaluation Results")
-    st.write(f"**Fraud Probability**: {prob:.4f}")
-    st.write(f"**Fraud Result**: {is_fraud}")
+    if by_set is None:
+        st.write(f"**Fraud Probability**: {scored['probability']:.4f}")
+        st.write(f"**Fraud Result**: {scored['verdict']}")
+    else:
+        # Side-by-side comparison from the one shared evaluation
+        st.write("**Fraud Probability by regulator**:")
+        st.table(pd.DataFrame([{
+            "Criteria Set": name, "Fraud Probability": round(result["probability"], 4), "Fraud Result": result["verdict"],
+            "Fraud Indicators": ", ".join(result["fraud_criteria"]) or "None",
+            "Criteria Evaluated": len(result["scores"]),
+        } for name, result in by_set.items()]))
+    if cascade_stages:
+        st.write("**Model cascade**:")
+        st.table(pd.DataFrame([{
+            "Model": stage["model"], "Criteria Evaluated": stage["criteria"], "Seconds": stage["seconds"],
+            "Fraud Result": ", ".join(f"{name}: {verdict}" for name, verdict in stage["verdict"].items()),
+        } for stage in cascade_stages]))
+    if skipped_ids:
+        # Every skipped criterion scoring anywhere from 0 to 1 keeps the verdict unchanged
+        bounds = [(name, probability_bounds(result["scores"], skipped_ids, get_criteria_set(name)[1]))
+                  for name, result in (by_set.items() if by_set is not None else [(selected_set, scored)])]
+        st.info(f"Verdict settled after {len(criteria_list) - len(skipped_ids)} of {len(criteria_list)} criteria; "
+                f"skipped: {', '.join(skipped_ids)}. Probability range over the skipped criteria: "
+                + ", ".join(f"{name} {low:.4f}-{high:.4f}" for name, (low, high) in bounds))
     st.write("**Criteria deemed true (fraud indicators)**:")
     st.write(", ".join(fraud_criteria) if fraud_criteria else "None")
     
@@ -617,6 +600,22 @@ if evaluations:
         df = pd.DataFrame(table_data)
         st.table(df)
 
+    # Emit the trace as a JSON log line / metrics and optionally show it
+    if trace is not None:
+        emit(trace)
+        if store_result and by_set is None:
+            evaluation_store.record(document_hash, trace.source, whitepaper_name, selected_set, trace.model,
+                                    system_prompt, evaluations, scored, trace)
+        elif store_result:
+            evaluation_store.record_sets(document_hash, trace.source, whitepaper_name, trace.model,
+                                         system_prompt, evaluations, by_set, trace)
+        if show_diagnostics:
+            diagnostics = trace.to_dict()
+            with st.expander("Diagnostics", expanded=True):
+                st.write(f"**Mode**: {diagnostics['mode']}  \n**Wall time**: {diagnostics['wall_seconds']:.2f} s  \n**Model calls**: {diagnostics['model_calls']}")
+                st.table(pd.DataFrame([{"Stage": stage, "Seconds": round(seconds, 3)} for stage, seconds in diagnostics["stages"].items()]))
+                st.table(pd.DataFrame([{"Tokens": field, "Count": count} for field, count in diagnostics["tokens"].items()]))
+
 # Clean up temp file if it exists
 if temp_path and os.path.exists(temp_path):
     os.remove(temp_path)
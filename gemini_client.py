@@ -0,0 +1,594 @@
+### Gemini client of the Crypto-Fraud detection App
+#### System prompts and calls to the Gemini API
+#
+# google.generativeai is imported on first use, so importing this module is cheap
+# for workers that only need the prompts or never reach the API.
+
+import datetime
+import hashlib
+import json
+import os
+import time
+
+from instrumentation import span, record_usage
+from evaluation_cache import hash_file
+from rate_limiter import RateLimiter, Scheduler
+
+# Gemini model used for evaluation
+MODEL_NAME = 'gemini-2.5-pro'
+FAST_MODEL_NAME = 'gemini-2.5-flash'  # First pass of the model cascade
+
+# System prompt for file-based evaluation
+file_system_prompt = """
+System Prompt — White-paper Fraud-Risk Evaluation
+
+1. Purpose  
+Evaluate a project’s white-paper (PDF file) against each fraud criteria supplied in JSON. For every criterion you must:
+
+• Locate supporting or contradictory passages in the white-paper text **and any information conveyed by figures or graphs**.  
+• Assign one evidence rating:  
+  – abundant evidence  
+  – some evidence  
+  – no evidence                     (document is silent on the point)  
+  – insufficient evidence to make a decision  
+• Output the exact sentence(s) or concise figure caption(s) you relied on, each ≤ 20 words.  
+• Write an evaluation (≤ 60 words) explaining how the quoted material supports the rating.  
+• Choose the result:  
+  – yes                       → criterion met → fraud indicator  
+  – no                        → criterion not met  
+  – insufficient evidence to make decision → cannot judge  
+  Important:  
+    ▸ If Evidence = “no evidence”, you MUST still set result to either “yes” or “no”.  
+    ▸ Result may be “insufficient evidence to make decision” only when Evidence is the same phrase.
+
+You may incorporate any internet or external knowledge sources if necessary.
+
+2. Inputs  
+
+• whitepaper_pdf (file): The complete PDF of the white-paper. Extract all text, figure captions, and, where possible, summarize graph data (e.g., axes labels, key values) before analysis.  
+• fraud_criteria (JSON): Contains an array of criteria in the format: 
+Example A  
+{
+  [
+    {
+      "ID": "FCA-001",
+      "criteria": "Misleading Statements Inducing Investment",
+      "description": "...",
+      "scope": "..."
+    },
+    {
+      "ID": "MISC-001",
+      "criteria": "Anonymous Or Pseudonymous Team",
+      "summary": "..."
+    }
+    // …more criteria
+  ]
+}
+
+3. Required Output  
+
+Return a JSON object with:  
+• "whitepaper_name": the title of the white-paper (use first PDF heading or metadata).  
+• One key exactly matching the fraud_criteria ID ("FCA-001", "MISC-015", etc.). 
+Its value is an array containing one object per original criterion (same ID order).
+
+Schema for every object  
+{
+  "ID": "FCA-001",
+  "Evidence": "abundant evidence | some evidence | no evidence | insufficient evidence to make a decision",
+  "quote": "<sentence(s) or figure caption(s) from the white-paper, ≤ 20 words each, separated by ' | ' if multiple>",
+  "evaluation": "<≤ 60-word explanation referencing the quote>",
+  "result": "yes | no | insufficient evidence to make decision"
+}
+
+4. Evidence-Level Definitions  
+
+• abundant evidence: Multiple explicit passages, data tables, or graphs strongly match the criterion.  
+• some evidence: One clear but limited passage or graph; partial alignment.  
+• no evidence: The white-paper is silent on the point; this absence can justify “yes” or “no” for the fraud.  
+• insufficient evidence to make decision: Information is too sparse or conflicting for a reliable choice.
+
+5. Evaluation Steps (internal)  
+
+1. Extract all text, figure captions, and key graph details from whitepaper_pdf.  
+2. Iterate through the criteria array.  
+3. For each criterion:  
+   – Search extracted content for relevant material.  
+   – Select an evidence rating.  
+   – Populate the quote field with up to two supporting excerpts (sentences or captions). If none, leave quote = "".  
+   – Draft evaluation (≤ 60 words).  
+   – Choose result following the rules above.  
+
+6. Output Rules  
+
+• Return only valid JSON (no Markdown, comments, or trailing commas).  
+• Maintain field order inside each item: ID, Evidence, quote, evaluation, result.  
+• All Evidence and result values must be lowercase.  
+• Do not exceed 20 words per quoted excerpt or 60 words in any evaluation.
+
+7. Style & Safety  
+
+• Avoid legal conclusions; align facts with criteria.  
+• Do not expose internal reasoning steps.  
+• If context is inadequate, set Evidence and result to “insufficient evidence to make decision”.
+"""
+
+# System prompt for URL-based evaluation
+url_system_prompt = """
+System Prompt — White-paper Fraud-Risk Evaluation from URL
+
+1. Purpose  
+Evaluate a project’s white-paper or project description, fetched from the provided URL, against each fraud criteria supplied in JSON. For every criterion you must:
+
+• Locate supporting or contradictory passages in the text **and any information conveyed by figures or graphs** from the webpage content.  
+• Assign one evidence rating:  
+  – abundant evidence  
+  – some evidence  
+  – no evidence                     (document is silent on the point)  
+  – insufficient evidence to make a decision  
+• Output the exact sentence(s) or concise figure caption(s) you relied on, each ≤ 20 words.  
+• Write an evaluation (≤ 60 words) explaining how the quoted material supports the rating.  
+• Choose the result:  
+  – yes                       → criterion met → fraud indicator  
+  – no                        → criterion not met  
+  – insufficient evidence to make decision → cannot judge  
+  Important:  
+    ▸ If Evidence = “no evidence”, you MUST still set result to either “yes” or “no”.  
+    ▸ Result may be “insufficient evidence to make decision” only when Evidence is the same phrase.
+
+You may incorporate any internet or external knowledge sources if necessary.
+
+2. Inputs  
+
+• whitepaper_url (string): The URL pointing to the white-paper or project description. Fetch and extract all relevant text, figure captions, and, where possible, summarize graph data (e.g., axes labels, key values) before analysis.  
+• fraud_criteria (JSON): Contains an array of criteria in the format: 
+Example A  
+{
+  [
+    {
+      "ID": "FCA-001",
+      "criteria": "Misleading Statements Inducing Investment",
+      "description": "...",
+      "scope": "..."
+    },
+    {
+      "ID": "MISC-001",
+      "criteria": "Anonymous Or Pseudonymous Team",
+      "summary": "..."
+    }
+    // …more criteria
+  ]
+}
+
+3. Required Output  
+
+Return a JSON object with:  
+• "whitepaper_name": the title of the white-paper or project (use webpage title, first heading, or metadata).  
+• One key exactly matching the fraud_criteria ID ("FCA-001", "MISC-015", etc.). 
+Its value is an array containing one object per original criterion (same ID order).
+
+Schema for every object  
+{
+  "ID": "FCA-001",
+  "Evidence": "abundant evidence | some evidence | no evidence | insufficient evidence to make a decision",
+  "quote": "<sentence(s) or figure caption(s) from the white-paper, ≤ 20 words each, separated by ' | ' if multiple>",
+  "evaluation": "<≤ 60-word explanation referencing the quote>",
+  "result": "yes | no | insufficient evidence to make decision"
+}
+
+4. Evidence-Level Definitions  
+
+• abundant evidence: Multiple explicit passages, data tables, or graphs strongly match the criterion.  
+• some evidence: One clear but limited passage or graph; partial alignment.  
+• no evidence: The white-paper is silent on the point; this absence can justify “yes” or “no” for the fraud.  
+• insufficient evidence to make decision: Information is too sparse or conflicting for a reliable choice.
+
+5. Evaluation Steps (internal)  
+
+1. Fetch and extract all text, figure captions, and key graph details from the content at whitepaper_url.  
+2. Iterate through the criteria array.  
+3. For each criterion:  
+   – Search extracted content for relevant material.  
+   – Select an evidence rating.  
+   – Populate the quote field with up to two supporting excerpts (sentences or captions). If none, leave quote = "".  
+   – Draft evaluation (≤ 60 words).  
+   – Choose result following the rules above.  
+
+6. Output Rules  
+
+• Return only valid JSON (no Markdown, comments, or trailing commas).  
+• Maintain field order inside each item: ID, Evidence, quote, evaluation, result.  
+• All Evidence and result values must be lowercase.  
+• Do not exceed 20 words per quoted excerpt or 60 words in any evaluation.
+
+7. Style & Safety  
+
+• Avoid legal conclusions; align facts with criteria.  
+• Do not expose internal reasoning steps.  
+• If context is inadequate, set Evidence and result to “insufficient evidence to make decision”.
+"""
+
+# System prompt for pre-extracted excerpts: the file prompt plus a note on the reduced input
+excerpt_system_prompt = file_system_prompt + """
+8. Pre-extracted Input
+
+• Instead of the full PDF you receive excerpts extracted locally from the white-paper, each tagged with its page numbers and the criteria it was selected for.  
+• Base the evaluation only on these excerpts and the title line; treat anything not in them as not stated in the white-paper.  
+• Quotes must be copied from the excerpts.
+"""
+
+# System prompt for map-reduce evaluation: one section of a long white-paper per request
+section_system_prompt = file_system_prompt + """
+8. Sectioned Input
+
+• The white-paper was split into sections that are evaluated separately. You receive one section as text, tagged with its page range, plus the white-paper title.  
+• Evaluate every criterion on this section alone; if the section does not address a criterion, set Evidence to “no evidence”.  
+• Quotes must be copied from the section.
+"""
+
+_genai = None
+_api_key_id = None
+_scheduler = None
+_context_registry = None  # Registry of cached prompt prefixes; None disables context caching
+_uncacheable_prefixes = set()
+
+# Tokens charged to the TPM budget per attached file until usage metadata reports the real count
+FILE_TOKEN_ESTIMATE = 20000
+
+# Criterion fields sent to the model
+PROMPT_FIELDS = ("ID", "criteria", "description", "scope", "summary")
+
+# Deployment switch for Gemini context caching of the per-set prompt prefix (see enable_context_cache)
+CONTEXT_CACHE_ENABLED = os.environ.get("FRAUD_CONTEXT_CACHE", "") == "1"
+
+# Lifetime of a cached prompt prefix; the registry stops reusing it an hour before expiry
+CONTEXT_CACHE_TTL = 3 * 3600
+
+# Smallest prefix Gemini accepts for context caching, by model family
+CONTEXT_CACHE_MIN_TOKENS = {"pro": 4096, "flash": 1024}
+
+# Import google.generativeai on first use
+def load_genai():
+    global _genai
+    if _genai is None:
+        import google.generativeai
+        _genai = google.generativeai
+    return _genai
+
+# Replace the Gemini backend (e.g. a recorded-response stand-in for benchmarks and tests)
+def set_backend(backend):
+    global _genai
+    _genai = backend
+
+# Scheduler for all Gemini calls: shared RPM/TPM budgets, retries and adaptive concurrency
+def scheduler():
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = Scheduler(RateLimiter())
+    return _scheduler
+
+# Replace the scheduler (e.g. one without budgets for benchmarks against a local backend)
+def set_scheduler(new_scheduler):
+    global _scheduler
+    _scheduler = new_scheduler
+
+# Rough prompt size (4 characters per token) of a request, charged before the call
+def estimate_tokens(contents, system_prompt=""):
+    tokens = len(system_prompt) // 4
+    for part in contents:
+        tokens += len(part) // 4 if isinstance(part, str) else FILE_TOKEN_ESTIMATE
+    return tokens
+
+def reported_tokens(response):
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "total_token_count", None) if usage is not None else None
+
+# generate_content through the scheduler
+def _generate(model, contents, system_prompt, stream=False):
+    return scheduler().call(lambda: model.generate_content(contents, stream=stream),
+                            estimate_tokens(contents, system_prompt), None if stream else reported_tokens)
+
+# Configure the Gemini API key
+def configure(api_key):
+    global _api_key_id
+    load_genai().configure(api_key=api_key)
+    _api_key_id = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+# Fingerprint of the configured API key; uploaded files are only visible to the key that uploaded them
+def api_key_id():
+    return _api_key_id or "default"
+
+# JSON block with the criteria sent to the model; compact drops indentation and unused fields
+def criteria_json(criteria_list, compact=True):
+    if not compact:
+        return json.dumps({"criteria": criteria_list}, indent=2)
+    criteria = [{field: item[field] for field in PROMPT_FIELDS if field in item} for item in criteria_list]
+    return json.dumps({"criteria": criteria}, separators=(",", ":"), ensure_ascii=False)
+
+# Upload a local PDF/TXT file to the Gemini File API
+def upload_file(path, trace=None):
+    with span(trace, "upload"):
+        return scheduler().call(lambda: load_genai().upload_file(path), rate_limited=False)
+
+# Expiry of an uploaded file as a Unix timestamp (None if the API did not report one)
+def file_expiry(gemini_file):
+    expiration_time = getattr(gemini_file, "expiration_time", None)
+    return expiration_time.timestamp() if expiration_time is not None else None
+
+# Previously uploaded, still active Gemini file with the given content hash, or None
+def registered_file(content_hash, registry, trace=None):
+    file_name = registry.get(content_hash, api_key_id())
+    if file_name is None:
+        return None
+    try:
+        with span(trace, "file_lookup"):
+            gemini_file = load_genai().get_file(file_name)
+        if getattr(gemini_file.state, "name", "ACTIVE") == "ACTIVE":
+            return gemini_file
+    except Exception:
+        pass  # Deleted or expired early; fall through to a fresh upload
+    registry.forget(content_hash, api_key_id())
+    return None
+
+# Upload a file and record its handle for reuse by identical content
+def upload_and_register(path, content_hash, registry, trace=None):
+    gemini_file = upload_file(path, trace)
+    registry.put(content_hash, api_key_id(), gemini_file.name, file_expiry(gemini_file))
+    return gemini_file
+
+# Stable per-set part of the user prompt; it precedes the document so every request for a set
+# starts with the same system prompt + criteria prefix
+def criteria_prefix(criteria_list):
+    return f"Fraud criteria:\n{criteria_json(criteria_list)}"
+
+# Per-document instructions for file- and URL-based evaluation
+FILE_INSTRUCTION = "Evaluate the attached whitepaper against the fraud criteria above."
+
+def url_instruction(url):
+    return f"Evaluate the whitepaper or project description at the following URL against the fraud criteria above:\nURL: {url}"
+
+# Turn Gemini context caching of prompt prefixes on (with a registry to share them) or off (None)
+def enable_context_cache(registry):
+    global _context_registry
+    _context_registry = registry
+
+def min_cache_tokens(model_name):
+    return next((tokens for family, tokens in CONTEXT_CACHE_MIN_TOKENS.items() if family in model_name), 4096)
+
+# Name of a live Gemini cached content holding system prompt + criteria prefix, or None when the
+# prefix is too small to cache or caching failed. Names are shared through the registry.
+def cached_prefix(model_name, system_prompt, prefix, registry, trace=None):
+    key = "prefix:" + hashlib.sha256(json.dumps([model_name, system_prompt, prefix]).encode("utf-8")).hexdigest()
+    if key in _uncacheable_prefixes or estimate_tokens([prefix], system_prompt) < min_cache_tokens(model_name):
+        return None
+    name = registry.get(key, api_key_id())
+    if name is not None:
+        return name
+    try:
+        with span(trace, "context_cache"):
+            cached = scheduler().call(lambda: load_genai().caching.CachedContent.create(
+                model=f"models/{model_name}", system_instruction=system_prompt, contents=[prefix],
+                ttl=datetime.timedelta(seconds=CONTEXT_CACHE_TTL)), rate_limited=False)
+    except Exception:
+        _uncacheable_prefixes.add(key)  # e.g. below the model's minimum; send the prefix inline
+        return None
+    registry.put(key, api_key_id(), cached.name, cached.expire_time.timestamp())
+    return cached.name
+
+# Model and contents for one evaluation: [prefix, *document parts, instruction], or only the
+# document parts and instruction on top of a cached prefix
+def _request(model_name, system_prompt, criteria_list, parts, instruction, trace=None):
+    prefix = criteria_prefix(criteria_list)
+    if _context_registry is not None:
+        cached_name = cached_prefix(model_name, system_prompt, prefix, _context_registry, trace)
+        if cached_name is not None:
+            return load_genai().GenerativeModel.from_cached_content(cached_name), parts + [instruction]
+    model = load_genai().GenerativeModel(model_name=model_name, system_instruction=system_prompt)
+    return model, [prefix] + parts + [instruction]
+
+# Evaluate an uploaded Gemini file and return the raw response text.
+# gemini_file may also be a text block (pre-extracted excerpts with excerpt_system_prompt).
+def evaluate_uploaded_file(gemini_file, criteria_list, model_name=MODEL_NAME, system_prompt=file_system_prompt,
+                           trace=None):
+    model, contents = _request(model_name, system_prompt, criteria_list, [gemini_file], FILE_INSTRUCTION, trace)
+    with span(trace, "generate"):
+        response = _generate(model, contents, system_prompt)
+    record_usage(trace, response)
+    return response.text
+
+# Gemini file for a local path, reusing a registered upload of the same bytes when possible
+def upload_document(path, registry=None, trace=None):
+    if registry is None:
+        return upload_file(path, trace)
+    content_hash = hash_file(path)
+    return (registered_file(content_hash, registry, trace)
+            or upload_and_register(path, content_hash, registry, trace))
+
+# Upload and evaluate a local file
+def evaluate_file(path, criteria_list, model_name=MODEL_NAME, registry=None, trace=None):
+    return evaluate_uploaded_file(upload_document(path, registry, trace), criteria_list, model_name, trace=trace)
+
+# Evaluate the document at a URL and return the raw response text
+def evaluate_url(url, criteria_list, model_name=MODEL_NAME, trace=None):
+    model, contents = _request(model_name, url_system_prompt, criteria_list, [], url_instruction(url), trace)
+    with span(trace, "generate"):
+        response = _generate(model, contents, url_system_prompt)
+    record_usage(trace, response)
+    return response.text
+
+# Text of one streamed chunk; chunks without text parts (e.g. the final finish-reason chunk) give ""
+def chunk_text(chunk):
+    try:
+        return chunk.text
+    except (ValueError, AttributeError):
+        return ""
+
+# Yield the text of streamed chunks; the last chunk carries the usage metadata for the call.
+# Only opening the stream is retried, since chunks may already have been shown.
+# The generate_stream span includes the time the consumer spends between chunks.
+def _stream_text(model, contents, system_prompt, trace):
+    last_chunk = None
+    with span(trace, "generate_stream"):
+        for chunk in _generate(model, contents, system_prompt, stream=True):
+            last_chunk = chunk
+            text = chunk_text(chunk)
+            if text:
+                yield text
+    record_usage(trace, last_chunk)
+
+# Stream the evaluation of an uploaded Gemini file as raw text chunks
+def stream_uploaded_file(gemini_file, criteria_list, model_name=MODEL_NAME, system_prompt=file_system_prompt,
+                         trace=None):
+    model, contents = _request(model_name, system_prompt, criteria_list, [gemini_file], FILE_INSTRUCTION, trace)
+    return _stream_text(model, contents, system_prompt, trace)
+
+# Stream the evaluation of the document at a URL as raw text chunks
+def stream_url(url, criteria_list, model_name=MODEL_NAME, trace=None):
+    model, contents = _request(model_name, url_system_prompt, criteria_list, [], url_instruction(url), trace)
+    return _stream_text(model, contents, url_system_prompt, trace)
+
+# Split criteria into groups of at most group_size for fan-out evaluation
+def criteria_groups(criteria_list, group_size=1):
+    group_size = max(1, group_size)
+    return [criteria_list[i:i + group_size] for i in range(0, len(criteria_list), group_size)]
+
+# Run run_item over items on a thread pool, yielding (index, result, error) as each finishes.
+# A failed item (API error or unparseable JSON) is retried on its own up to `retries` times.
+def _run_parallel(items, run_item, max_workers, retries):
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {pool.submit(run_item, item): (index, 0) for index, item in enumerate(items)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, attempt = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if attempt < retries:
+                        pending[pool.submit(run_item, items[index])] = (index, attempt + 1)
+                    else:
+                        yield index, None, e
+                    continue
+                yield index, result, None
+
+# Evaluate an uploaded Gemini file one criteria group per concurrent request.
+# Yields (group_ids, whitepaper_name, evaluations, error) as each group lands.
+def evaluate_criteria_parallel(gemini_file, criteria_list, group_size=1, max_workers=4, retries=2,
+                               model_name=MODEL_NAME, system_prompt=file_system_prompt, trace=None):
+    from scoring import parse_response
+
+    def run_group(group):
+        response_text = evaluate_uploaded_file(gemini_file, group, model_name, system_prompt, trace)
+        with span(trace, "parse"):
+            return parse_response(response_text)
+
+    groups = criteria_groups(criteria_list, group_size)
+    for index, result, error in _run_parallel(groups, run_group, max_workers, retries):
+        group_ids = [item["ID"] for item in groups[index]]
+        if error is not None:
+            yield group_ids, None, [], error
+        else:
+            whitepaper_name, evaluations, _ = result
+            yield group_ids, whitepaper_name, evaluations, None
+
+# Adaptive evaluation of an uploaded Gemini file: criteria in descending weight order, batch_size at a time
+# (one concurrent request per criterion), stopping as soon as the verdict under every coefficient set can no
+# longer change whatever the remaining criteria score. Failed criteria stay open.
+# Yields (whitepaper_name, evaluations, failed_ids, open_ids) after each batch; open_ids of the last
+# yield are the criteria skipped.
+def evaluate_adaptive(gemini_file, criteria_list, coefficient_sets, batch_size=4, max_workers=4, retries=2,
+                      model_name=MODEL_NAME, system_prompt=file_system_prompt, trace=None):
+    from scoring import criteria_by_weight, score_evaluations, verdicts_decided
+
+    ordered = criteria_by_weight(criteria_list, coefficient_sets)
+    evaluations = []
+    failed_ids = []
+    for start in range(0, len(ordered), batch_size):
+        whitepaper_name = None
+        batch_evaluations = []
+        batch_failed = []
+        for group_ids, group_name, group_evaluations, error in evaluate_criteria_parallel(
+                gemini_file, ordered[start:start + batch_size], 1, max_workers, retries, model_name, system_prompt, trace):
+            if error is not None:
+                batch_failed.extend(group_ids)
+                continue
+            whitepaper_name = whitepaper_name or group_name
+            batch_evaluations.extend(group_evaluations)
+        evaluations.extend(batch_evaluations)
+        failed_ids.extend(batch_failed)
+        open_ids = [item["ID"] for item in ordered[start + batch_size:]]
+        yield whitepaper_name, batch_evaluations, batch_failed, open_ids
+        scores, _, _ = score_evaluations(evaluations)
+        if open_ids and verdicts_decided(scores, open_ids + failed_ids, coefficient_sets):
+            return
+
+# How a cascade escalates a borderline document: only its uncertain criteria, or all of them
+ESCALATE_CRITERIA = "criteria"
+ESCALATE_DOCUMENT = "document"
+
+# Model label of a cascade configuration, used in cache keys so cascade results are kept apart
+def cascade_label(fast_model, strong_model, margin, escalate):
+    return f"{fast_model}>{strong_model} (margin {margin}, {escalate})"
+
+# Tiered cascade: evaluate with the fast model and escalate to the strong model only when a probability
+# under any of the named coefficient sets is within `margin` of the Unsure band. run_stage(model_name,
+# criteria_list) evaluates and returns (whitepaper_name, evaluations). Escalated results replace the fast
+# model's for the criteria re-evaluated (all of them if none is uncertain).
+# Returns (whitepaper_name, evaluations, stages), one stage dict per model run.
+def evaluate_cascade(run_stage, criteria_list, coefficient_sets, fast_model=FAST_MODEL_NAME, strong_model=MODEL_NAME,
+                     margin=None, escalate=ESCALATE_CRITERIA, trace=None):
+    from scoring import (ESCALATION_MARGIN, score_evaluations, fraud_probability, fraud_verdict, is_borderline,
+                         uncertain_criteria)
+
+    margin = ESCALATION_MARGIN if margin is None else margin
+    stages = []
+
+    def run(model_name, stage_criteria):
+        start = time.perf_counter()
+        with span(trace, f"cascade_{model_name}"):
+            whitepaper_name, evaluations = run_stage(model_name, stage_criteria)
+        stages.append({"model": model_name, "criteria": len(stage_criteria), "seconds": round(time.perf_counter() - start, 3)})
+        return whitepaper_name, evaluations
+
+    def score_stage(evaluations):
+        scores, _, _ = score_evaluations(evaluations)
+        probabilities = {name: fraud_probability(scores, coefficients) for name, coefficients in coefficient_sets.items()}
+        stages[-1].update(probability={name: round(p, 4) for name, p in probabilities.items()},
+                          verdict={name: fraud_verdict(p) for name, p in probabilities.items()})
+        return probabilities
+
+    whitepaper_name, evaluations = run(fast_model, criteria_list)
+    if not any(is_borderline(p, margin) for p in score_stage(evaluations).values()):
+        return whitepaper_name, evaluations, stages
+    escalated_ids = uncertain_criteria(evaluations, criteria_list) if escalate == ESCALATE_CRITERIA else []
+    escalated = [item for item in criteria_list if item["ID"] in escalated_ids] or criteria_list
+    escalated_ids = {item["ID"] for item in escalated}
+    strong_name, strong_evaluations = run(strong_model, escalated)
+    evaluations = [item for item in evaluations if item.get("ID") not in escalated_ids] + strong_evaluations
+    score_stage(evaluations)
+    stages[-1]["escalated"] = sorted(escalated_ids)
+    return strong_name or whitepaper_name, evaluations, stages
+
+# Map step of sectioned evaluation: every section text block against all criteria, concurrently.
+# Yields (section_index, whitepaper_name, evaluations, error) as each section lands.
+def evaluate_sections(section_texts, criteria_list, max_workers=4, retries=2, model_name=MODEL_NAME, trace=None):
+    from scoring import parse_response
+
+    def run_section(section_text):
+        response_text = evaluate_uploaded_file(section_text, criteria_list, model_name, section_system_prompt, trace)
+        with span(trace, "parse"):
+            return parse_response(response_text)
+
+    for index, result, error in _run_parallel(section_texts, run_section, max_workers, retries):
+        if error is not None:
+            yield index, None, [], error
+        else:
+            whitepaper_name, evaluations, _ = result
+            yield index, whitepaper_name, evaluations, None
+
+# Run one full evaluation (call returns its result) `samples` times concurrently for consensus scoring.
+# Yields (sample_index, result, error) as each sample lands.
+def evaluate_samples(call, samples, max_workers=4, retries=2):
+    return _run_parallel(list(range(samples)), lambda _: call(), max_workers, retries)
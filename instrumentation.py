@@ -0,0 +1,140 @@
+### Per-stage timing and token instrumentation for evaluations
+#### Traces are emitted as JSON log lines and aggregated into Prometheus-style metrics
+#
+# Set FRAUD_METRICS_TEXTFILE to also write the metrics in Prometheus text format
+# (e.g. for the node_exporter textfile collector) after every evaluation.
+
+import contextlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+
+LOGGER = logging.getLogger("fraud_detection.metrics")
+if not LOGGER.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    LOGGER.addHandler(_handler)
+    LOGGER.setLevel(logging.INFO)
+    LOGGER.propagate = False
+
+METRICS_TEXTFILE = os.environ.get("FRAUD_METRICS_TEXTFILE")
+
+# usage_metadata fields collected from Gemini responses
+TOKEN_FIELDS = ("prompt_token_count", "cached_content_token_count", "candidates_token_count", "total_token_count")
+
+
+class EvaluationTrace:
+    def __init__(self, source=None, criteria_set=None, model=None, mode=None):
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.source = source
+        self.criteria_set = criteria_set
+        self.model = model
+        self.mode = mode
+        self.started = time.time()
+        self.spans = []  # {"stage": ..., "seconds": ...} in completion order
+        self.tokens = {field: 0 for field in TOKEN_FIELDS}
+        self.calls = 0
+        self._lock = threading.Lock()  # Fan-out records usage from worker threads
+
+    # Time a pipeline stage
+    @contextlib.contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.spans.append({"stage": stage, "seconds": time.perf_counter() - start})
+
+    # Add token counts from a response (or final stream chunk) that carries usage_metadata
+    def record_usage(self, response):
+        usage = getattr(response, "usage_metadata", None)
+        with self._lock:
+            self.calls += 1
+            if usage is None:
+                return
+            for field in TOKEN_FIELDS:
+                self.tokens[field] += getattr(usage, field, 0) or 0
+
+    # Seconds per stage, summing repeated stages (e.g. one generate span per fan-out request)
+    def stage_totals(self):
+        totals = {}
+        for span in self.spans:
+            totals[span["stage"]] = totals.get(span["stage"], 0.0) + span["seconds"]
+        return totals
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "source": self.source,
+            "criteria_set": self.criteria_set,
+            "model": self.model,
+            "mode": self.mode,
+            "wall_seconds": round(time.time() - self.started, 4),
+            "stages": {stage: round(seconds, 4) for stage, seconds in self.stage_totals().items()},
+            "tokens": dict(self.tokens),
+            "model_calls": self.calls,
+        }
+
+# Span on an optional trace; a no-op when trace is None
+def span(trace, stage):
+    return trace.span(stage) if trace is not None else contextlib.nullcontext()
+
+def record_usage(trace, response):
+    if trace is not None:
+        trace.record_usage(response)
+
+
+# Process-wide counters in Prometheus exposition format
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.evaluations = {}  # (criteria_set, mode) -> count
+        self.stage_seconds = {}  # stage -> [sum, count]
+        self.tokens = {field: 0 for field in TOKEN_FIELDS}
+
+    def observe(self, trace):
+        with self._lock:
+            key = (trace.criteria_set or "", trace.mode or "")
+            self.evaluations[key] = self.evaluations.get(key, 0) + 1
+            for stage, seconds in trace.stage_totals().items():
+                total = self.stage_seconds.setdefault(stage, [0.0, 0])
+                total[0] += seconds
+                total[1] += 1
+            for field in TOKEN_FIELDS:
+                self.tokens[field] += trace.tokens[field]
+
+    def render(self):
+        lines = ["# HELP fraud_evaluations_total Completed evaluations.", "# TYPE fraud_evaluations_total counter"]
+        with self._lock:
+            for (criteria_set, mode), count in sorted(self.evaluations.items()):
+                lines.append(f'fraud_evaluations_total{{criteria_set="{criteria_set}",mode="{mode}"}} {count}')
+            lines += ["# HELP fraud_stage_seconds Time spent per evaluation stage.", "# TYPE fraud_stage_seconds summary"]
+            for stage, (seconds, count) in sorted(self.stage_seconds.items()):
+                lines.append(f'fraud_stage_seconds_sum{{stage="{stage}"}} {seconds:.6f}')
+                lines.append(f'fraud_stage_seconds_count{{stage="{stage}"}} {count}')
+            lines += ["# HELP fraud_tokens_total Gemini tokens reported in usage_metadata.", "# TYPE fraud_tokens_total counter"]
+            for field, count in self.tokens.items():
+                lines.append(f'fraud_tokens_total{{kind="{field.replace("_token_count", "")}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(temp_path, path)
+
+
+METRICS = MetricsRegistry()
+
+# Log a finished trace as one JSON line and add it to the process metrics
+def emit(trace):
+    LOGGER.info(json.dumps({"event": "evaluation", **trace.to_dict()}, ensure_ascii=False))
+    METRICS.observe(trace)
+    if METRICS_TEXTFILE:
+        METRICS.write_textfile(METRICS_TEXTFILE)
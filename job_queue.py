@@ -0,0 +1,166 @@
+### SQLite-backed evaluation job queue
+#### The Streamlit front-end submits jobs; worker.py processes them; results are polled by job ID
+
+import json
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+
+from documents import copy_upload
+
+# Queue database and directory for uploaded job files (override with environment variables)
+QUEUE_PATH = os.environ.get("FRAUD_JOB_QUEUE_PATH", ".jobs.sqlite3")
+JOB_FILES_DIR = os.environ.get("FRAUD_JOB_FILES_DIR", ".job_files")
+
+# A running job whose worker has not finished it in this time is handed to another worker
+STALE_AFTER = 15 * 60
+
+# Attempts before a job that keeps getting stranded is marked failed
+MAX_ATTEMPTS = 3
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobQueue:
+    def __init__(self, path=QUEUE_PATH, files_dir=JOB_FILES_DIR):
+        self.path = path
+        self.files_dir = files_dir
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " kind TEXT NOT NULL,"  # file | url
+                " source TEXT NOT NULL,"  # stored file path or URL
+                " display_name TEXT,"
+                " criteria_set TEXT NOT NULL,"
+                " model TEXT NOT NULL,"
+                " dedupe_key TEXT,"
+                " force INTEGER NOT NULL DEFAULT 0,"
+                " status TEXT NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " worker TEXT,"
+                " created REAL NOT NULL,"
+                " started REAL,"
+                " finished REAL,"
+                " result TEXT,"
+                " error TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_dedupe_key ON jobs (dedupe_key)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # Queued or running job for the same input (cache key), so reruns do not submit duplicates
+    def find_active(self, dedupe_key):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE dedupe_key = ? AND status IN (?, ?) ORDER BY created DESC LIMIT 1",
+                (dedupe_key, *ACTIVE_STATUSES)
+            ).fetchone()
+        return row["id"] if row else None
+
+    def _insert(self, job_id, kind, source, display_name, criteria_set, model, dedupe_key, force):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, source, display_name, criteria_set, model, dedupe_key, force, status, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'queued', ?)",
+                (job_id, kind, source, display_name, criteria_set, model, dedupe_key, int(force), time.time())
+            )
+        return job_id
+
+    # Submit an uploaded file (binary file object); it is copied to a per-job directory the worker can read
+    def submit_file(self, fileobj, filename, criteria_set, model, dedupe_key=None, force=False):
+        existing = dedupe_key and self.find_active(dedupe_key)
+        if existing:
+            return existing
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.files_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        path = os.path.join(job_dir, filename)
+        copy_upload(fileobj, path)
+        return self._insert(job_id, "file", path, filename, criteria_set, model, dedupe_key, force)
+
+    def submit_url(self, url, criteria_set, model, dedupe_key=None, force=False):
+        existing = dedupe_key and self.find_active(dedupe_key)
+        if existing:
+            return existing
+        return self._insert(uuid.uuid4().hex, "url", url, url, criteria_set, model, dedupe_key, force)
+
+    # Atomically take the oldest queued job; returns the job dict or None
+    def claim(self, worker):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, started = ?, attempts = attempts + 1 WHERE id = ?",
+                (worker, time.time(), row["id"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return self.get(row["id"])
+
+    def complete(self, job_id, result):
+        self._finish(job_id, "done", json.dumps(result, ensure_ascii=False), None)
+
+    def fail(self, job_id, error):
+        self._finish(job_id, "failed", None, error)
+
+    def _finish(self, job_id, status, result, error):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished = ?, result = ?, error = ? WHERE id = ?",
+                (status, time.time(), result, error, job_id)
+            )
+        self.remove_files(job_id)
+
+    def remove_files(self, job_id):
+        shutil.rmtree(os.path.join(self.files_dir, job_id), ignore_errors=True)
+
+    # Job as a dict (result decoded), or None for an unknown ID
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["force"] = bool(job["force"])
+        return job
+
+    # Number of jobs ahead of a queued job
+    def position(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created < (SELECT created FROM jobs WHERE id = ?)",
+                (job_id,)
+            ).fetchone()
+        return row[0]
+
+    # Hand jobs stranded by a dead worker back to the queue (or fail them after MAX_ATTEMPTS)
+    def requeue_stale(self, stale_after=STALE_AFTER):
+        cutoff = time.time() - stale_after
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', finished = ?, error = 'Abandoned by workers too many times'"
+                " WHERE status = 'running' AND started < ? AND attempts >= ?",
+                (time.time(), cutoff, MAX_ATTEMPTS)
+            )
+            return conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND started < ?",
+                (cutoff,)
+            ).rowcount
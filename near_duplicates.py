@@ -0,0 +1,226 @@
+### Near-duplicate whitepaper index
+#### MinHash signatures over word shingles with banded LSH lookup, and paragraph diffs against the matched document
+#
+# Usage:
+#   python near_duplicates.py index whitepapers/           # Index local files (e.g. ones scored before indexing)
+#   python near_duplicates.py find new_whitepaper.pdf      # Indexed documents similar to a file
+#
+# Revised (v1.1, v1.2) and forked whitepapers are matched to an evaluated document. Only criteria whose stored
+# quotes fall in changed paragraphs, or whose most relevant paragraphs changed, are sent to Gemini again;
+# the other results are carried over (see batch_cli.py --near-duplicates).
+
+import argparse
+import difflib
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+import zlib
+
+import numpy as np
+
+from preextract import TOKEN, BM25Index, SpooledPages, spooled_paragraphs, criterion_query
+from evaluation_cache import hash_file
+
+NEAR_DUPLICATES_PATH = os.environ.get("FRAUD_NEAR_DUPLICATES_PATH", ".near_duplicates.sqlite3")
+
+# Words per shingle
+SHINGLE_WORDS = 5
+
+# MinHash permutations, split into LSH bands of NUM_PERM // BANDS rows. 32 bands of 4 rows make documents
+# with a Jaccard similarity of about 0.5 or more likely candidates.
+NUM_PERM = 128
+BANDS = 32
+
+# Estimated Jaccard similarity from which an indexed document counts as a near-duplicate
+SIMILARITY_THRESHOLD = 0.8
+
+# Paragraphs per criterion checked for changes when the criterion has no quote in changed text
+RELEVANT_PARAGRAPHS = 3
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+# Fixed permutation parameters, so signatures stay comparable across runs
+_rng = np.random.default_rng(20240601)
+PERMUTATION_A = _rng.integers(1, MERSENNE_PRIME, NUM_PERM, dtype=np.uint64)
+PERMUTATION_B = _rng.integers(0, MERSENNE_PRIME, NUM_PERM, dtype=np.uint64)
+
+
+# Lowercased words without punctuation, for shingling, diffing and quote matching
+def normalize(text):
+    return " ".join(TOKEN.findall(text.lower()))
+
+# Cleaned paragraphs of a PDF/TXT file (headers, footers, disclaimers and references dropped)
+def document_paragraphs(path, mime_type=None):
+    with SpooledPages(path, mime_type) as spooled:
+        return [text for _, text in spooled_paragraphs(spooled)]
+
+# 32-bit hashes of the distinct word shingles of a document
+def shingle_hashes(paragraphs, shingle_words=SHINGLE_WORDS):
+    words = normalize(" ".join(paragraphs)).split()
+    shingles = {" ".join(words[i:i + shingle_words]) for i in range(max(1, len(words) - shingle_words + 1))}
+    return np.array([int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little")
+                     for shingle in shingles if shingle], dtype=np.uint64)
+
+# MinHash signature: the minimum of each permutation over the shingle hashes
+def minhash(hashes):
+    if not len(hashes):
+        return np.full(NUM_PERM, MAX_HASH, dtype=np.uint32)
+    permuted = (np.outer(hashes, PERMUTATION_A) + PERMUTATION_B) % MERSENNE_PRIME & MAX_HASH
+    return permuted.min(axis=0).astype(np.uint32)
+
+def document_signature(paragraphs):
+    return minhash(shingle_hashes(paragraphs))
+
+# Estimated Jaccard similarity of two signatures
+def similarity(signature, other):
+    return float(np.mean(signature == other))
+
+# LSH bucket of each band of a signature
+def band_buckets(signature, bands=BANDS):
+    rows = len(signature) // bands
+    return [f"{band}:{hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8).hexdigest()}"
+            for band in range(bands)]
+
+
+class NearDuplicateIndex:
+    def __init__(self, path=NEAR_DUPLICATES_PATH, threshold=SIMILARITY_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " document_hash TEXT PRIMARY KEY,"
+                " signature BLOB NOT NULL,"
+                " paragraphs BLOB NOT NULL,"  # zlib-compressed JSON list, for diffing against revisions
+                " created REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " bucket TEXT NOT NULL,"
+                " document_hash TEXT NOT NULL,"
+                " PRIMARY KEY (bucket, document_hash)) WITHOUT ROWID"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    # Index a document's paragraphs under its content hash (re-adding replaces the entry)
+    def add(self, document_hash, paragraphs, signature=None):
+        if signature is None:
+            signature = document_signature(paragraphs)
+        with self._connect() as conn:
+            conn.execute("DELETE FROM buckets WHERE document_hash = ?", (document_hash,))
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (document_hash, signature, paragraphs, created) VALUES (?, ?, ?, ?)",
+                (document_hash, signature.tobytes(), zlib.compress(json.dumps(paragraphs).encode("utf-8")), time.time())
+            )
+            conn.executemany("INSERT OR IGNORE INTO buckets (bucket, document_hash) VALUES (?, ?)",
+                             [(bucket, document_hash) for bucket in band_buckets(signature)])
+
+    # Indexed documents sharing an LSH bucket with the signature and at least threshold similar:
+    # [(document_hash, similarity)], most similar first
+    def find(self, signature, exclude=None, threshold=None):
+        threshold = self.threshold if threshold is None else threshold
+        buckets = band_buckets(signature)
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT d.document_hash, d.signature FROM documents d WHERE d.document_hash IN"
+                " (SELECT document_hash FROM buckets WHERE bucket IN (" + ", ".join("?" * len(buckets)) + "))",
+                buckets
+            ).fetchall()
+        matches = [(document_hash, similarity(signature, np.frombuffer(blob, dtype=np.uint32)))
+                   for document_hash, blob in rows if document_hash != exclude]
+        return sorted([match for match in matches if match[1] >= threshold], key=lambda match: -match[1])
+
+    # Stored paragraphs of an indexed document, or None
+    def paragraphs(self, document_hash):
+        with self._connect() as conn:
+            row = conn.execute("SELECT paragraphs FROM documents WHERE document_hash = ?", (document_hash,)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+
+# Paragraph diff of a revision: (indices of new paragraphs that are changed or added,
+# normalized text of old paragraphs that were changed or removed)
+def diff_paragraphs(old_paragraphs, new_paragraphs):
+    old = [normalize(text) for text in old_paragraphs]
+    new = [normalize(text) for text in new_paragraphs]
+    changed_new = set()
+    changed_old = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+        if tag != "equal":
+            changed_new.update(range(j1, j2))
+            changed_old.extend(old[i1:i2])
+    return changed_new, changed_old
+
+# Quotes of a stored result; merged section results join several with " | "
+def quote_parts(quote):
+    return [part for part in (normalize(text) for text in str(quote or "").split("|")) if part]
+
+# IDs of the criteria to re-evaluate for a revision of an evaluated document. A criterion is re-evaluated when
+# it has no usable previous result, when one of its quotes is in changed or removed text (or no longer found in
+# the document), or when one of its most relevant paragraphs (by BM25 against the criterion) changed.
+def criteria_to_reevaluate(previous, criteria_list, old_paragraphs, new_paragraphs, relevant=RELEVANT_PARAGRAPHS):
+    changed_new, changed_old = diff_paragraphs(old_paragraphs, new_paragraphs)
+    if not changed_new and not changed_old:
+        return [item["ID"] for item in criteria_list if item["ID"] not in previous]
+    new = [normalize(text) for text in new_paragraphs]
+    unchanged_text = "\n".join(text for i, text in enumerate(new) if i not in changed_new)
+    changed_text = "\n".join([new[i] for i in sorted(changed_new)] + changed_old)
+    index = BM25Index(new_paragraphs) if new_paragraphs else None
+    ids = []
+    for item in criteria_list:
+        result = previous.get(item["ID"])
+        if result is None:
+            ids.append(item["ID"])
+            continue
+        quotes = quote_parts(result.get("quote"))
+        if any(quote in changed_text or quote not in unchanged_text for quote in quotes):
+            ids.append(item["ID"])
+        elif index is not None and changed_new & set(index.top_k(criterion_query(item), relevant)):
+            ids.append(item["ID"])
+    return ids
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index whitepapers for near-duplicate lookup, or look one up.")
+    parser.add_argument("command", choices=["index", "find"])
+    parser.add_argument("paths", nargs="+", help="PDF/TXT files or directories")
+    parser.add_argument("--index", default=NEAR_DUPLICATES_PATH, help="Near-duplicate index database")
+    parser.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD,
+                        help="Minimum estimated similarity reported by find")
+    args = parser.parse_args(argv)
+
+    files = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.lower().endswith((".pdf", ".txt")))
+        else:
+            files.append(path)
+    index = NearDuplicateIndex(args.index, args.threshold)
+    failures = 0
+    for path in files:
+        try:
+            document_hash = hash_file(path)
+            paragraphs = document_paragraphs(path)
+        except Exception as e:
+            print(f"{path}: {type(e).__name__}: {e}", file=sys.stderr)
+            failures += 1
+            continue
+        if args.command == "index":
+            index.add(document_hash, paragraphs)
+            print(f"{document_hash[:12]} {path}")
+        else:
+            for match_hash, match_similarity in index.find(document_signature(paragraphs), exclude=document_hash):
+                print(f"{path}\t{match_hash}\t{match_similarity:.3f}")
+    if args.command == "index":
+        print(f"Indexed {len(files) - failures}/{len(files)} documents", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
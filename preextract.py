@@ -0,0 +1,332 @@
+### Local pre-extraction and relevance pruning of whitepapers
+#### Extracts text page by page, drops boilerplate and keeps the top-k BM25 passages per criterion
+#### (or splits the whole text into sections for map-reduce evaluation of very large documents)
+#
+# Documents are streamed: a first pass spools the extracted pages to a temporary file while counting
+# header/footer candidates, and later passes read pages back one at a time, so only the paragraphs in
+# flight, per-passage term statistics and the selected excerpts are held in memory.
+#
+# pypdf is only needed for PDF input and is imported on first use.
+
+import heapq
+import json
+import math
+import re
+import tempfile
+from collections import Counter
+
+# Passages are built from paragraphs up to roughly this many words
+PASSAGE_WORDS = 180
+
+# Passages kept per criterion
+DEFAULT_TOP_K = 6
+
+# Sections for map-reduce evaluation hold up to this many words
+SECTION_WORDS = 6000
+
+# Plain-text "pages" for TXT input (split on form feeds, else on this many characters)
+TEXT_PAGE_CHARS = 4000
+
+# A header/footer line must repeat on this share of pages (and at least 3) to be dropped
+BOILERPLATE_PAGE_SHARE = 0.5
+
+# Lines checked at the top and bottom of each page for repeated headers/footers
+EDGE_LINES = 3
+
+REFERENCES_HEADING = re.compile(r'^\s*(\d+(\.\d+)*\.?\s+)?(references|bibliography|works cited|citations)\s*$', re.I)
+APPENDIX_HEADING = re.compile(r'^\s*(\d+(\.\d+)*\.?\s+)?(appendix|annex)\b', re.I)
+DISCLAIMER = re.compile(
+    r'(this (white ?paper|document) (does not|is not|shall not) constitute|not (constitute )?(financial|investment|legal) advice'
+    r'|all rights reserved|forward[- ]looking statements|no representation or warranty|for informational purposes only)', re.I
+)
+# Numbered heading at the start of a paragraph, e.g. "3.2 Tokenomics" or "IV. Team"
+SECTION_HEADING = re.compile(r'^(\d{1,2}(\.\d{1,2})*\.?|[IVX]{1,5}\.)\s+[A-Z]')
+TOKEN = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in into is it its of on or that the their this to was were which with
+such any other may not no under where who whom these those than then there been being also
+""".split())
+
+
+# Yield (page_number, text) one page at a time from a PDF or TXT file
+def iter_pages(path, mime_type=None):
+    is_pdf = mime_type == "application/pdf" if mime_type else path.lower().endswith(".pdf")
+    if is_pdf:
+        from pypdf import PdfReader
+        reader = PdfReader(path)
+        for number, page in enumerate(reader.pages, start=1):
+            yield number, page.extract_text() or ""
+        return
+    with open(path, encoding="utf-8", errors="replace") as f:
+        form_feeds = any("\f" in chunk for chunk in iter(lambda: f.read(TEXT_PAGE_CHARS), ""))
+        f.seek(0)
+        if not form_feeds:
+            for number, page in enumerate(iter(lambda: f.read(TEXT_PAGE_CHARS), ""), start=1):
+                yield number, page
+            return
+        number = 1
+        buffer = ""
+        for chunk in iter(lambda: f.read(TEXT_PAGE_CHARS), ""):
+            *pages, buffer = (buffer + chunk).split("\f")
+            for page in pages:
+                yield number, page
+                number += 1
+        yield number, buffer
+
+# Line key for header/footer detection: page numbers and whitespace differences are ignored
+def _line_key(line):
+    return re.sub(r'\d+', '#', " ".join(line.split()).lower())
+
+# Keys of the lines at the top and bottom of a page (header/footer candidates)
+def _edge_keys(lines):
+    return {_line_key(line) for line in lines[:EDGE_LINES] + lines[-EDGE_LINES:]}
+
+# Header/footer keys that repeat on enough pages to count as boilerplate
+def boilerplate_keys(edge_counts, page_count):
+    min_pages = max(3, int(page_count * BOILERPLATE_PAGE_SHARE))
+    return {key for key, count in edge_counts.items() if count >= min_pages}
+
+
+# First pass over a document: pages are written to a temporary file (one JSON line each) while the
+# header/footer candidates are counted; iterating reads the pages back one at a time
+class SpooledPages:
+    def __init__(self, path, mime_type=None):
+        self.spool = tempfile.TemporaryFile("w+", encoding="utf-8")
+        self.edge_counts = Counter()
+        self.page_count = 0
+        self.title = ""  # First line of the first page, before the running header is stripped as boilerplate
+        for number, text in iter_pages(path, mime_type):
+            lines = [line for line in text.splitlines() if line.strip()]
+            if not self.title and lines:
+                self.title = lines[0].strip()[:200]
+            self.edge_counts.update(_edge_keys(lines))
+            self.page_count += 1
+            self.spool.write(json.dumps([number, text]) + "\n")
+
+    @property
+    def boilerplate(self):
+        return boilerplate_keys(self.edge_counts, self.page_count)
+
+    def __iter__(self):
+        self.spool.seek(0)
+        for line in self.spool:
+            number, text = json.loads(line)
+            yield number, text
+
+    def close(self):
+        self.spool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Cleaned paragraphs of a spooled document, streamed page by page: repeated headers/footers, disclaimer
+# paragraphs and reference lists are dropped. Yields (page, paragraph).
+def spooled_paragraphs(spooled, drop_disclaimers=True):
+    return iter_paragraphs(spooled, spooled.boilerplate, drop_disclaimers)
+
+# Paragraphs of pages with the given boilerplate keys removed, yielded as (page, paragraph)
+def iter_paragraphs(pages, boilerplate, drop_disclaimers=True):
+    in_references = False
+    for number, text in pages:
+        lines = [line for line in text.splitlines() if line.strip()]
+        paragraphs = []
+        current = []
+        for index, line in enumerate(lines):
+            is_edge = index < EDGE_LINES or index >= len(lines) - EDGE_LINES
+            if is_edge and _line_key(line) in boilerplate:
+                continue
+            if REFERENCES_HEADING.match(line):
+                in_references = True
+            elif in_references and APPENDIX_HEADING.match(line):
+                in_references = False
+            if in_references:
+                continue
+            # A numbered heading is a paragraph of its own
+            if len(line) < 80 and SECTION_HEADING.match(line.strip()):
+                if current:
+                    paragraphs.append((number, " ".join(current)))
+                    current = []
+                paragraphs.append((number, line.strip()))
+                continue
+            current.append(line.strip())
+            # A short line that ends a sentence closes the paragraph
+            if line.rstrip().endswith((".", ":", "?", "!")) and len(line) < 60:
+                paragraphs.append((number, " ".join(current)))
+                current = []
+        if current:
+            paragraphs.append((number, " ".join(current)))
+        for page, paragraph in paragraphs:
+            if not (drop_disclaimers and DISCLAIMER.search(paragraph)):
+                yield page, paragraph
+
+# Merge paragraphs into passages of about PASSAGE_WORDS words, yielded as {"pages": (first, last), "text": ...}
+def iter_passages(paragraphs, passage_words=PASSAGE_WORDS):
+    words = []
+    first_page = last_page = None
+    for number, text in paragraphs:
+        if first_page is None:
+            first_page = number
+        last_page = number
+        words.extend(text.split())
+        if len(words) >= passage_words:
+            yield {"pages": (first_page, last_page), "text": " ".join(words)}
+            words = []
+            first_page = None
+    if words:
+        yield {"pages": (first_page, last_page), "text": " ".join(words)}
+
+def tokenize(text):
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+# Okapi BM25 over an in-memory list of texts (near_duplicates ranks paragraphs with it)
+class BM25Index:
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(tokenize(document)) for document in documents]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0
+        document_frequency = Counter()
+        for counts in self.term_counts:
+            document_frequency.update(counts.keys())
+        n = len(documents)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def scores(self, query):
+        terms = [term for term in set(tokenize(query)) if term in self.idf]
+        results = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / (self.avg_length or 1))
+            score = 0.0
+            for term in terms:
+                tf = counts.get(term, 0)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            results.append(score)
+        return results
+
+    def top_k(self, query, k):
+        ranked = sorted(enumerate(self.scores(query)), key=lambda item: -item[1])
+        return [index for index, score in ranked[:k] if score > 0]
+
+# Query text for a criterion: name plus description/scope (or summary for MISC criteria)
+def criterion_query(criterion):
+    return " ".join(criterion.get(field, "") for field in ("criteria", "description", "scope", "summary"))
+
+# Top-k BM25 passage indices per criterion over a stream of passages: one pass keeps only each passage's length
+# and its counts of query terms (the scores are the same as BM25Index's), then a bounded heap per criterion
+# picks the top k. Returns ({criterion ID: passage indices}, passage count, total words).
+def rank_passages(passages, criteria_list, top_k=DEFAULT_TOP_K, k1=1.5, b=0.75):
+    queries = {criterion["ID"]: set(tokenize(criterion_query(criterion))) for criterion in criteria_list}
+    query_terms = set().union(*queries.values())
+    stats = []
+    document_frequency = Counter()
+    total_words = 0
+    for passage in passages:
+        total_words += len(passage["text"].split())
+        tokens = tokenize(passage["text"])
+        counts = Counter(token for token in tokens if token in query_terms)
+        document_frequency.update(counts.keys())
+        stats.append((len(tokens), counts))
+    n = len(stats)
+    avg_length = (sum(length for length, _ in stats) / n) if n else 0
+    idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def score(length, counts, terms):
+        norm = k1 * (1 - b + b * length / (avg_length or 1))
+        return sum(idf[term] * counts[term] * (k1 + 1) / (counts[term] + norm) for term in terms if counts[term])
+
+    selection = {}
+    for id_, terms in queries.items():
+        terms = [term for term in terms if term in idf]
+        ranked = heapq.nlargest(top_k, ((score(length, counts, terms), -i) for i, (length, counts) in enumerate(stats)))
+        selection[id_] = [-negative_index for value, negative_index in ranked if value > 0]
+    return selection, n, total_words
+
+
+class Excerpts:
+    def __init__(self, title, passages, selection, total_words, passage_count):
+        self.title = title
+        self.passages = passages  # Selected passages only: passage index -> passage
+        self.selection = selection  # criterion ID -> passage indices
+        self.total_words = total_words
+        self.passage_count = passage_count
+
+    @property
+    def selected_indices(self):
+        return sorted({i for indices in self.selection.values() for i in indices})
+
+    @property
+    def selected_words(self):
+        return sum(len(self.passages[i]["text"].split()) for i in self.selected_indices)
+
+    # Text block sent to Gemini: each passage once, tagged with pages and the criteria it was picked for
+    def to_prompt(self):
+        picked_for = {}
+        for id_, indices in self.selection.items():
+            for i in indices:
+                picked_for.setdefault(i, []).append(id_)
+        lines = [f"Whitepaper title (first heading): {self.title}", ""]
+        for i in self.selected_indices:
+            first, last = self.passages[i]["pages"]
+            pages = f"p. {first}" if first == last else f"pp. {first}-{last}"
+            lines.append(f"[Excerpt {i + 1}, {pages}, relevant to {', '.join(picked_for[i])}]")
+            lines.append(self.passages[i]["text"])
+            lines.append("")
+        return "\n".join(lines)
+
+# Split a PDF/TXT file into sections of at most section_words words for map-reduce evaluation.
+# Sections are cut at numbered headings once at least half full, otherwise where the budget runs
+# out. Returns (title, [{"pages": (first, last), "heading": ..., "text": ...}]).
+# The sections are returned whole, since all of them are sent; pages are streamed from the spool.
+def split_sections(path, mime_type=None, section_words=SECTION_WORDS, drop_disclaimers=True):
+    sections = []
+    current = []
+    words = 0
+
+    def close():
+        first_text = current[0][1]
+        heading = first_text if SECTION_HEADING.match(first_text) and len(first_text) < 80 else ""
+        sections.append({"pages": (current[0][0], current[-1][0]), "heading": heading,
+                         "text": "\n\n".join(text for _, text in current)})
+
+    with SpooledPages(path, mime_type) as spooled:
+        for number, text in spooled_paragraphs(spooled, drop_disclaimers):
+            paragraph_words = text.split()
+            # A paragraph longer than a whole section is cut into section-sized pieces
+            for start in range(0, len(paragraph_words), section_words):
+                piece = paragraph_words[start:start + section_words]
+                at_heading = start == 0 and SECTION_HEADING.match(text) and words >= section_words // 2
+                if current and (words + len(piece) > section_words or at_heading):
+                    close()
+                    current = []
+                    words = 0
+                current.append((number, " ".join(piece)))
+                words += len(piece)
+    if current:
+        close()
+    return spooled.title, sections
+
+# Text block sent to Gemini for one section
+def section_prompt(title, section, index, total):
+    first, last = section["pages"]
+    pages = f"p. {first}" if first == last else f"pp. {first}-{last}"
+    heading = f", starting at \"{section['heading']}\"" if section["heading"] else ""
+    return f"Whitepaper title (first heading): {title}\n\n[Section {index + 1} of {total}, {pages}{heading}]\n{section['text']}"
+
+# Full pipeline: extract, clean, split and rank a PDF/TXT file for the given criteria. Passages are streamed
+# twice from the spooled pages: once to rank them, once to keep the text of the selected ones.
+def extract_excerpts(path, criteria_list, top_k=DEFAULT_TOP_K, mime_type=None, drop_disclaimers=True):
+    with SpooledPages(path, mime_type) as spooled:
+        selection, passage_count, total_words = rank_passages(
+            iter_passages(spooled_paragraphs(spooled, drop_disclaimers)), criteria_list, top_k)
+        selected = {i for indices in selection.values() for i in indices}
+        passages = {i: passage for i, passage in enumerate(iter_passages(spooled_paragraphs(spooled, drop_disclaimers)))
+                    if i in selected}
+    return Excerpts(spooled.title, passages, selection, total_words, passage_count)
@@ -0,0 +1,282 @@
+### Local pre-screen of whitepapers
+#### Hashed word n-gram features and per-criterion linear models trained on stored Gemini evaluations
+#
+# Usage:
+#   python prescreen.py train                               # Fit on stored evaluations of indexed documents
+#   python prescreen.py evaluate --holdout 0.2              # Agreement with the Gemini labels on held-out documents
+#   python prescreen.py predict whitepapers/ --set FCA --queue gemini.jsonl
+#
+# Training texts come from the near-duplicate index (documents evaluated with batch_cli.py --near-duplicates or
+# indexed with near_duplicates.py index) and from --documents directories. predict scores every file locally;
+# documents whose predicted probability is clear of the Unsure band by --margin get a local verdict, the rest are
+# written to the --queue manifest for batch_cli.py, most uncertain first.
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+
+from scoring import CRITERIA_SETS, ALL_REGULATORS, get_criteria_set, union_criteria, fraud_probability, fraud_verdict, \
+    is_borderline
+from preextract import tokenize
+from near_duplicates import NearDuplicateIndex, NEAR_DUPLICATES_PATH, document_paragraphs
+from evaluation_cache import hash_file
+from evaluation_store import EvaluationStore, STORE_PATH
+
+MODEL_PATH = os.environ.get("FRAUD_PRESCREEN_MODEL", ".prescreen.npz")
+
+# Feature space of 2**FEATURE_BITS hashed unigrams and bigrams
+FEATURE_BITS = 16
+
+EPOCHS = 30
+LEARNING_RATE = 0.5
+L2 = 1e-4
+
+# Distance from the Unsure band a predicted probability needs for a local verdict
+PRESCREEN_MARGIN = 0.15
+
+# A criterion counts as flagged when its score is above this
+FLAG_SCORE = 0.5
+
+
+# Sparse feature vector of a document: sorted hashed n-gram indices and L2-normalized log counts
+def document_features(paragraphs, bits=FEATURE_BITS):
+    tokens = tokenize(" ".join(paragraphs))
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    if not grams:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    hashes = np.array([int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=4).digest(), "little")
+                       for gram in grams], dtype=np.int64) & ((1 << bits) - 1)
+    indices, counts = np.unique(hashes, return_counts=True)
+    values = np.log1p(counts).astype(np.float32)
+    return indices, values / np.linalg.norm(values)
+
+def sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+# Logistic regression per criterion, trained on the criterion scores (0-1) of stored evaluations as soft labels
+class PrescreenModel:
+    def __init__(self, criteria_ids, bits=FEATURE_BITS, weights=None, bias=None):
+        self.criteria_ids = list(criteria_ids)
+        self.bits = bits
+        self.weights = weights if weights is not None else np.zeros((1 << bits, len(self.criteria_ids)), dtype=np.float32)
+        self.bias = bias if bias is not None else np.zeros(len(self.criteria_ids), dtype=np.float32)
+
+    # Stochastic gradient descent over examples [(indices, values, {criterion ID: score})];
+    # criteria without a label in an example are not trained on it
+    def fit(self, examples, epochs=EPOCHS, learning_rate=LEARNING_RATE, l2=L2, seed=0):
+        columns = {id_: i for i, id_ in enumerate(self.criteria_ids)}
+        prepared = []
+        for indices, values, scores in examples:
+            targets = np.zeros(len(columns), dtype=np.float32)
+            mask = np.zeros(len(columns), dtype=np.float32)
+            for id_, score in scores.items():
+                if id_ in columns:
+                    targets[columns[id_]] = score
+                    mask[columns[id_]] = 1
+            prepared.append((indices, values, targets, mask))
+        # Start from the mean label, so criteria with little text signal predict their base rate
+        label_sum = sum(targets for _, _, targets, _ in prepared)
+        label_count = sum(mask for _, _, _, mask in prepared)
+        mean = np.clip(np.divide(label_sum, label_count, out=np.full(len(columns), 0.5, dtype=np.float32),
+                                 where=label_count > 0), 0.01, 0.99)
+        self.bias = np.log(mean / (1 - mean)).astype(np.float32)
+        rng = np.random.default_rng(seed)
+        for _ in range(epochs):
+            for i in rng.permutation(len(prepared)):
+                indices, values, targets, mask = prepared[i]
+                rows = self.weights[indices]
+                gradient = (sigmoid(values @ rows + self.bias) - targets) * mask
+                self.weights[indices] = rows - learning_rate * (np.outer(values, gradient) + l2 * rows)
+                self.bias -= learning_rate * gradient
+        return self
+
+    # Predicted score (0-1) of every known criterion
+    def predict_scores(self, indices, values):
+        return dict(zip(self.criteria_ids, sigmoid(values @ self.weights[indices] + self.bias).tolist()))
+
+    def save(self, path=MODEL_PATH):
+        with open(path, "wb") as f:
+            np.savez_compressed(f, weights=self.weights, bias=self.bias, criteria_ids=np.array(self.criteria_ids),
+                                bits=np.array(self.bits))
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        with np.load(path) as data:
+            return cls(data["criteria_ids"].tolist(), int(data["bits"]), data["weights"], data["bias"])
+
+
+# Predicted probability and verdict per criteria set from predicted criterion scores
+def predict_sets(scores, criteria_sets):
+    results = {}
+    for name in criteria_sets:
+        criteria_list, coefficients = get_criteria_set(name)
+        set_scores = {item["ID"]: scores[item["ID"]] for item in criteria_list if item["ID"] in scores}
+        probability = fraud_probability(set_scores, coefficients)
+        results[name] = {"probability": probability, "verdict": fraud_verdict(probability)}
+    return results
+
+# Gemini queue priority of a prediction: 1 at the middle of the Unsure band, falling towards 0 at the extremes
+def priority(probability):
+    return 1 - abs(probability - 0.5) * 2
+
+# Training examples from stored labels: [(document_hash, indices, values, label)] for every labelled document
+# whose text is in the near-duplicate index or in one of the directories
+def load_examples(store, index, directories=(), bits=FEATURE_BITS):
+    labels = store.labels()
+    paths = {}
+    for directory in directories:
+        for name in sorted(os.listdir(directory)):
+            if name.lower().endswith((".pdf", ".txt")):
+                paths.setdefault(hash_file(os.path.join(directory, name)), os.path.join(directory, name))
+    examples = []
+    for document_hash, label in labels.items():
+        paragraphs = index.paragraphs(document_hash)
+        if paragraphs is None and document_hash in paths:
+            paragraphs = document_paragraphs(paths[document_hash])
+        if paragraphs:
+            indices, values = document_features(paragraphs, bits)
+            examples.append((document_hash, indices, values, label))
+    return examples
+
+# Deterministic held-out split by document hash
+def is_holdout(document_hash, holdout):
+    return int(document_hash[:8], 16) / 0xFFFFFFFF < holdout
+
+# Agreement of predictions with the Gemini labels of examples: per criterion the mean absolute score error and
+# flagged/not-flagged agreement, per criteria set the probability error, verdict agreement, the share of documents
+# with a local (confident) verdict and the verdict agreement on those
+def agreement(model, examples, margin=PRESCREEN_MARGIN):
+    criteria = {}
+    sets = {}
+    for _, indices, values, label in examples:
+        scores = model.predict_scores(indices, values)
+        for id_, score in label["scores"].items():
+            if id_ in scores:
+                stats = criteria.setdefault(id_, {"n": 0, "abs_error": 0.0, "flag_agree": 0})
+                stats["n"] += 1
+                stats["abs_error"] += abs(scores[id_] - score)
+                stats["flag_agree"] += (scores[id_] > FLAG_SCORE) == (score > FLAG_SCORE)
+        predicted = predict_sets(scores, [name for name in label["sets"] if name in CRITERIA_SETS])
+        for name, (probability, verdict) in label["sets"].items():
+            if name not in predicted:
+                continue
+            stats = sets.setdefault(name, {"n": 0, "abs_error": 0.0, "verdict_agree": 0, "confident": 0,
+                                           "confident_agree": 0})
+            agree = predicted[name]["verdict"] == verdict
+            stats["n"] += 1
+            stats["abs_error"] += abs(predicted[name]["probability"] - probability)
+            stats["verdict_agree"] += agree
+            if not is_borderline(predicted[name]["probability"], margin):
+                stats["confident"] += 1
+                stats["confident_agree"] += agree
+    return {
+        "documents": len(examples),
+        "criteria": {id_: {"n": s["n"], "mae": round(s["abs_error"] / s["n"], 4),
+                           "flag_agreement": round(s["flag_agree"] / s["n"], 4)} for id_, s in sorted(criteria.items())},
+        "sets": {name: {"n": s["n"], "probability_mae": round(s["abs_error"] / s["n"], 4),
+                        "verdict_agreement": round(s["verdict_agree"] / s["n"], 4),
+                        "local_share": round(s["confident"] / s["n"], 4),
+                        "local_verdict_agreement": round(s["confident_agree"] / s["confident"], 4) if s["confident"] else None}
+                 for name, s in sets.items()},
+    }
+
+# Triage row of one document: local verdict when every set's prediction is confident, otherwise a Gemini priority
+def triage(model, path, criteria_sets, margin=PRESCREEN_MARGIN):
+    scores = model.predict_scores(*document_features(document_paragraphs(path), model.bits))
+    predicted = predict_sets(scores, criteria_sets)
+    confident = all(not is_borderline(result["probability"], margin) for result in predicted.values())
+    row = {"path": path, "by_set": {name: {"probability": round(result["probability"], 4), "verdict": result["verdict"]}
+                                    for name, result in predicted.items()},
+           "local": confident}
+    ids = {item["ID"] for name in criteria_sets for item in get_criteria_set(name)[0]}
+    row["fraud_criteria"] = sorted(id_ for id_, score in scores.items() if id_ in ids and score > FLAG_SCORE)
+    if not confident:
+        row["priority"] = round(max(priority(result["probability"]) for result in predicted.values()), 4)
+    return row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train, evaluate and run the local pre-screen classifier.")
+    parser.add_argument("--model", default=MODEL_PATH, help="Pre-screen model file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("train", "evaluate"):
+        command = commands.add_parser(name)
+        command.add_argument("--store", default=STORE_PATH, help="Evaluation store with the Gemini labels")
+        command.add_argument("--index", default=NEAR_DUPLICATES_PATH, help="Near-duplicate index with document texts")
+        command.add_argument("--documents", action="append", default=[],
+                             help="Directory of PDF/TXT files with stored evaluations (repeatable)")
+        command.add_argument("--bits", type=int, default=FEATURE_BITS, help="Hashed feature space size (2**bits)")
+        command.add_argument("--epochs", type=int, default=EPOCHS)
+        command.add_argument("--holdout", type=float, default=0.2 if name == "evaluate" else 0.0,
+                             help="Share of documents held out from training and used for the agreement metrics")
+        command.add_argument("--margin", type=float, default=PRESCREEN_MARGIN,
+                             help="Distance from the Unsure band needed for a local verdict")
+    predict = commands.add_parser("predict")
+    predict.add_argument("paths", nargs="+", help="PDF/TXT files or directories")
+    predict.add_argument("--set", dest="selected_set", default="Selected Set", choices=CRITERIA_SETS + [ALL_REGULATORS])
+    predict.add_argument("--margin", type=float, default=PRESCREEN_MARGIN,
+                         help="Distance from the Unsure band needed for a local verdict")
+    predict.add_argument("--output", help="JSONL triage rows (default: stdout)")
+    predict.add_argument("--queue", help="Manifest of the documents left for Gemini, most uncertain first")
+    args = parser.parse_args(argv)
+
+    if args.command == "predict":
+        model = PrescreenModel.load(args.model)
+        criteria_sets = CRITERIA_SETS if args.selected_set == ALL_REGULATORS else [args.selected_set]
+        files = []
+        for path in args.paths:
+            if os.path.isdir(path):
+                files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                             if name.lower().endswith((".pdf", ".txt")))
+            else:
+                files.append(path)
+        rows = []
+        for path in files:
+            try:
+                rows.append(triage(model, path, criteria_sets, args.margin))
+            except Exception as e:
+                rows.append({"path": path, "local": False, "priority": 1.0, "error": f"{type(e).__name__}: {e}"})
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            for row in rows:
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+        finally:
+            if args.output:
+                out.close()
+        queued = sorted((row for row in rows if not row["local"]), key=lambda row: -row["priority"])
+        if args.queue:
+            with open(args.queue, "w", encoding="utf-8") as f:
+                for row in queued:
+                    f.write(json.dumps({"path": row["path"], "priority": row["priority"]}) + "\n")
+        print(f"{len(rows) - len(queued)}/{len(rows)} documents scored locally, {len(queued)} left for Gemini",
+              file=sys.stderr)
+        return 0
+
+    examples = load_examples(EvaluationStore(args.store), NearDuplicateIndex(args.index), args.documents, args.bits)
+    training = [example for example in examples if not is_holdout(example[0], args.holdout)]
+    held_out = [example for example in examples if is_holdout(example[0], args.holdout)]
+    if not training:
+        print("No stored evaluations with document text to train on", file=sys.stderr)
+        return 1
+    criteria_ids = [item["ID"] for item in union_criteria()]
+    model = PrescreenModel(criteria_ids, args.bits).fit(
+        [(indices, values, label["scores"]) for _, indices, values, label in training], args.epochs)
+    if args.command == "train":
+        model.save(args.model)
+        print(f"Trained on {len(training)} documents, saved to {args.model}", file=sys.stderr)
+    metrics = {"training": agreement(model, training, args.margin)}
+    if held_out:
+        metrics["held_out"] = agreement(model, held_out, args.margin)
+    elif args.command == "evaluate":
+        print("No held-out documents; reporting training agreement only", file=sys.stderr)
+    print(json.dumps(metrics, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
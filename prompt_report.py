@@ -0,0 +1,82 @@
+### Prompt token report per criteria set
+#### Compares the previous prompt layout (indented criteria JSON) with the compact prefix layout
+#
+# Usage:
+#   python prompt_report.py                      # Estimated tokens (4 characters per token)
+#   GEMINI_API_KEY=... python prompt_report.py   # Exact counts from the Gemini count_tokens API
+
+import argparse
+import os
+import sys
+
+import gemini_client
+from gemini_client import (MODEL_NAME, FILE_INSTRUCTION, file_system_prompt, url_system_prompt, criteria_json,
+                           criteria_prefix, url_instruction, estimate_tokens, min_cache_tokens)
+from scoring import CRITERIA_SETS, ALL_REGULATORS, get_criteria_set
+
+# Placeholder URL for the URL prompt
+EXAMPLE_URL = "https://example.com/whitepaper"
+
+# User prompts as sent before compact serialization (the document part is not counted)
+def legacy_contents(kind, criteria_list):
+    if kind == "file":
+        return [f"Evaluate the attached whitepaper against the following criteria:\n{criteria_json(criteria_list, compact=False)}"]
+    return [f"Evaluate the whitepaper or project description at the following URL against the provided criteria:\n"
+            f"URL: {EXAMPLE_URL}\nCriteria:\n{criteria_json(criteria_list, compact=False)}"]
+
+def compact_contents(kind, criteria_list):
+    instruction = FILE_INSTRUCTION if kind == "file" else url_instruction(EXAMPLE_URL)
+    return [criteria_prefix(criteria_list), instruction]
+
+# Token counter: the count_tokens API when an API key is configured, else the local estimate
+def token_counter(model_name, use_api):
+    def count(contents, system_prompt):
+        if not use_api:
+            return estimate_tokens(contents, system_prompt)
+        model = gemini_client.load_genai().GenerativeModel(model_name=model_name, system_instruction=system_prompt)
+        return model.count_tokens(contents).total_tokens
+    return count
+
+# One row per criteria set (and the union of all sets sent in ALL_REGULATORS mode) and prompt kind
+def prompt_report(model_name=MODEL_NAME, use_api=False):
+    count = token_counter(model_name, use_api)
+    rows = []
+    for selected_set in CRITERIA_SETS + [ALL_REGULATORS]:
+        criteria_list, _ = get_criteria_set(selected_set)
+        for kind, system_prompt in (("file", file_system_prompt), ("url", url_system_prompt)):
+            legacy = count(legacy_contents(kind, criteria_list), system_prompt)
+            compact = count(compact_contents(kind, criteria_list), system_prompt)
+            prefix = count([criteria_prefix(criteria_list)], system_prompt)
+            rows.append({
+                "criteria_set": selected_set,
+                "prompt": kind,
+                "legacy_tokens": legacy,
+                "compact_tokens": compact,
+                "saving": 1 - compact / legacy if legacy else 0.0,
+                "prefix_tokens": prefix,
+                "prefix_cacheable": prefix >= min_cache_tokens(model_name),
+            })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report prompt tokens per criteria set, before and after compaction.")
+    parser.add_argument("--model", default=MODEL_NAME, help="Gemini model name")
+    parser.add_argument("--api-key", default=os.environ.get("GEMINI_API_KEY"),
+                        help="Gemini API key for exact counts (default: GEMINI_API_KEY environment variable)")
+    args = parser.parse_args(argv)
+
+    if args.api_key:
+        gemini_client.configure(args.api_key)
+    rows = prompt_report(args.model, bool(args.api_key))
+    print(f"{'criteria set':14} {'prompt':6} {'legacy':>8} {'compact':>8} {'saving':>7} {'prefix':>7}  cacheable")
+    for row in rows:
+        print(f"{row['criteria_set']:14} {row['prompt']:6} {row['legacy_tokens']:8d} {row['compact_tokens']:8d} "
+              f"{row['saving']:7.1%} {row['prefix_tokens']:7d}  {'yes' if row['prefix_cacheable'] else 'no'}")
+    print("Token counts from the Gemini API" if args.api_key else "Estimated token counts (4 characters per token)",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
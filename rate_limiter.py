@@ -0,0 +1,182 @@
+### Client-side rate limiting and adaptive retry for Gemini calls
+#### Shared RPM/TPM budgets, jittered exponential backoff with a deadline, and AIMD concurrency
+#
+# The request/token window lives in SQLite, so the budgets hold across Streamlit sessions,
+# batch threads and worker.py processes on one host. Configure with environment variables:
+#   FRAUD_RATE_LIMIT_PATH  window database (default .rate_limit.sqlite3)
+#   FRAUD_RPM / FRAUD_TPM  requests / tokens per minute (0 disables that budget)
+#   FRAUD_RETRY_DEADLINE   seconds a call may spend waiting and retrying
+
+import contextlib
+import os
+import random
+import sqlite3
+import threading
+import time
+
+RATE_LIMIT_PATH = os.environ.get("FRAUD_RATE_LIMIT_PATH", ".rate_limit.sqlite3")
+DEFAULT_RPM = int(os.environ.get("FRAUD_RPM", 150))
+DEFAULT_TPM = int(os.environ.get("FRAUD_TPM", 2_000_000))
+DEFAULT_DEADLINE = float(os.environ.get("FRAUD_RETRY_DEADLINE", 300))
+
+WINDOW = 60.0  # Seconds covered by the RPM/TPM budgets
+
+# Backoff: full jitter over min(MAX_DELAY, BASE_DELAY * 2**attempt)
+BASE_DELAY = 2.0
+MAX_DELAY = 60.0
+MAX_ATTEMPTS = 6
+
+# google.api_core exception names treated as transient (matched by name so the package stays optional)
+THROTTLE_ERRORS = ("ResourceExhausted", "TooManyRequests")
+TRANSIENT_ERRORS = THROTTLE_ERRORS + ("ServiceUnavailable", "InternalServerError", "DeadlineExceeded",
+                                      "GatewayTimeout", "RetryError")
+TRANSIENT_CODES = (429, 500, 502, 503, 504)
+
+
+class RateLimitExceeded(RuntimeError):
+    """The call could not be admitted or completed before its deadline."""
+
+
+def is_throttle(exc):
+    return type(exc).__name__ in THROTTLE_ERRORS or getattr(exc, "code", None) == 429
+
+def is_transient(exc):
+    return (type(exc).__name__ in TRANSIENT_ERRORS or getattr(exc, "code", None) in TRANSIENT_CODES
+            or isinstance(exc, (ConnectionError, TimeoutError)))
+
+# Delay before retry number `attempt` (0-based)
+def backoff_delay(attempt, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+# Sliding one-minute window of requests and tokens shared through SQLite
+class RateLimiter:
+    def __init__(self, path=RATE_LIMIT_PATH, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM):
+        self.path = path
+        self.rpm = rpm
+        self.tpm = tpm
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS calls (id INTEGER PRIMARY KEY, ts REAL NOT NULL, tokens INTEGER NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_calls_ts ON calls (ts)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    # Record a call if it fits both budgets; returns (call_id, 0) or (None, seconds to wait)
+    def try_acquire(self, tokens):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM calls WHERE ts < ?", (now - WINDOW,))
+            count, used, oldest = conn.execute("SELECT COUNT(*), COALESCE(SUM(tokens), 0), MIN(ts) FROM calls").fetchone()
+            over_rpm = self.rpm and count >= self.rpm
+            # A single call larger than the whole budget is admitted into an empty window
+            over_tpm = self.tpm and count and used + tokens > self.tpm
+            if over_rpm or over_tpm:
+                conn.execute("COMMIT")
+                return None, max(0.05, oldest + WINDOW - now)
+            call_id = conn.execute("INSERT INTO calls (ts, tokens) VALUES (?, ?)", (now, tokens)).lastrowid
+            conn.execute("COMMIT")
+            return call_id, 0
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    # Block until the call is admitted; raises RateLimitExceeded past the deadline
+    def acquire(self, tokens, deadline):
+        while True:
+            call_id, wait = self.try_acquire(tokens)
+            if call_id is not None:
+                return call_id
+            if time.time() + wait > deadline:
+                raise RateLimitExceeded(f"Gemini request budget ({self.rpm} RPM / {self.tpm} TPM) exhausted until the deadline")
+            time.sleep(wait)
+
+    # Replace the estimated token count of an admitted call with the reported one
+    def settle(self, call_id, tokens):
+        with self._connect() as conn:
+            conn.execute("UPDATE calls SET tokens = ? WHERE id = ?", (tokens, call_id))
+
+
+# Additive-increase / multiplicative-decrease limit on concurrent calls in this process
+class AdaptiveConcurrency:
+    def __init__(self, initial=8, minimum=1, maximum=32):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.active = 0
+        self._cond = threading.Condition()
+
+    @contextlib.contextmanager
+    def slot(self):
+        with self._cond:
+            while self.active >= int(self.limit):
+                self._cond.wait()
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.active -= 1
+                self._cond.notify_all()
+
+    # Grows by about one slot per `limit` successful calls
+    def on_success(self):
+        with self._cond:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def on_throttle(self):
+        with self._cond:
+            self.limit = max(self.minimum, self.limit / 2)
+
+
+# Runs Gemini calls under the rate limiter and concurrency limit, retrying transient errors
+class Scheduler:
+    def __init__(self, limiter=None, concurrency=None, max_attempts=MAX_ATTEMPTS, deadline=DEFAULT_DEADLINE,
+                 base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+        self.limiter = limiter
+        self.concurrency = concurrency or AdaptiveConcurrency()
+        self.max_attempts = max_attempts
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.throttled = 0
+
+    # Call fn() and return its result. `tokens` is the estimated cost charged to the TPM budget;
+    # tokens_of(result) gives the reported cost afterwards. rate_limited=False skips the budgets
+    # (e.g. File API uploads) but keeps concurrency control and retries.
+    def call(self, fn, tokens=0, tokens_of=None, rate_limited=True):
+        deadline = time.time() + self.deadline
+        attempt = 0
+        while True:
+            call_id = self.limiter.acquire(tokens, deadline) if (self.limiter and rate_limited) else None
+            try:
+                with self.concurrency.slot():
+                    result = fn()
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                if is_throttle(e):
+                    self.concurrency.on_throttle()
+                    with self._lock:
+                        self.throttled += 1
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+                attempt += 1
+                if attempt >= self.max_attempts or time.time() + delay > deadline:
+                    raise
+                with self._lock:
+                    self.retries += 1
+                time.sleep(delay)
+                continue
+            self.concurrency.on_success()
+            if call_id is not None and tokens_of is not None:
+                reported = tokens_of(result)
+                if reported is not None:
+                    self.limiter.settle(call_id, reported)
+            return result
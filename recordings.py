@@ -0,0 +1,106 @@
+### Recorded raw Gemini responses
+#### Response text with the inputs that produced it, for offline re-scoring and multi-sample consensus
+#
+# Recordings are keyed by the evaluation cache key (document, criteria set, criteria, system prompt
+# and model), so every sample of the same request shares one key. Nothing here expires.
+
+import json
+import os
+import sqlite3
+import time
+
+from evaluation_store import prompt_version
+
+RECORDINGS_PATH = os.environ.get("FRAUD_RECORDINGS_PATH", ".recordings.sqlite3")
+
+# Record raw responses by default in the batch tools (FRAUD_RECORD=1)
+RECORD_ENABLED = os.environ.get("FRAUD_RECORD", "") == "1"
+
+
+class ResponseRecorder:
+    def __init__(self, path=RECORDINGS_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " id INTEGER PRIMARY KEY,"
+                " request_key TEXT NOT NULL,"
+                " sample INTEGER NOT NULL,"
+                " document_hash TEXT NOT NULL,"
+                " source TEXT,"
+                " criteria_set TEXT NOT NULL,"
+                " criteria TEXT NOT NULL,"  # JSON criteria list as sent
+                " model TEXT,"
+                " prompt_version TEXT,"
+                " response_text TEXT NOT NULL,"
+                " created REAL NOT NULL,"
+                " UNIQUE (request_key, sample))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS prompts ("
+                " prompt_version TEXT PRIMARY KEY,"
+                " system_prompt TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_criteria_set ON responses (criteria_set, created)")
+
+    def _connect(self):
+        # A fresh connection per operation keeps recording safe across threads and processes
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # Store one raw response as the next sample of its request; returns the sample index
+    def record(self, request_key, document_hash, source, criteria_set, criteria_list, model, system_prompt,
+               response_text):
+        version = prompt_version(system_prompt)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            sample = conn.execute(
+                "SELECT COUNT(*) FROM responses WHERE request_key = ?", (request_key,)
+            ).fetchone()[0]
+            conn.execute("INSERT OR IGNORE INTO prompts (prompt_version, system_prompt) VALUES (?, ?)",
+                         (version, system_prompt))
+            conn.execute(
+                "INSERT INTO responses (request_key, sample, document_hash, source, criteria_set, criteria, model,"
+                " prompt_version, response_text, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (request_key, sample, document_hash, source, criteria_set, json.dumps(criteria_list, ensure_ascii=False),
+                 model, version, response_text, time.time())
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        return sample
+
+    # Recorded response texts of a request in sample order (at most `limit`)
+    def responses(self, request_key, limit=None):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT response_text FROM responses WHERE request_key = ? ORDER BY sample LIMIT ?",
+                (request_key, -1 if limit is None else limit)
+            ).fetchall()
+        return [row["response_text"] for row in rows]
+
+    # Recorded requests with all their samples, oldest first:
+    # {"request_key", "document_hash", "source", "criteria_set", "model", "prompt_version", "responses"}
+    def requests(self, criteria_set=None):
+        query = "SELECT * FROM responses"
+        params = []
+        if criteria_set:
+            query += " WHERE criteria_set = ?"
+            params.append(criteria_set)
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY created, sample", params).fetchall()
+        requests = {}
+        for row in rows:
+            request = requests.setdefault(row["request_key"], {
+                key: row[key] for key in ("request_key", "document_hash", "source", "criteria_set", "model",
+                                          "prompt_version")
+            })
+            request.setdefault("responses", []).append(row["response_text"])
+        return list(requests.values())
+
+    def system_prompt(self, version):
+        with self._connect() as conn:
+            row = conn.execute("SELECT system_prompt FROM prompts WHERE prompt_version = ?", (version,)).fetchone()
+        return row["system_prompt"] if row else None
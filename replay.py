@@ -0,0 +1,110 @@
+### Offline replay of recorded Gemini responses
+#### Re-parses and re-scores recorded raw responses without calling Gemini, with consensus over samples
+#
+# Usage:
+#   python replay.py --output replay.jsonl                 # Re-score every recorded request
+#   python replay.py --set FCA --unstable                  # Requests whose samples disagree on the verdict
+#   python replay.py --baseline replay.jsonl               # Report verdicts that changed since a previous run
+#
+# Responses are recorded by batch_cli.py --record. Requests with several samples (batch_cli.py --samples)
+# are scored from their consensus and report the spread of the per-sample probabilities.
+
+import argparse
+import json
+import sys
+
+from scoring import ALL_REGULATORS, get_criteria_set, parse_response
+from batch_cli import score_samples
+from recordings import ResponseRecorder, RECORDINGS_PATH
+
+# Re-score one recorded request; unparseable or unscoreable samples are counted and skipped
+def replay_request(request):
+    _, coefficients = get_criteria_set(request["criteria_set"])
+    row = {key: request[key] for key in ("request_key", "source", "criteria_set", "model", "prompt_version")}
+    sample_evaluations = []
+    names = []
+    errors = []
+    for response_text in request["responses"]:
+        try:
+            whitepaper_name, evaluations, _ = parse_response(response_text)
+            score_samples([evaluations], coefficients)
+        except (ValueError, KeyError, AttributeError, TypeError) as e:
+            errors.append(f"{type(e).__name__}: {e}")
+            continue
+        names.append(whitepaper_name)
+        sample_evaluations.append(evaluations)
+    row.update(samples=len(request["responses"]), errors=errors,
+               whitepaper_name=next((name for name in names if name), None))
+    if not sample_evaluations:
+        return row
+    scored, by_set = score_samples(sample_evaluations, coefficients)
+    results = by_set if by_set is not None else {request["criteria_set"]: scored}
+    row["results"] = {}
+    for name, result in results.items():
+        summary = {"probability": round(result["probability"], 4), "verdict": result["verdict"],
+                   "fraud_criteria": result["fraud_criteria"]}
+        if len(sample_evaluations) > 1:
+            summary.update(probability_std=round(result["probability_std"], 4),
+                           sample_verdicts=result["sample_verdicts"])
+        row["results"][name] = summary
+    if len(sample_evaluations) > 1:
+        row["variance"] = {id_: round(v, 4) for id_, v in scored["variance"].items() if v}
+    return row
+
+# Requests whose samples do not all reach the same verdict
+def is_unstable(row):
+    return any(len(set(result.get("sample_verdicts", []))) > 1 for result in row.get("results", {}).values())
+
+# Verdicts that differ from a previous replay output: [(request_key, set name, old, new)]
+def verdict_changes(rows, baseline_path):
+    baseline = {}
+    with open(baseline_path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                previous = json.loads(line)
+                baseline[previous["request_key"]] = previous.get("results", {})
+    changes = []
+    for row in rows:
+        previous = baseline.get(row["request_key"])
+        if previous is None:
+            continue
+        for name, result in row.get("results", {}).items():
+            old = previous.get(name, {}).get("verdict")
+            if old != result["verdict"]:
+                changes.append((row["request_key"], name, old, result["verdict"]))
+    return changes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-score recorded Gemini responses without calling Gemini.")
+    parser.add_argument("--recordings", default=RECORDINGS_PATH, help="Recordings database")
+    parser.add_argument("--set", dest="selected_set", help=f"Only requests for this criteria set (or '{ALL_REGULATORS}')")
+    parser.add_argument("--unstable", action="store_true", help="Only requests whose samples disagree on the verdict")
+    parser.add_argument("--baseline", help="Previous replay.py output to compare verdicts against")
+    parser.add_argument("--output", help="JSONL output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    rows = [replay_request(request) for request in ResponseRecorder(args.recordings).requests(args.selected_set)]
+    if args.unstable:
+        rows = [row for row in rows if is_unstable(row)]
+    # Read the baseline before writing, so a run may overwrite its own baseline
+    changes = verdict_changes(rows, args.baseline) if args.baseline else None
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for row in rows:
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+    finally:
+        if args.output:
+            out.close()
+    failed = sum(1 for row in rows if "results" not in row)
+    print(f"Replayed {len(rows) - failed}/{len(rows)} requests", file=sys.stderr)
+    if changes is not None:
+        for request_key, name, old, new in changes:
+            print(f"{request_key[:12]} {name}: {old} -> {new}", file=sys.stderr)
+        print(f"{len(changes)} verdicts changed since {args.baseline}", file=sys.stderr)
+        return 1 if changes else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+### Bulk re-scoring of stored evaluations with NumPy
+#### Applies every criteria set's coefficients to an archive of evaluations in one matrix product
+#
+# Usage:
+#   python rescore.py results.jsonl --output rescored.csv
+#   python rescore.py .eval_cache.sqlite3 --coefficients tuned_coefficients.json --low 0.25 --high 0.75
+#
+# Archives are batch_cli.py JSONL output (rows with "evaluations") or the evaluation cache database.
+
+import argparse
+import json
+import sqlite3
+import sys
+
+import numpy as np
+
+from scoring import (coefficients_data, score_evaluations, FRAUD_THRESHOLD, NOT_FRAUD_THRESHOLD,
+                     UNSURE_VERDICT)
+
+# Sorted union of criterion IDs weighted by any criteria set
+def coefficient_ids(coefficients=coefficients_data):
+    return sorted({id_ for weights in coefficients.values() for id_ in weights if id_ != "const"})
+
+# Dense (documents x criterion ID) matrix of map_to_result scores; missing criteria score 0
+# like the single-document logistic step. Also returns a mask of evaluated cells.
+def build_score_matrix(evaluation_lists, criterion_ids):
+    column = {id_: j for j, id_ in enumerate(criterion_ids)}
+    scores = np.zeros((len(evaluation_lists), len(criterion_ids)))
+    evaluated = np.zeros(scores.shape, dtype=bool)
+    for i, evaluations in enumerate(evaluation_lists):
+        doc_scores, _, _ = score_evaluations(evaluations)
+        for id_, score in doc_scores.items():
+            j = column.get(id_)
+            if j is not None:
+                scores[i, j] = score
+                evaluated[i, j] = True
+    return scores, evaluated
+
+# (criterion ID x set) weight matrix and per-set constants
+def build_coefficient_matrix(criterion_ids, coefficients=coefficients_data):
+    set_names = list(coefficients)
+    row = {id_: i for i, id_ in enumerate(criterion_ids)}
+    weights = np.zeros((len(criterion_ids), len(set_names)))
+    consts = np.zeros(len(set_names))
+    for k, set_name in enumerate(set_names):
+        for id_, weight in coefficients[set_name].items():
+            if id_ == "const":
+                consts[k] = weight
+            elif id_ in row:
+                weights[row[id_], k] = weight
+    return weights, consts, set_names
+
+# Vectorized version of scoring.fraud_verdict
+def verdict_labels(probabilities, low=NOT_FRAUD_THRESHOLD, high=FRAUD_THRESHOLD):
+    return np.where(probabilities > high, "Yes", np.where(probabilities < low, "No", UNSURE_VERDICT))
+
+# Probabilities, labels and criteria coverage (documents x sets) for a score matrix
+def rescore_matrix(scores, evaluated, criterion_ids, coefficients=coefficients_data,
+                   low=NOT_FRAUD_THRESHOLD, high=FRAUD_THRESHOLD):
+    weights, consts, set_names = build_coefficient_matrix(criterion_ids, coefficients)
+    logits = scores @ weights + consts
+    probabilities = 1 / (1 + np.exp(-logits))
+    used = weights != 0
+    coverage = (evaluated @ used) / np.maximum(used.sum(axis=0), 1)
+    return probabilities, verdict_labels(probabilities, low, high), coverage, set_names
+
+# Re-score lists of evaluations under every criteria set
+def rescore(evaluation_lists, coefficients=coefficients_data, low=NOT_FRAUD_THRESHOLD, high=FRAUD_THRESHOLD):
+    criterion_ids = coefficient_ids(coefficients)
+    scores, evaluated = build_score_matrix(evaluation_lists, criterion_ids)
+    return rescore_matrix(scores, evaluated, criterion_ids, coefficients, low, high)
+
+# Same as rescore, as a DataFrame with probability/verdict/coverage columns per set
+def rescore_frame(evaluation_lists, names=None, coefficients=coefficients_data,
+                  low=NOT_FRAUD_THRESHOLD, high=FRAUD_THRESHOLD):
+    import pandas as pd
+    probabilities, labels, coverage, set_names = rescore(evaluation_lists, coefficients, low, high)
+    frame = pd.DataFrame(index=names)
+    for k, set_name in enumerate(set_names):
+        frame[f"{set_name} probability"] = probabilities[:, k]
+        frame[f"{set_name} verdict"] = labels[:, k]
+        frame[f"{set_name} coverage"] = coverage[:, k]
+    return frame
+
+# Load (names, evaluation lists) from batch JSONL output or the evaluation cache database
+def load_archive(path):
+    names = []
+    evaluation_lists = []
+    if path.endswith((".sqlite3", ".sqlite", ".db")):
+        conn = sqlite3.connect(path)
+        try:
+            for key, name, evaluations in conn.execute("SELECT key, whitepaper_name, evaluations FROM evaluations"):
+                names.append(name or key)
+                evaluation_lists.append(json.loads(evaluations))
+        finally:
+            conn.close()
+        return names, evaluation_lists
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if row.get("evaluations"):
+                names.append(row.get("whitepaper_name") or row.get("source"))
+                evaluation_lists.append(row["evaluations"])
+    return names, evaluation_lists
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-score stored evaluations without calling Gemini.")
+    parser.add_argument("archive", help="batch_cli.py JSONL output or evaluation cache database")
+    parser.add_argument("--coefficients", help="JSON file with coefficients in the coefficients_data format")
+    parser.add_argument("--low", type=float, default=NOT_FRAUD_THRESHOLD, help="Probability below which the verdict is No")
+    parser.add_argument("--high", type=float, default=FRAUD_THRESHOLD, help="Probability above which the verdict is Yes")
+    parser.add_argument("--output", help="CSV output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    coefficients = coefficients_data
+    if args.coefficients:
+        with open(args.coefficients, encoding="utf-8") as f:
+            coefficients = json.load(f)
+
+    names, evaluation_lists = load_archive(args.archive)
+    frame = rescore_frame(evaluation_lists, names, coefficients, args.low, args.high)
+    frame.index.name = "whitepaper_name"
+    frame.to_csv(args.output or sys.stdout)
+    print(f"Re-scored {len(frame)} documents", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,479 @@
+### Scoring core of the Crypto-Fraud detection App
+#### Criteria tables, regression coefficients, response parsing and logistic scoring
+
+import json
+import math
+import re
+
+# Hardcoded criteria from criteria.json for each regulator
+criteria_data = {
+  "FCA": [
+    {
+      "ID": "FCA-001",
+      "criteria": "Misleading Statements Inducing Investment",
+      "description": "Prohibits making statements, promises, or forecasts known to be false or misleading, dishonestly concealing material facts, or recklessly making misleading statements to induce investment in cryptoassets. This includes creating false impressions about the market or value of such investments.",
+      "scope": "Applies to any person making such statements or creating such impressions concerning relevant investments, which explicitly include cryptoassets, to induce others to transact."
+    },
+    {
+      "ID": "FCA-005",
+      "criteria": "Manipulating Transactions and Disseminating False Information (MAR)",
+      "description": "Prohibits engaging in behaviour that gives, or is likely to give, false or misleading signals as to the supply, demand, or price of qualifying cryptoassets, or secures their price at an artificial level. This includes disseminating false or misleading information when the person knew or should have known it was false/misleading.",
+      "scope": "Applies to cryptoassets qualifying as financial instruments under MAR, prohibiting transactions, orders, or dissemination of information that distorts the market or misleads participants."
+    },
+    {
+      "ID": "FCA-007",
+      "criteria": "Carrying on Regulated Activities Without Authorisation (General Prohibition)",
+      "description": "Prohibits any person from carrying on a regulated activity in the UK by way of business, or purporting to do so, unless they are authorised by the FCA or exempt. Certain cryptoasset activities are defined as regulated activities.",
+      "scope": "Applies to persons conducting activities with cryptoassets that fall within the definition of \"regulated activity\" (e.g., certain exchanges, custodianship, dealing, arranging) in the UK without FCA authorisation or exemption."
+    }
+  ],
+  "SEC": [
+    {
+      "ID": "SEC-003",
+      "criteria": "Obtaining Money or Property by Material Misstatements or Omissions in Offer/Sale",
+      "description": "Makes it unlawful in the offer or sale of securities, using interstate commerce or mails, to obtain money or property through any untrue statement of a material fact or any omission of a material fact necessary to make the statements made not misleading.",
+      "scope": "Prohibits acquiring money or property via material misstatements or omissions when offering or selling securities, including crypto-assets, using jurisdictional means."
+    },
+    {
+      "ID": "SEC-008",
+      "criteria": "False or Misleading Statements to Induce Securities Purchase or Sale",
+      "description": "Prohibits brokers, dealers, or others from making false or misleading statements about a security (including crypto-assets) to induce its purchase or sale, if they knew or had reasonable grounds to believe the statement was false or misleading.",
+      "scope": "Targets the dissemination of false or misleading information by market participants to influence investment decisions in securities, including crypto-assets."
+    },
+    {
+      "ID": "SEC-012",
+      "criteria": "Manipulation of Security Prices",
+      "description": "Prohibits a series of transactions in any security creating actual or apparent active trading in such security or raising or depressing the price of such security, for the purpose of inducing the purchase or sale of such security by others.",
+      "scope": "Applies to manipulative practices that affect the price or trading volume of securities, including crypto-assets deemed securities, to deceive or induce investors."
+    },
+    {
+      "ID": "SEC-014",
+      "criteria": "General Prohibition of Manipulative and Deceptive Devices in Securities Transactions",
+      "description": "Broadly prohibits the use or employment of any manipulative or deceptive device or contrivance in connection with the purchase or sale of any security, in contravention of SEC rules (most notably Rule 10b-5).",
+      "scope": "A catch-all anti-fraud provision applicable to a wide range of deceptive practices in securities transactions, including those involving crypto-assets deemed securities."
+    },
+    {
+      "ID": "SEC-030",
+      "criteria": "Prevention of Misuse of Material Nonpublic Information by Investment Advisers",
+      "description": "Requires investment advisers to establish, maintain, and enforce written policies and procedures reasonably designed to prevent the misuse of material, nonpublic information by the adviser or its associates, in violation of securities laws.",
+      "scope": "Mandates preventive measures against insider trading for investment advisers dealing with any securities, including crypto-assets, where they might possess material nonpublic information."
+    }
+  ],
+  "HKSFC": [
+    {
+      "ID": "HKSFC-001",
+      "criteria": "FMSM.1: Fraudulent or Reckless Inducement to Invest",
+      "description": "Making fraudulent or reckless misrepresentations (e.g., false statements, unfulfillable promises, unjustified forecasts, or material omissions) to persuade individuals to invest in securities, structured products, collective investment schemes, or virtual assets. This conduct is an offence.",
+      "scope": "Prohibits inducing investment in securities, structured products, collective investment schemes (under SFO), or virtual assets (under AMLO) through fraudulent or reckless misrepresentations."
+    },
+    {
+      "ID": "HKSFC-003",
+      "criteria": "FMSM.3: Advertising Unlicensed Virtual Asset Services",
+      "description": "Issuing or possessing for issue an advertisement that, to the issuer's knowledge, promotes a person or entity as prepared to provide a Virtual Asset (VA) service when that person or entity is not licensed as required under the AMLO. This is an offence.",
+      "scope": "Prohibits the advertisement of VA services offered by persons known to be unlicensed to provide such services."
+    },
+    {
+      "ID": "HKSFC-005",
+      "criteria": "MM.2: Price Rigging",
+      "description": "Engaging in wash sales of securities that affect their price, or using fictitious or artificial transactions or devices, with the intention or recklessness of maintaining, increasing, reducing, stabilizing, or causing fluctuations in the price of securities or futures contracts. This conduct constitutes market misconduct and a criminal offence.",
+      "scope": "Prohibits manipulating the price of securities or futures contracts through wash sales affecting price or other fictitious or artificial transactions or devices."
+    },
+    {
+      "ID": "HKSFC-006",
+      "criteria": "MM.3: Stock Market Manipulation",
+      "description": "Entering into two or more transactions in a corporation's securities that increase, reduce, maintain, or stabilize their price, with the intention of inducing others to buy, sell, or subscribe for those securities or related corporation's securities. This conduct constitutes market misconduct and a criminal offence.",
+      "scope": "Prohibits series of transactions in a corporation's securities intended to manipulate their price and thereby induce others to trade."
+    },
+    {
+      "ID": "HKSFC-009",
+      "criteria": "FSDP.1: Use of Fraudulent or Deceptive Devices or Schemes in Transactions",
+      "description": "Employing any device, scheme, or artifice with intent to defraud or deceive, or engaging in any act, practice, or course of business which is fraudulent or deceptive, in transactions involving securities, futures contracts, leveraged foreign exchange trading, or virtual assets. This is an offence.",
+      "scope": "Prohibits broadly any fraudulent or deceptive schemes, devices, acts, or business practices in transactions involving securities, futures contracts, leveraged foreign exchange trading (under SFO), or virtual assets (under AMLO)."
+    },
+    {
+      "ID": "HKSFC-011",
+      "criteria": "UOUA.1: Unauthorized Public Offering or Promotion of Investments",
+      "description": "Issuing, or possessing for issue, an advertisement, invitation, or document containing an invitation to the public to enter into agreements for securities, structured products, or to acquire an interest in a collective investment scheme, without authorization from the Securities and Futures Commission (SFC). This is an offence.",
+      "scope": "Prohibits the unauthorized public offering or promotion of specified investment products (securities, structured products, collective investment schemes) to the public."
+    }
+  ]
+}
+
+# Selected Set criteria (from previous)
+selected_criteria = [
+    {
+      "ID": "SEC-030",
+      "criteria": "Prevention of Misuse of Material Nonpublic Information by Investment Advisers",
+      "description": "Requires investment advisers to establish, maintain, and enforce written policies and procedures reasonably designed to prevent the misuse of material, nonpublic information by the adviser or its associates, in violation of securities laws.",
+      "scope": "Mandates preventive measures against insider trading for investment advisers dealing with any securities, including crypto-assets, where they might possess material nonpublic information."
+    },
+    {
+      "ID": "SEC-008",
+      "criteria": "False or Misleading Statements to Induce Securities Purchase or Sale",
+      "description": "Prohibits brokers, dealers, or others from making false or misleading statements about a security (including crypto-assets) to induce its purchase or sale, if they knew or had reasonable grounds to believe the statement was false or misleading.",
+      "scope": "Targets the dissemination of false or misleading information by market participants to influence investment decisions in securities, including crypto-assets."
+    },
+    {
+      "ID": "SEC-014",
+      "criteria": "General Prohibition of Manipulative and Deceptive Devices in Securities Transactions",
+      "description": "Broadly prohibits the use or employment of any manipulative or deceptive device or contrivance in connection with the purchase or sale of any security, in contravention of SEC rules (most notably Rule 10b-5).",
+      "scope": "A catch-all anti-fraud provision applicable to a wide range of deceptive practices in securities transactions, including those involving crypto-assets deemed securities."
+    },
+    {
+      "ID": "FCA-005",
+      "criteria": "Manipulating Transactions and Disseminating False Information (MAR)",
+      "description": "Prohibits engaging in behaviour that gives, or is likely to give, false or misleading signals as to the supply, demand, or price of qualifying cryptoassets, or secures their price at an artificial level. This includes disseminating false or misleading information when the person knew or should have known it was false/misleading.",
+      "scope": "Applies to cryptoassets qualifying as financial instruments under MAR, prohibiting transactions, orders, or dissemination of information that distorts the market or misleads participants."
+    },
+    {
+      "ID": "HKSFC-001",
+      "criteria": "FMSM.1: Fraudulent or Reckless Inducement to Invest",
+      "description": "Making fraudulent or reckless misrepresentations (e.g., false statements, unfulfillable promises, unjustified forecasts, or material omissions) to persuade individuals to invest in securities, structured products, collective investment schemes, or virtual assets. This conduct is an offence.",
+      "scope": "Prohibits inducing investment in securities, structured products, collective investment schemes (under SFO), or virtual assets (under AMLO) through fraudulent or reckless misrepresentations."
+    },
+    {
+      "ID": "MISC-015",
+      "criteria": "Undisclosed Or Misleading Centralization",
+      "summary": "The project is marketed as decentralized but retains significant centralized control over funds, governance, or operations, creating an illusion of community ownership."
+    }
+]
+
+# Coefficients for each set
+coefficients_data = {
+    "Selected Set": {
+        "const": -7.2956,
+        "SEC-014": 1.9420,
+        "SEC-030": 2.4312,
+        "HKSFC-001": 2.4255,
+        "SEC-008": 2.0294,
+        "MISC-015": 2.0220,
+        "FCA-005": 1.7266
+    },
+    "FCA": {
+        "const": -4.0132,
+        "FCA-001": 1.9203,
+        "FCA-005": 3.4054,
+        "FCA-007": 1.0274
+    },
+    "SEC": {
+        "const": -5.2809,
+        "SEC-003": 1.6597,
+        "SEC-008": 2.4216,
+        "SEC-014": 2.1707,
+        "SEC-030": 1.9726,
+        "SEC-012": 1.4019
+    },
+    "HKSFC": {
+        "const": -4.7737,
+        "HKSFC-001": 2.1551,
+        "HKSFC-009": 2.3465,
+        "HKSFC-006": 1.5324,
+        "HKSFC-003": 1.1324,
+        "HKSFC-005": 0.4604,
+        "HKSFC-011": 0.7876
+    }
+}
+
+# Criteria sets offered for evaluation, in display order
+CRITERIA_SETS = ["Selected Set", "FCA", "SEC", "HKSFC"]
+
+# Pseudo set: the union of all sets' criteria, evaluated once and scored with every set's coefficients
+ALL_REGULATORS = "All regulators"
+
+# Criteria list and coefficients for a named set; ALL_REGULATORS has no single coefficient set (None)
+def get_criteria_set(selected_set):
+    if selected_set == ALL_REGULATORS:
+        return union_criteria(), None
+    if selected_set == "Selected Set":
+        return selected_criteria, coefficients_data["Selected Set"]
+    return criteria_data[selected_set], coefficients_data[selected_set]
+
+# Every criterion of every set once, in set order (shared IDs such as FCA-005 appear once)
+def union_criteria():
+    union = {}
+    for name in CRITERIA_SETS:
+        for item in get_criteria_set(name)[0]:
+            union.setdefault(item["ID"], item)
+    return list(union.values())
+
+# Mapping function
+def map_to_result(evidence, result):
+    if evidence == "no evidence" and result == "no":
+        return 0
+    elif evidence == "no evidence" and result == "yes":
+        return 1
+    elif evidence == "some evidence" and result == "yes":
+        return 0.75
+    elif evidence == "some evidence" and result == "no":
+        return 0.25
+    elif evidence == "insufficient evidence to make decision" and result == "insufficient evidence to make decision":
+        return 0.5
+    elif evidence == "some evidence" and result == "insufficient evidence to make decision":
+        return 0.5
+    elif evidence == "abundant evidence" and result == "yes":
+        return 1
+    elif evidence == "abundant evidence" and result == "no":
+        return 0
+    else:
+        raise ValueError(f"Invalid combination: Evidence={evidence}, Result={result}")
+
+# Function to process Gemini response
+def process_response(response_text):
+    response_text = response_text.strip()
+    if response_text.startswith('```json'):
+        response_text = response_text[7:].strip()
+    if response_text.endswith('```'):
+        response_text = response_text[:-3].strip()
+    start_idx = response_text.find('{')
+    end_idx = response_text.rfind('}')
+    if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
+        json_str = response_text[start_idx:end_idx + 1]
+    else:
+        json_str = response_text
+    def fix_trailing_commas(js):
+        return re.sub(r',\s*([}\]])', r'\1', js)
+    json_str = fix_trailing_commas(json_str)
+    return json_str
+
+# Split parsed Gemini JSON into the whitepaper name, the flat list of criterion
+# evaluations and any keys whose value was not a list
+def extract_evaluations(evaluation_json):
+    evaluations = []
+    skipped = {}
+    for key, value in evaluation_json.items():
+        if key != "whitepaper_name":
+            if isinstance(value, list):
+                evaluations.extend(value)
+            else:
+                skipped[key] = value
+    return evaluation_json.get("whitepaper_name"), evaluations, skipped
+
+# Parse raw Gemini response text; raises json.JSONDecodeError on invalid output
+def parse_response(response_text):
+    return extract_evaluations(json.loads(process_response(response_text)))
+
+# Evidence ranking used when merging section results
+EVIDENCE_STRENGTH = {
+    "abundant evidence": 3,
+    "some evidence": 2,
+    "insufficient evidence to make decision": 1,
+    "insufficient evidence to make a decision": 1,
+    "no evidence": 0,
+}
+
+# Quotes kept per criterion after merging
+MAX_MERGED_QUOTES = 4
+
+# Strength of a criterion evaluation; -1 if its evidence/result pair cannot be scored
+def evidence_strength(eval_item):
+    try:
+        evidence = eval_item["Evidence"].lower()
+        map_to_result(evidence, eval_item["result"].lower())
+    except (KeyError, AttributeError, ValueError):
+        return -1
+    return EVIDENCE_STRENGTH.get(evidence, -1)
+
+# Merge evaluations of separately evaluated sections into one per criterion ID, in first-seen order.
+# The strongest evidence wins; among equally strong findings a "yes" wins, and when no section has
+# evidence the majority result is kept (earlier sections break ties). Quotes of the sections that
+# agree with the winner are combined without duplicates.
+def merge_section_evaluations(section_evaluations):
+    by_id = {}
+    for evaluations in section_evaluations:
+        for eval_item in evaluations:
+            if isinstance(eval_item, dict) and "ID" in eval_item:
+                by_id.setdefault(eval_item["ID"], []).append(eval_item)
+    merged = []
+    for items in by_id.values():
+        strength = max(evidence_strength(item) for item in items)
+        candidates = [item for item in items if evidence_strength(item) == strength]
+        results = [str(item.get("result", "")).lower() for item in candidates]
+        if strength == EVIDENCE_STRENGTH["no evidence"]:
+            result = max(results, key=lambda r: (results.count(r), -results.index(r)))
+        else:
+            result = "yes" if "yes" in results else results[0]
+        agreeing = [item for item, item_result in zip(candidates, results) if item_result == result]
+        quotes = []
+        seen = set()
+        for item in agreeing:
+            for quote in re.split(r'\s*\|\s*', str(item.get("quote") or "")):
+                key = " ".join(quote.lower().split())
+                if key and key not in seen:
+                    seen.add(key)
+                    quotes.append(quote.strip())
+        winner = dict(agreeing[0])
+        winner["quote"] = " | ".join(quotes[:MAX_MERGED_QUOTES])
+        merged.append(winner)
+    return merged
+
+# Per-criterion scores, IDs with result "yes" and IDs with an invalid evidence/result pair
+def score_evaluations(evaluations):
+    scores = {}
+    fraud_criteria = []
+    invalid = []
+    for eval_item in evaluations:
+        id_ = eval_item["ID"]
+        evidence = eval_item["Evidence"].lower()
+        result = eval_item["result"].lower()
+        try:
+            scores[id_] = map_to_result(evidence, result)
+        except ValueError:
+            invalid.append(id_)
+            continue
+        if result == "yes":
+            fraud_criteria.append(id_)
+    return scores, fraud_criteria, invalid
+
+# Logistic regression
+def fraud_logit(scores, coefficients):
+    logit = coefficients["const"]
+    for id_, weight in coefficients.items():
+        if id_ != "const":
+            logit += weight * scores.get(id_, 0)  # Default to 0 if missing
+    return logit
+
+def fraud_probability(scores, coefficients):
+    return 1 / (1 + math.exp(-fraud_logit(scores, coefficients)))
+
+# Decision thresholds on the fraud probability
+FRAUD_THRESHOLD = 0.7
+NOT_FRAUD_THRESHOLD = 0.3
+UNSURE_VERDICT = "Unsure, human intervention is required"
+
+def fraud_verdict(prob, low=NOT_FRAUD_THRESHOLD, high=FRAUD_THRESHOLD):
+    return "Yes" if prob > high else "No" if prob < low else UNSURE_VERDICT
+
+# Distance from the Unsure band within which a cascade still escalates to the stronger model
+ESCALATION_MARGIN = 0.05
+
+# Whether a probability is in the Unsure band or within margin of one of its thresholds
+def is_borderline(prob, margin=ESCALATION_MARGIN, low=NOT_FRAUD_THRESHOLD, high=FRAUD_THRESHOLD):
+    return low - margin <= prob <= high + margin
+
+# IDs of criteria without a clear-cut result: partial-evidence scores strictly between 0 and 1,
+# and criteria that are missing or have an invalid evidence/result pair
+def uncertain_criteria(evaluations, criteria_list):
+    scores, _, _ = score_evaluations(evaluations)
+    return [item["ID"] for item in criteria_list if scores.get(item["ID"], 0.5) not in (0, 1)]
+
+# Criteria in descending order of their largest absolute weight in any of the coefficient sets;
+# criteria without a weight come last, in their original order
+def criteria_by_weight(criteria_list, coefficient_sets):
+    return sorted(criteria_list, key=lambda item: -max(abs(coefficients.get(item["ID"], 0)) for coefficients in coefficient_sets))
+
+# Lowest and highest fraud probability still reachable while the open criteria are unevaluated
+# (each can score anywhere from 0 to 1)
+def probability_bounds(scores, open_ids, coefficients):
+    logit = fraud_logit(scores, coefficients)
+    weights = [coefficients.get(id_, 0) for id_ in open_ids if id_ not in scores]
+    low = logit + sum(weight for weight in weights if weight < 0)
+    high = logit + sum(weight for weight in weights if weight > 0)
+    return 1 / (1 + math.exp(-low)), 1 / (1 + math.exp(-high))
+
+# Whether the verdict under every coefficient set is already settled, whatever the open criteria score
+def verdicts_decided(scores, open_ids, coefficient_sets):
+    return all(fraud_verdict(low) == fraud_verdict(high)
+               for low, high in (probability_bounds(scores, open_ids, coefficients) for coefficients in coefficient_sets))
+
+# Full scoring of one document: per-criterion scores, fraud indicators, probability and verdict
+def score_document(evaluations, coefficients):
+    scores, fraud_criteria, invalid = score_evaluations(evaluations)
+    prob = fraud_probability(scores, coefficients)
+    return {
+        "scores": scores,
+        "fraud_criteria": fraud_criteria,
+        "invalid": invalid,
+        "probability": prob,
+        "verdict": fraud_verdict(prob),
+    }
+
+# Score one evaluation of the union criteria with every set's coefficients. Criterion scores are computed
+# once; returns (shared scores/fraud_criteria/invalid, {set name: score_document-style dict for its criteria}).
+def score_all_sets(evaluations):
+    scores, fraud_criteria, invalid = score_evaluations(evaluations)
+    shared = {"scores": scores, "fraud_criteria": fraud_criteria, "invalid": invalid}
+    results = {}
+    for name in CRITERIA_SETS:
+        criteria_list, coefficients = get_criteria_set(name)
+        ids = {item["ID"] for item in criteria_list}
+        prob = fraud_probability(scores, coefficients)
+        results[name] = {
+            "scores": {id_: score for id_, score in scores.items() if id_ in ids},
+            "fraud_criteria": [id_ for id_ in fraud_criteria if id_ in ids],
+            "invalid": [id_ for id_ in invalid if id_ in ids],
+            "probability": prob,
+            "verdict": fraud_verdict(prob),
+        }
+    return shared, results
+
+# Consensus of several sampled evaluations of one document. Each criterion gets the mean and variance of
+# its valid sample scores and the sample evaluation closest to that mean; it is a fraud indicator when
+# most of its valid samples say "yes", and invalid when no sample could be scored.
+def consensus_evaluations(sample_evaluations):
+    by_id = {}
+    for evaluations in sample_evaluations:
+        scores, _, _ = score_evaluations(evaluations)
+        for eval_item in evaluations:
+            by_id.setdefault(eval_item["ID"], []).append((scores.get(eval_item["ID"]), eval_item))
+    consensus = {"evaluations": [], "scores": {}, "variance": {}, "fraud_criteria": [], "invalid": [],
+                 "samples": len(sample_evaluations)}
+    for id_, items in by_id.items():
+        valid = [(score, eval_item) for score, eval_item in items if score is not None]
+        if not valid:
+            consensus["invalid"].append(id_)
+            consensus["evaluations"].append(items[0][1])
+            continue
+        mean = sum(score for score, _ in valid) / len(valid)
+        consensus["scores"][id_] = mean
+        consensus["variance"][id_] = sum((score - mean) ** 2 for score, _ in valid) / len(valid)
+        consensus["evaluations"].append(min(valid, key=lambda pair: abs(pair[0] - mean))[1])
+        if 2 * sum(eval_item["result"].lower() == "yes" for _, eval_item in valid) > len(valid):
+            consensus["fraud_criteria"].append(id_)
+    return consensus
+
+# Consensus scoring: probability and verdict from the mean criterion scores, plus the spread of the
+# per-sample probabilities and verdicts
+def score_consensus(sample_evaluations, coefficients):
+    consensus = consensus_evaluations(sample_evaluations)
+    prob = fraud_probability(consensus["scores"], coefficients)
+    sample_probabilities = [fraud_probability(score_evaluations(evaluations)[0], coefficients)
+                            for evaluations in sample_evaluations]
+    mean = sum(sample_probabilities) / len(sample_probabilities)
+    consensus.update({
+        "probability": prob,
+        "verdict": fraud_verdict(prob),
+        "sample_probabilities": sample_probabilities,
+        "sample_verdicts": [fraud_verdict(p) for p in sample_probabilities],
+        "probability_std": math.sqrt(sum((p - mean) ** 2 for p in sample_probabilities) / len(sample_probabilities)),
+    })
+    return consensus
+
+# Consensus counterpart of score_all_sets; returns (shared consensus, {set name: score_consensus-style dict})
+def consensus_all_sets(sample_evaluations):
+    shared = consensus_evaluations(sample_evaluations)
+    results = {}
+    for name in CRITERIA_SETS:
+        criteria_list, coefficients = get_criteria_set(name)
+        ids = {item["ID"] for item in criteria_list}
+        scored = score_consensus(sample_evaluations, coefficients)
+        for key in ("scores", "variance"):
+            scored[key] = {id_: value for id_, value in scored[key].items() if id_ in ids}
+        for key in ("fraud_criteria", "invalid"):
+            scored[key] = [id_ for id_ in scored[key] if id_ in ids]
+        scored["evaluations"] = [item for item in scored["evaluations"] if item["ID"] in ids]
+        results[name] = scored
+    return shared, results
+
+# Rows of the per-criterion details table (criterion name, score, quote)
+def result_table(evaluations, scores, criteria_list):
+    criteria_lookup = {item["ID"]: item["criteria"] for item in criteria_list}
+    table_data = []
+    for eval_item in evaluations:
+        id_ = eval_item["ID"]
+        if id_ in scores:
+            table_data.append({
+                "Criterion Name": criteria_lookup.get(id_, id_),  # Fallback to ID if not found
+                "Score": round(scores[id_], 2),
+                "Quote": eval_item["quote"]
+            })
+    return table_data
@@ -0,0 +1,103 @@
+### Incremental, tolerant parser for streamed Gemini evaluation JSON
+#### Emits each criterion object (ID, Evidence, result, quote, ...) as soon as its closing brace arrives
+
+import json
+import re
+
+# Trailing commas before a closing bracket, as fixed in scoring.process_response
+TRAILING_COMMA = re.compile(r',\s*([}\]])')
+
+# Fields a criterion object needs before it is emitted
+REQUIRED_FIELDS = ("ID", "Evidence", "result")
+
+# whitepaper_name field, once its string value is complete
+WHITEPAPER_NAME = re.compile(r'"whitepaper_name"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+class IncrementalEvaluationParser:
+    def __init__(self):
+        self.buffer = []  # Received chunks
+        self.text = ""  # Retained text: still-open objects, plus a tail while whitepaper_name is pending
+        self.offset = 0  # Scan position in self.text
+        self.stack = []  # [opener, start offset, has nested object] for open objects and arrays
+        self.in_string = False
+        self.escaped = False
+        self.whitepaper_name = None
+        self.errors = []  # Closed objects that could not be parsed even after repair
+
+    # Full text received so far
+    @property
+    def raw_text(self):
+        return "".join(self.buffer)
+
+    # True when every object was closed and parsed (output was neither truncated nor broken)
+    @property
+    def complete(self):
+        return bool(self.buffer) and not self.stack and not self.errors
+
+    # Feed a chunk of model output; return the criterion objects completed by it
+    def feed(self, chunk):
+        if not chunk:
+            return []
+        self.buffer.append(chunk)
+        self.text += chunk
+        completed = []
+        text = self.text
+        i = self.offset
+        while i < len(text):
+            c = text[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif c == "\\":
+                    self.escaped = True
+                elif c == '"':
+                    self.in_string = False
+            elif c == '"':
+                # Strings only matter inside JSON; Markdown fences and prose outside are skipped
+                self.in_string = bool(self.stack)
+            elif c in "{[":
+                if c == "{" and self.stack:
+                    self.stack[-1][2] = True
+                self.stack.append([c, i, False])
+            elif c in "}]" and self.stack:
+                opener, start, has_nested = self.stack.pop()
+                if self.stack and (opener == "{" or has_nested):
+                    self.stack[-1][2] = True
+                if opener == "{" and c == "}" and not has_nested:
+                    item = self._parse_object(text[start:i + 1])
+                    if item is not None:
+                        completed.append(item)
+            i += 1
+        if self.whitepaper_name is None:
+            match = WHITEPAPER_NAME.search(text)
+            if match:
+                self.whitepaper_name = json.loads(f'"{match.group(1)}"')
+        # Drop text that no open object can refer to any more
+        keep_from = self.stack[0][1] if self.stack else len(text)
+        if self.whitepaper_name is None:
+            keep_from = min(keep_from, max(0, len(text) - 4096))
+        self.text = text[keep_from:]
+        self.offset = len(text) - keep_from
+        for entry in self.stack:
+            entry[1] -= keep_from
+        return completed
+
+    # Parse one closed innermost object; only criterion objects with the required fields are emitted
+    def _parse_object(self, fragment):
+        if '"ID"' not in fragment:
+            return None
+        try:
+            item = json.loads(fragment)
+        except json.JSONDecodeError:
+            try:
+                item = json.loads(TRAILING_COMMA.sub(r'\1', fragment))
+            except json.JSONDecodeError as e:
+                self.errors.append((fragment, e))
+                return None
+        if not isinstance(item, dict) or not all(field in item for field in REQUIRED_FIELDS):
+            self.errors.append((fragment, None))
+            return None
+        item.setdefault("quote", "")
+        return item
+
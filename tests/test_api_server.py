@@ -0,0 +1,100 @@
+### HTTP scoring service: request validation and pool failures
+#### Runs the server in thread mode against the recorded-response Gemini backend
+
+import http.client
+import json
+import logging
+import threading
+
+import pytest
+
+import api_server
+import gemini_client
+import instrumentation
+from fake_gemini import FakeGenAI, load_recorded
+from rate_limiter import Scheduler
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    gemini_client.set_backend(FakeGenAI([load_recorded()["selected_clean"]]))
+    gemini_client.set_scheduler(Scheduler())
+    instrumentation.LOGGER.setLevel(logging.WARNING)
+    pool = api_server.ClientPool("test-key", 2, processes=False)
+    monkeypatch.setattr(api_server, "_fetcher", None)  # Gemini reads URLs itself; no network access
+    httpd = api_server.make_server("127.0.0.1", 0, pool, api_server.EvaluationRegistry(max_pending=2))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+    pool.shutdown()
+    gemini_client.set_backend(None)
+
+
+def request(server, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=30)
+    connection.request(method, path, body, headers or {})
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+@pytest.mark.parametrize("length", ["abc", "-1"])
+def test_invalid_content_length_is_rejected(server, length):
+    status, payload = request(server, "POST", "/evaluate", "{}",
+                              {"Content-Type": "application/json", "Content-Length": length})
+    assert status == 400
+    assert "Content-Length" in payload["error"]
+
+
+@pytest.mark.parametrize("content_type", ["", "application/octet-stream", "text/html"])
+def test_document_body_needs_a_pdf_or_txt_content_type(server, content_type):
+    status, payload = request(server, "POST", "/evaluate", b"Example whitepaper text.", {"Content-Type": content_type})
+    assert status == 415
+
+
+@pytest.mark.parametrize("body", ["[1, 2]", '"x"', "3", "null"])
+def test_non_object_json_body_is_rejected(server, body):
+    status, payload = request(server, "POST", "/evaluate", body, {"Content-Type": "application/json"})
+    assert status == 400
+    assert "object" in payload["error"]
+
+
+def test_rejected_submit_releases_its_slot(server):
+    pool = server.RequestHandlerClass.service.pool
+    executor = pool.acquire()
+    pool.release()
+    executor.shutdown()  # Later submits raise RuntimeError
+    body = json.dumps({"url": "https://example.com/whitepaper", "mode": "async"})
+    headers = {"Content-Type": "application/json"}
+
+    status, payload = request(server, "POST", "/evaluate", body, headers)
+    assert status == 503
+    registry = server.RequestHandlerClass.service.registry
+    assert registry.pending == 0
+    entry = next(iter(registry.entries.values()))
+    assert entry["status"] == "failed" and "RuntimeError" in entry["error"]
+
+    # The broken executor is replaced, so the key keeps working
+    status, payload = request(server, "POST", "/evaluate", json.dumps({"url": "https://example.com/whitepaper"}),
+                              headers)
+    assert status == 200 and payload["status"] == "done"
+
+
+def test_least_recently_used_idle_key_is_evicted():
+    pool = api_server.ClientPool("server-key", 1, processes=True, max_keys=2)
+    try:
+        first = pool.acquire("key-a")
+        pool.release("key-a")
+        pool.acquire("key-b")  # Still in use
+        pool.acquire("key-c")  # Evicts the idle key-a
+        assert list(pool.executors) == ["key-b", "key-c"]
+        with pytest.raises(RuntimeError):
+            first.submit(int)
+        with pytest.raises(LookupError):
+            pool.acquire("key-d")
+        pool.release("key-c")
+        pool.acquire("key-d")
+        assert list(pool.executors) == ["key-b", "key-d"]
+    finally:
+        pool.shutdown()
@@ -0,0 +1,113 @@
+### App tests: a pre-fetched PDF/TXT link is evaluated, scored, cached and stored; evaluation modes are exclusive
+#### Runs the Streamlit script with a stub HTTP session and the recorded-response Gemini backend
+
+import logging
+import os
+
+import pytest
+
+pytest.importorskip("streamlit")
+from streamlit.testing.v1 import AppTest
+
+import gemini_client
+import instrumentation
+import url_fetcher
+from fake_gemini import FakeGenAI, load_recorded
+from rate_limiter import Scheduler
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fraud_detection_app4.py")
+URL = "https://example.com/whitepaper.txt"
+BODY = b"Example Token whitepaper.\n\nThe team guarantees fixed returns to early investors.\n"
+
+
+class StubResponse:
+    def __init__(self, status_code, body=b"", headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+# Serves one TXT body with an ETag and answers conditional requests with 304
+class StubSession:
+    def __init__(self):
+        self.requests = []
+
+    def get(self, url, headers=None, stream=False, timeout=None):
+        self.requests.append((url, dict(headers or {})))
+        if (headers or {}).get("If-None-Match") == '"v1"':
+            return StubResponse(304)
+        return StubResponse(200, BODY, {"ETag": '"v1"', "Content-Length": str(len(BODY))})
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # Caches, stores and fetched bodies go to their default relative paths
+    session = StubSession()
+
+    class StubUrlFetcher(url_fetcher.UrlFetcher):
+        def __init__(self, *args, **kwargs):
+            kwargs.setdefault("session", session)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(url_fetcher, "UrlFetcher", StubUrlFetcher)
+    fake = FakeGenAI([load_recorded()["selected_clean"]])
+    gemini_client.set_backend(fake)
+    gemini_client.set_scheduler(Scheduler())
+    instrumentation.LOGGER.setLevel(logging.WARNING)
+    yield fake, session
+    gemini_client.set_backend(None)
+
+
+def submit_url(app):
+    app.text_input[1].input(URL)
+    app.button[0].click()
+    return app.run(timeout=30)
+
+
+def test_fetched_link_is_evaluated_as_file(backend):
+    fake, session = backend
+    app = AppTest.from_file(APP, default_timeout=30)
+    app.secrets["GEMINI_API_KEY"] = "test-key"
+    app.run()
+    submit_url(app)
+
+    assert not app.exception
+    assert not app.error
+    assert [kind for kind, _ in fake.calls] == ["upload_file", "generate_content"]
+    assert any("Fraud Probability" in markdown.value for markdown in app.markdown)
+    assert app.table  # Per-criterion details
+
+    from evaluation_store import EvaluationStore
+    rows, total = EvaluationStore().history()
+    assert total == 1 and rows[0]["source"] == URL
+
+    # Unchanged content (304) reuses the cached evaluation without another model call
+    submit_url(app)
+    assert not app.exception
+    assert len(fake.calls) == 2
+    assert session.requests[-1][1].get("If-None-Match") == '"v1"'
+    assert any("Loaded cached evaluation" in info.value for info in app.info)
+
+
+def test_evaluation_mode_is_picked_with_one_radio(backend):
+    fake, _ = backend
+    app = AppTest.from_file(APP, default_timeout=30)
+    app.secrets["GEMINI_API_KEY"] = "test-key"
+    app.run()
+    assert app.radio[0].value == "single"
+    app.radio[0].set_value("cascade").run()
+    submit_url(app)
+
+    assert not app.exception
+    generate = [model for kind, model in fake.calls if kind == "generate_content"]
+    assert generate[0] == gemini_client.FAST_MODEL_NAME
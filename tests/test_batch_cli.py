@@ -0,0 +1,85 @@
+### Batch scoring: recorded responses and sampling
+#### Runs evaluate_document against the recorded-response Gemini backend with a temporary recorder
+
+import logging
+
+import pytest
+
+import gemini_client
+import instrumentation
+from batch_cli import evaluate_document
+from fake_gemini import FakeGenAI, load_recorded
+from rate_limiter import Scheduler
+from recordings import ResponseRecorder
+
+UNPARSEABLE = "The model is overloaded, please try again."
+
+
+@pytest.fixture
+def document(tmp_path):
+    gemini_client.set_scheduler(Scheduler())
+    instrumentation.LOGGER.setLevel(logging.WARNING)
+    path = tmp_path / "whitepaper.txt"
+    path.write_text("Example Token whitepaper.\n\nThe team guarantees fixed returns to early investors.\n")
+    yield {"path": str(path)}
+    gemini_client.set_backend(None)
+
+
+def generate_calls(backend):
+    return [call for call in backend.calls if call[0] == "generate_content"]
+
+
+def test_unparseable_recording_does_not_block_a_single_sample(document, tmp_path):
+    recorder = ResponseRecorder(str(tmp_path / "recordings.sqlite3"))
+    gemini_client.set_backend(FakeGenAI([UNPARSEABLE]))
+    row = evaluate_document(document, "Selected Set", recorder=recorder)
+    assert row["error"]
+
+    backend = FakeGenAI([load_recorded()["selected_clean"]])
+    gemini_client.set_backend(backend)
+    row = evaluate_document(document, "Selected Set", recorder=recorder)
+    assert row["error"] is None
+    assert len(generate_calls(backend)) == 1
+
+
+def test_consensus_replaces_unparseable_recordings(document, tmp_path):
+    recorder = ResponseRecorder(str(tmp_path / "recordings.sqlite3"))
+    gemini_client.set_backend(FakeGenAI([UNPARSEABLE]))
+    evaluate_document(document, "Selected Set", recorder=recorder)
+
+    backend = FakeGenAI([load_recorded()["selected_clean"]])
+    gemini_client.set_backend(backend)
+    row = evaluate_document(document, "Selected Set", recorder=recorder, samples=2)
+    assert row["error"] is None
+    assert row["samples"] == 2
+    assert len(generate_calls(backend)) == 2
+
+    # Both fresh samples were recorded and parse, so a second consensus run makes no calls
+    backend.calls.clear()
+    row = evaluate_document(document, "Selected Set", recorder=recorder, samples=2)
+    assert row["error"] is None and not generate_calls(backend)
+
+
+def test_incremental_result_missing_a_criterion_falls_back_to_full_evaluation(document, tmp_path):
+    from evaluation_store import EvaluationStore
+    from near_duplicates import NearDuplicateIndex
+    store = EvaluationStore(str(tmp_path / "evaluations.sqlite3"))
+    index = NearDuplicateIndex(str(tmp_path / "near_duplicates.sqlite3"))
+    paragraphs = [f"Section {i}: the protocol allocates tokens to pool number {i} every epoch." for i in range(60)]
+    original = tmp_path / "v1.txt"
+    original.write_text("\n\n".join(paragraphs))
+    revision = tmp_path / "v2.txt"
+    revision.write_text("\n\n".join(paragraphs[:-1] + ["Early buyers are guaranteed a 300% return."]))
+
+    gemini_client.set_backend(FakeGenAI([load_recorded()["selected_clean"]]))
+    first = evaluate_document({"path": str(original)}, "Selected Set", store=store, near_duplicates=index)
+    assert first["error"] is None
+
+    # The re-evaluation answers none of the requested criteria
+    backend = FakeGenAI(['{"whitepaper_name": "ACME Yield Token Whitepaper"}', load_recorded()["selected_clean"]])
+    gemini_client.set_backend(backend)
+    row = evaluate_document({"path": str(revision)}, "Selected Set", store=store, near_duplicates=index)
+    assert row["error"] is None
+    assert "near_duplicate" not in row
+    assert len(generate_calls(backend)) == 2
+    assert [item["ID"] for item in row["evaluations"]] == [item["ID"] for item in first["evaluations"]]
@@ -0,0 +1,84 @@
+### URL fetching against a real local HTTP server
+#### Requests go through requests' redirect and header handling; normalization only affects the cache key
+
+import http.server
+import threading
+
+import pytest
+
+pytest.importorskip("requests")
+
+from url_fetcher import FetchError, UrlFetcher
+
+BODY = b"Example Token whitepaper.\n\nThe team guarantees fixed returns to early investors.\n"
+ETAG = '"v1"'
+
+
+# Serves the TXT body at /docs/ only (not /docs), and redirects /old to it
+class Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        if self.path == "/old":
+            self.send_response(301)
+            self.send_header("Location", "/docs/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif self.path != "/docs/":
+            self.send_error(404)
+        elif self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(BODY)))
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            self.wfile.write(BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.paths = []
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def fetcher(tmp_path):
+    return UrlFetcher(str(tmp_path / "fetch.sqlite3"), str(tmp_path / "bodies"))
+
+
+def url(server, path):
+    return "http://127.0.0.1:%d%s" % (server.server_address[1], path)
+
+
+def test_trailing_slash_url_is_requested_as_given(server, fetcher):
+    fetched = fetcher.fetch(url(server, "/docs/") + "#abstract")
+    assert server.paths == ["/docs/"]
+    assert fetched.mime_type == "text/plain" and fetched.changed and not fetched.revalidated
+    with open(fetched.path, "rb") as f:
+        assert f.read() == BODY
+
+    again = fetcher.fetch(url(server, "/docs/"))
+    assert again.revalidated and not again.changed
+    assert again.content_hash == fetched.content_hash
+
+
+def test_redirect_is_followed(server, fetcher):
+    fetched = fetcher.fetch(url(server, "/old"))
+    assert server.paths == ["/old", "/docs/"]
+    with open(fetched.path, "rb") as f:
+        assert f.read() == BODY
+
+
+def test_missing_resource_raises(server, fetcher):
+    with pytest.raises(FetchError, match="HTTP 404"):
+        fetcher.fetch(url(server, "/docs"))
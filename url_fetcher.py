@@ -0,0 +1,178 @@
+### Local fetching of whitepaper URLs
+#### Pooled HTTP session and an on-disk body cache re-validated with ETag/Last-Modified
+#
+# Fetched PDF/TXT bodies go through the same pipeline as uploads (content hash, file handle
+# registry, evaluation cache), so an unchanged document at a re-submitted URL reuses its evaluation.
+
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from documents import MAX_SIZE, COPY_CHUNK, MIME_SNIFF_BYTES, detect_mime, sanitize_filename, default_url_name
+from evaluation_cache import normalize_url
+
+FETCH_CACHE_PATH = os.environ.get("FRAUD_FETCH_CACHE_PATH", ".url_fetch.sqlite3")
+FETCH_BODY_DIR = os.environ.get("FRAUD_FETCH_BODY_DIR", ".url_bodies")
+
+# Seconds to wait for the server to respond (and between body chunks)
+FETCH_TIMEOUT = 30
+
+# Connection pool per host for the shared session
+POOL_SIZE = 8
+
+USER_AGENT = "CryptoFraudChecker/1.0 (whitepaper fetcher)"
+
+# File extensions of stored bodies; the Gemini File API infers the document type from them
+BODY_EXTENSIONS = {"application/pdf": ".pdf", "text/plain": ".txt"}
+
+
+class FetchError(RuntimeError):
+    """The URL could not be fetched as a document (HTTP error status or oversized body)."""
+
+
+_session = None
+_session_lock = threading.Lock()
+
+# Process-wide requests session with pooled keep-alive connections (requests is imported on first use)
+def shared_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            _session = session
+    return _session
+
+# A fetched document: local body path, content hash and sniffed MIME type.
+# changed is False when the body is the same as at the previous fetch of the URL.
+class FetchedDocument:
+    def __init__(self, url, path, content_hash, mime_type, changed, revalidated):
+        self.url = url
+        self.path = path
+        self.content_hash = content_hash
+        self.mime_type = mime_type
+        self.changed = changed
+        self.revalidated = revalidated  # Answered by a 304 Not Modified
+
+    # Upload-style file name: the last URL path segment with the extension of the sniffed type
+    def filename(self):
+        name = sanitize_filename(default_url_name(self.url.split("?")[0].rstrip("/")))
+        extension = BODY_EXTENSIONS.get(self.mime_type, "")
+        return name if name.lower().endswith(extension) else name + extension
+
+
+class UrlFetcher:
+    def __init__(self, path=FETCH_CACHE_PATH, body_dir=FETCH_BODY_DIR, session=None, timeout=FETCH_TIMEOUT):
+        self.path = path
+        self.body_dir = body_dir
+        self.session = session
+        self.timeout = timeout
+        os.makedirs(body_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fetches ("
+                " url TEXT PRIMARY KEY,"  # Normalized URL
+                " etag TEXT,"
+                " last_modified TEXT,"
+                " content_hash TEXT NOT NULL,"
+                " mime_type TEXT,"
+                " size INTEGER,"
+                " fetched REAL NOT NULL,"
+                " validated REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    # Bodies are stored once per content hash
+    def body_path(self, content_hash, mime_type):
+        return os.path.join(self.body_dir, content_hash + BODY_EXTENSIONS.get(mime_type, ""))
+
+    # Fetch a URL, sending a conditional request when a cached body exists; returns a FetchedDocument.
+    # Raises FetchError on HTTP errors or bodies over MAX_SIZE, and requests exceptions on network errors.
+    def fetch(self, url):
+        key = normalize_url(url)
+        with self._connect() as conn:
+            cached = conn.execute(
+                "SELECT etag, last_modified, content_hash, mime_type FROM fetches WHERE url = ?", (key,)
+            ).fetchone()
+        if cached is not None and not os.path.exists(self.body_path(cached[2], cached[3])):
+            cached = None  # Body removed from disk; fetch it again unconditionally
+        headers = {}
+        if cached is not None:
+            etag, last_modified, _, _ = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        # The URL is requested as given; the normalized form is only the cache key
+        request_url = url.strip()
+        if request_url.lower().startswith("www."):
+            request_url = "https://" + request_url
+        session = self.session or shared_session()
+        with session.get(request_url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 304 and cached is not None:
+                with self._connect() as conn:
+                    conn.execute("UPDATE fetches SET validated = ? WHERE url = ?", (time.time(), key))
+                return FetchedDocument(url, self.body_path(cached[2], cached[3]), cached[2], cached[3], False, True)
+            if response.status_code >= 400:
+                raise FetchError(f"HTTP {response.status_code} fetching {url}")
+            length = response.headers.get("Content-Length")
+            if length and length.isdigit() and int(length) > MAX_SIZE:
+                raise FetchError(f"{url} exceeds the {MAX_SIZE // (1024 * 1024)}MB limit")
+            content_hash, mime_type, size = self._store_body(response, url)
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO fetches (url, etag, last_modified, content_hash, mime_type, size, fetched, validated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, etag, last_modified, content_hash, mime_type, size, now, now)
+            )
+            if cached is not None and cached[2] != content_hash:
+                self._remove_unreferenced(conn, cached[2], cached[3])
+        return FetchedDocument(url, self.body_path(content_hash, mime_type), content_hash, mime_type,
+                               cached is None or cached[2] != content_hash, False)
+
+    # Stream the response body to disk in chunks, hashing as it goes; returns (content_hash, mime_type, size)
+    def _store_body(self, response, url):
+        digest = hashlib.sha256()
+        header = b""
+        size = 0
+        fd, temp_path = tempfile.mkstemp(prefix="fetch_", dir=self.body_dir)
+        try:
+            with open(fd, "wb") as f:
+                for chunk in response.iter_content(COPY_CHUNK):
+                    size += len(chunk)
+                    if size > MAX_SIZE:
+                        raise FetchError(f"{url} exceeds the {MAX_SIZE // (1024 * 1024)}MB limit")
+                    if len(header) < MIME_SNIFF_BYTES:
+                        header += chunk[:MIME_SNIFF_BYTES - len(header)]
+                    digest.update(chunk)
+                    f.write(chunk)
+            content_hash = digest.hexdigest()
+            mime_type = detect_mime(header)
+            os.replace(temp_path, self.body_path(content_hash, mime_type))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return content_hash, mime_type, size
+
+    # Delete a body no cached URL points to any more
+    def _remove_unreferenced(self, conn, content_hash, mime_type):
+        if conn.execute("SELECT 1 FROM fetches WHERE content_hash = ? LIMIT 1", (content_hash,)).fetchone() is None:
+            try:
+                os.remove(self.body_path(content_hash, mime_type))
+            except FileNotFoundError:
+                pass
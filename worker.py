@@ -0,0 +1,108 @@
+### Background evaluation workers for the job queue
+#### Runs a pool of worker processes that claim queued jobs and store their result rows
+#
+# Usage:
+#   GEMINI_API_KEY=... python worker.py --workers 4
+#
+# The Streamlit app submits jobs when "Run in the background job queue" is ticked and
+# polls them by job ID, so results survive reruns and browser refreshes.
+
+import argparse
+import multiprocessing
+import os
+import socket
+import sys
+import time
+
+import gemini_client
+from gemini_client import MODEL_NAME
+from batch_cli import evaluate_document
+from evaluation_cache import EvaluationCache
+from file_registry import FileHandleRegistry
+from evaluation_store import EvaluationStore
+from job_queue import QUEUE_PATH, STALE_AFTER, JobQueue
+from url_fetcher import UrlFetcher
+
+# Seconds an idle worker waits before polling the queue again
+POLL_INTERVAL = 1.0
+
+# Claim and run jobs until interrupted
+def worker_loop(api_key, queue_path=QUEUE_PATH, poll_interval=POLL_INTERVAL):
+    gemini_client.configure(api_key)
+    queue = JobQueue(queue_path)
+    cache = EvaluationCache()
+    file_registry = FileHandleRegistry()
+    store = EvaluationStore()
+    fetcher = UrlFetcher()
+    if gemini_client.CONTEXT_CACHE_ENABLED:
+        gemini_client.enable_context_cache(file_registry)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    while True:
+        job = queue.claim(worker)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        document = {"url": job["source"]} if job["kind"] == "url" else {"path": job["source"]}
+        document["name"] = job["display_name"]  # Recorded instead of the job's private file path
+        row = evaluate_document(document, job["criteria_set"], cache, job["force"], job["model"] or MODEL_NAME,
+                                file_registry, store, fetcher=fetcher)
+        if row["error"]:
+            queue.fail(job["id"], row["error"])
+        else:
+            row["source"] = job["display_name"]
+            queue.complete(job["id"], row)
+
+def _run_worker(api_key, queue_path, poll_interval):
+    try:
+        worker_loop(api_key, queue_path, poll_interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process queued whitepaper evaluations with a pool of worker processes.")
+    parser.add_argument("--workers", type=int, default=4, help="Number of worker processes")
+    parser.add_argument("--queue", default=QUEUE_PATH, help="Job queue database")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL, help="Idle polling interval in seconds")
+    parser.add_argument("--api-key", default=os.environ.get("GEMINI_API_KEY"),
+                        help="Gemini API key (default: GEMINI_API_KEY environment variable)")
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("a Gemini API key is required (--api-key or GEMINI_API_KEY)")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    queue = JobQueue(args.queue)
+    requeued = queue.requeue_stale(STALE_AFTER)
+    if requeued:
+        print(f"Requeued {requeued} stale job(s)", file=sys.stderr)
+
+    processes = [multiprocessing.Process(target=_run_worker, args=(args.api_key, args.queue, args.poll_interval),
+                                         name=f"worker-{i}", daemon=True)
+                 for i in range(args.workers)]
+    for process in processes:
+        process.start()
+    print(f"Started {len(processes)} worker(s) on {args.queue}", file=sys.stderr)
+    try:
+        # Replace workers that die (e.g. out of memory) and recover the jobs they held
+        while True:
+            time.sleep(STALE_AFTER / 10)
+            queue.requeue_stale(STALE_AFTER)
+            for i, process in enumerate(processes):
+                if not process.is_alive():
+                    processes[i] = multiprocessing.Process(target=_run_worker,
+                                                           args=(args.api_key, args.queue, args.poll_interval),
+                                                           name=process.name, daemon=True)
+                    processes[i].start()
+    except KeyboardInterrupt:
+        print("Stopping workers", file=sys.stderr)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())